@@ -6,12 +6,23 @@ from ModbusClients import ModbusClients
 from services.process_manager import ProcessManager
 from utils.launch_params import handle_launch_params
 from utils.setup_logging import setup_logging
-from utils.utils import format_response, extract_part
+from utils.utils import format_response
+from utils.message_parser import parse_message
 from services.MotorApi import MotorApi
+from services.motion_writer import MotionWriter
+from services.control_loop import ControlLoop
+from services.trajectory_loop import TrajectoryLoop
+from services.telemetry_sampler import TelemetrySampler
+from services.fault_monitor import FaultMonitor
+from services.latency_tracer import LatencyTracer
+from services.connection_monitor import ConnectionMonitor, CONNECTED
+from services.register_cache import CacheVerifier
+from services.event_journal import open_event_journal
 from handlers import actions
+from handlers.dispatcher import ActionRequest
 from helpers import communication_hub_helpers as helpers
 from pathlib import Path
-from time import time
+from time import time, perf_counter
 
 class CommunicationHub:
     def __init__(self):
@@ -22,11 +33,17 @@ class CommunicationHub:
         self.motor_config = None
         self.clients = None
         self.motor_api = None
+        self.motion_writer = None
+        self.telemetry_sampler = None
+        self.fault_monitor = None
+        self.latency_tracer = None
+        self.connection_monitor = None
+        self.cache_verifier = None
         self.is_process_done = False
         self.server = None
         self.motors_initialized = False
         self.shutdown = False
-        self.start_time = None
+        self.dispatcher = actions.build_action_dispatcher(self.logger)
         self.counter = 0
     async def init(self, gui_socket):
         try:
@@ -47,11 +64,16 @@ class CommunicationHub:
                 helpers.close_tasks(self)
                 self.process_manager.cleanup_all()
                 return 1
+            if self.config.CONNECTION_CHECK_INTERVAL > 0:
+                self.start_connection_monitor()
 
             if not await self.motor_api.initialize_motor(gui_socket):
                 self.logger.error(f"""
                                   Failed to initialize motors.
                                   """)
+                self.motor_api.close_watchers()
+                self.motor_api.close_schedulers()
+                self.motor_api.close_journal()
                 self.clients.cleanup()
                 helpers.close_tasks(self)
                 self.process_manager.cleanup_all()
@@ -59,27 +81,92 @@ class CommunicationHub:
             
             ## success
             self.motors_initialized = True
+            if self.telemetry_sampler is None and self.config.TELEMETRY_SAMPLE_HZ > 0:
+                self.telemetry_sampler = TelemetrySampler(self.motor_api, self.logger,
+                                                          frequency=self.config.TELEMETRY_SAMPLE_HZ,
+                                                          history_size=self.config.TELEMETRY_HISTORY_SIZE)
+            if self.telemetry_sampler is not None:
+                self.telemetry_sampler.start()
+            if self.config.FAULT_MONITOR == "inprocess":
+                self.start_fault_monitor()
+            if self.motor_config.CACHE_VERIFY_INTERVAL > 0:
+                if self.cache_verifier is None:
+                    self.cache_verifier = CacheVerifier(self.motor_api, self.logger, interval=self.motor_config.CACHE_VERIFY_INTERVAL)
+                self.cache_verifier.start()
             await gui_socket.send("event=motors_initialized|")
         except Exception as e:
             self.logger.error(f"Initialization failed: {e}")
 
+    def start_fault_monitor(self):
+        """Fault polling inside the server, reads OEG_STATUS on the control loops ticks when it's enabled"""
+        if self.fault_monitor is None:
+            self.fault_monitor = FaultMonitor(self.motor_api, self.logger, self.motor_config,
+                                              on_absolute_fault=lambda message: actions.absolutefault(self),
+                                              on_critical_fault=self.send_fault_to_gui,
+                                              poll_interval=self.config.POLLING_TIME_INTERVAL)
+        attached = isinstance(self.motion_writer, ControlLoop)
+        if attached:
+            self.motion_writer.status_every = self.config.FAULT_STATUS_EVERY_TICKS
+            self.motion_writer.status_listener = self.fault_monitor.on_status
+        self.fault_monitor.start(attached=attached)
+
+    def start_connection_monitor(self):
+        """Health checks the drive connections and reconnects dead ones, state changes go to the gui"""
+        if self.connection_monitor is None:
+            self.connection_monitor = ConnectionMonitor(self.clients, self.logger,
+                                                        probe=lambda client: client.read_holding_registers(address=self.motor_config.OEG_STATUS, count=1, slave=self.motor_config.SLAVE_ID),
+                                                        on_state_change=self.send_connection_state,
+                                                        is_busy=self.motor_api.connection_busy,
+                                                        interval=self.config.CONNECTION_CHECK_INTERVAL,
+                                                        timeout=self.config.CONNECTION_CHECK_TIMEOUT,
+                                                        failures_before_reconnect=self.config.CONNECTION_CHECK_FAILURES)
+        self.connection_monitor.start()
+
+    async def send_connection_state(self, side, state, message):
+        if state == CONNECTED:
+            ### don't wait for the circuit breaker timeout after a reconnect
+            self.motor_api.connection_restored(side)
+        for client, info in self.wsclients.items():
+            if info["identity"] == "gui":
+                await client.send(f"event=connection|message={side} drive {state}: {message}|")
+
+    async def send_fault_to_gui(self, message):
+        for client, info in self.wsclients.items():
+            if info["identity"] == "gui":
+                await client.send(f"event=fault|message={message}|")
+
+    def _resume_motion(self):
+        """Takes setpoints again after a failed stop, start_server may not have got as far as the motion writer"""
+        if self.motion_writer is not None:
+            self.motion_writer.start()
+
     async def shutdown_server(self, wsclient=None):
         """stops and disables motors and closes sub processes"""
         self.logger.info("Shutdown request received. Cleaning up...")
         self.server_shutdown = True
+        self.shutdown = True
+        ### no new setpoints after the stop command
+        if self.motion_writer is not None:
+            self.motion_writer.stop()
         try:
             success = await self.motor_api.stop()
             if not success:
                 self.logger.error("Stopping motors was not successful, will not shutdown server")
+                self.shutdown = False
+                self._resume_motion()
                 return
         except Exception as e:
-            self.logger.error("Stopping motors was not successful, will not shutdown server")
+            self.logger.error(f"Stopping motors was not successful, will not shutdown server: {e}")
+            self.shutdown = False
+            self._resume_motion()
             return
 
         #########################################################################################
         #########################################################################################
         ####NOTE DO NOT REMOVE THIS LINE -IMPORTANT FOR MOTORS TO HAVE TIME TO STOP################
-        await asyncio.sleep(5)
+        ### waits until the motors have actually stopped, at most the 5s that used to be slept
+        if not await self.motor_api.wait_for_motors_to_stop(timeout=5):
+            self.logger.warning("Motors were not confirmed to be stopped, continuing shutdown")
         #########################################################################################
         #########################################################################################
         #########################################################################################
@@ -89,9 +176,15 @@ class CommunicationHub:
 
         self.process_manager.cleanup_all()
 
+        ### the drives restart, wait until they answer again instead of a fixed 20s
+        await self.motor_api.wait_for_restart()
+
+        if self.motor_api is not None:
+            self.motor_api.close_watchers()
+            self.motor_api.close_schedulers()
+            self.motor_api.close_journal()
         if self.clients is not None:
             self.clients.cleanup()
-        await asyncio.sleep(20)
 
         if wsclient:
             await wsclient.send("event=shutdown|message=Server has been shutdown.|")
@@ -114,58 +207,23 @@ class CommunicationHub:
 
         try:
             async for message in wsclient:
-                self.start_time = time()
-                print(f"Received: {message}")
+                received_at = perf_counter()
 
-                if not helpers.rate_limit(self.wsclients[wsclient]["last_call"], max_freq=60):
+                if self.config.MAX_MESSAGE_HZ and not helpers.rate_limit(self.wsclients[wsclient]["last_call"], max_freq=self.config.MAX_MESSAGE_HZ):
                     format_response(event="error", message="message=rate limit exceeded")
                     self.logger.error("RATE TOO FAST")
                     continue
 
                 self.wsclients[wsclient]["last_call"] = time()
 
-                action = extract_part("action=", message)
-                pitch = extract_part("pitch=", message)
-                roll = extract_part("roll=", message)
-                if action and action == "rotate":
-                    await actions.rotate(self, pitch, roll, wsclient)
+                ### binary frames are always motion frames
+                if isinstance(message, bytes):
+                    await self.dispatcher.dispatch(self, "binaryrotate", ActionRequest(None, wsclient, received_at, data=message), binary=True)
                     continue
+                print(f"Received: {message}")
 
-                (receiver, identity, message,acceleration,velocity) = helpers.extract_parts(message)
-
-                if action != "identify" and action != "clearfault" and not self.motors_initialized or self.shutdown:
-                    await wsclient.send(format_response(event="error", message="message=Motors are not initialized or server has been given an order to shutdown"))    
-                    continue
-                    
-                if not action:
-                    await wsclient.send(format_response(event="error", message="message=No action given, example action=<action>"))
-                else:
-                    # "endpoints"
-                    self.logger.info(f"processing action: {action}")
-                    if action == "write":
-                        await actions.write(self, pitch, roll, wsclient)
-                    elif action == "identify":
-                        await actions.identify(self, identity, wsclient)
-                    elif action == "shutdown":
-                        await self.shutdown_server(wsclient)
-                    elif action == "stop":
-                        await actions.stop_motors(self)
-                        
-                    # elif action == "updatevalues":
-                    #     await actions.update_input_values(self,acceleration,velocity)
-                    elif action == "message":
-                        await actions.message(self, receiver, wsclient, message)
-                    elif action == "clearfault":
-                        await actions.clear_fault(self, wsclient=wsclient)
-                    elif action == "absolutefault":
-                        await actions.absolutefault(self)
-                    elif action == "readtelemetry":
-                        await actions.read_telemetry(self, wsclient)
-                    elif action == "closefile":
-                        self.ow_file.close()
-                        self.logger.warning("Closed file!")
-                    else:
-                        await wsclient.send(format_response(event="error", message="message=no action found here is all the actions"))
+                parsed = parse_message(message)
+                await self.dispatcher.dispatch(self, parsed.action, ActionRequest(parsed, wsclient, received_at))
         except websockets.ConnectionClosed as e:
             self.logger.error(f"Client {wsclient.remote_address} (identity: {client_info['identity']}) disconnected with code {e.code}, reason: {e.reason}")
         except Exception as e:
@@ -177,22 +235,44 @@ class CommunicationHub:
     async def cleanup_client(self, client_socket):
         # print(f"Cleaning up client: {client_socket.remote_address} (identity: {self.clients[client_socket]["identity"]})")
         if client_socket in self.wsclients:
+            sequence_tracker = self.wsclients[client_socket].get("motion_sequence")
+            if sequence_tracker is not None:
+                self.logger.info(f"Motion frames from {client_socket.remote_address}: {sequence_tracker.stats()}")
             del self.wsclients[client_socket]
+        if self.telemetry_sampler is not None:
+            self.telemetry_sampler.unsubscribe(client_socket)
         try:
             await client_socket.close()
         except Exception as e:
             self.logger.error(f"Error closing connection for {client_socket.remote_address}: {e}")
 
-    async def start_server(self):
+    async def start_server(self, config=None, motor_config=None):
+        """config and motor_config default to the launch params, benchmarks pass their own"""
         try:
-            self.ow_file = open("overhead.txt" , "w")
-            self.config , self.motor_config = handle_launch_params(b_motor_config=True)
+            if config is None or motor_config is None:
+                config, motor_config = handle_launch_params(b_motor_config=True)
+            self.config, self.motor_config = config, motor_config
+            if self.config.LATENCY_TRACE:
+                self.latency_tracer = LatencyTracer()
             self.clients = ModbusClients(self.config, self.logger)
             await self.clients.connect()
             self.process_manager = ProcessManager(self.logger, target_dir=Path(__file__).parent)
             self.motor_api = MotorApi(logger=self.logger,
                             modbus_clients=self.clients,
                             config = self.motor_config)
+            self.motor_api.journal = open_event_journal(self.config.EVENT_JOURNAL, self.logger)
+            if self.config.TRAJECTORY:
+                self.motion_writer = TrajectoryLoop(self.motor_api, self.logger, frequency=self.config.POS_UPDATE_HZ,
+                                                    interpolation=self.config.TRAJECTORY,
+                                                    delay=self.config.TRAJECTORY_DELAY,
+                                                    max_velocity=self.motor_config.VEL / 60,
+                                                    max_acceleration=self.motor_config.ACC / 60,
+                                                    max_jerk=self.config.TRAJECTORY_MAX_JERK)
+            elif self.config.CONTROL_LOOP:
+                self.motion_writer = ControlLoop(self.motor_api, self.logger, frequency=self.config.POS_UPDATE_HZ)
+            else:
+                self.motion_writer = MotionWriter(self.motor_api, self.logger)
+            self.motion_writer.start()
             self.server = await websockets.serve(self.handle_client, "localhost", self.config.WEBSOCKET_SRV_PORT, ping_timeout=None)
             self.logger.info(f"WebSocket serverwebsocket running on ws://localhost:{self.config.WEBSOCKET_SRV_PORT}")
         except Exception as e:
@@ -1,6 +1,8 @@
 
 from pymodbus.client import AsyncModbusTcpClient
-from typing import Optional
+from typing import List, Optional
+from services.retry_policy import RetryPolicy
+import asyncio
 
 import time
 
@@ -10,47 +12,58 @@ class ModbusClients:
         self.logger = logger
         self.client_left: Optional[AsyncModbusTcpClient] = None
         self.client_right: Optional[AsyncModbusTcpClient] = None
+        ### client_left/right plus the extra connections of MODBUS_CONNECTIONS,
+        ### filled in place so the schedulers holding them see the connections
+        self.pool_left: List[AsyncModbusTcpClient] = []
+        self.pool_right: List[AsyncModbusTcpClient] = []
         self.max_retries = 10
 
+    def address(self, side) -> tuple:
+        if side == "left":
+            return (self.config.SERVER_IP_LEFT, self.config.SERVER_PORT_LEFT or self.config.SERVER_PORT)
+        return (self.config.SERVER_IP_RIGHT, self.config.SERVER_PORT_RIGHT or self.config.SERVER_PORT)
+
+    def pool(self, side) -> List[AsyncModbusTcpClient]:
+        return self.pool_left if side == "left" else self.pool_right
+
+    async def connect_with_backoff(self, side, client, max_attempts=None) -> bool:
+        """Connects client, waiting CONNECT_RETRY_DELAY doubling up to CONNECT_RETRY_MAX_DELAY between attempts"""
+        policy = RetryPolicy(max_attempts=max_attempts or self.max_retries,
+                             base_delay=self.config.CONNECT_RETRY_DELAY,
+                             max_delay=self.config.CONNECT_RETRY_MAX_DELAY)
+        for attempt in range(policy.max_attempts):
+            if client.connected or await client.connect():
+                return True
+            self.logger.debug(f"{side.capitalize()} connection attempt {attempt + 1} failed")
+            if attempt + 1 < policy.max_attempts:
+                await asyncio.sleep(policy.delay(attempt))
+        return False
+
     async def connect(self):
         """
-        Establishes connections to both Modbus clients.
+        Establishes connections to both Modbus clients, both drives are connected at the same time.
+        Already connected clients are kept, so calling this again only reconnects what is down.
         Returns True if both connections are successful, or False if either fails
         and returns None if error
         """
         try:
-            self.client_left = AsyncModbusTcpClient(
-                host=self.config.SERVER_IP_LEFT,
-                port=self.config.SERVER_PORT 
-            )
-
-            self.client_right = AsyncModbusTcpClient(
-                host=self.config.SERVER_IP_RIGHT,
-                port=self.config.SERVER_PORT  
-            )
-
-            left_connected = False
-            right_connected = False
-            max_attempts = self.max_retries
-            attempt_left = 0
-            attempt_right = 0
+            if self.client_left is None:
+                (host, port) = self.address("left")
+                self.client_left = AsyncModbusTcpClient(host=host, port=port)
+            if self.client_right is None:
+                (host, port) = self.address("right")
+                self.client_right = AsyncModbusTcpClient(host=host, port=port)
 
-            while (not left_connected or not right_connected) and \
-            (attempt_left < max_attempts or attempt_right < max_attempts):
-                if not left_connected:
-                    left_connected = await self.client_left.connect()
-                    attempt_left += 1
-                    if not left_connected:
-                         self.logger.debug(f"Left connection attempt {attempt_left} failed")
-
-                if not right_connected:
-                    right_connected = await self.client_right.connect()
-                    attempt_right += 1
-                    if not right_connected:
-                         self.logger.debug(f"Right connection attempt {attempt_right} failed")
+            (left_connected, right_connected) = await asyncio.gather(
+                self.connect_with_backoff("left", self.client_left),
+                self.connect_with_backoff("right", self.client_right))
                 
             if left_connected and right_connected:
                 self.logger.info("Both clients connected succesfully")
+                if not self.pool_left:
+                    self.pool_left[:] = [self.client_left] + await self.connect_extra(*self.address("left"))
+                if not self.pool_right:
+                    self.pool_right[:] = [self.client_right] + await self.connect_extra(*self.address("right"))
 
                 # if "fault_poller.py" in self.config.MODULE_NAME:
                 #     self.client_left.ctx.next_tid = self.config.START_TID
@@ -58,7 +71,7 @@ class ModbusClients:
 
                 return True
             else: 
-                self.logger.warning(f"Connection failed after {max_attempts} attempts. "
+                self.logger.warning(f"Connection failed after {self.max_retries} attempts. "
                                     f"Left: {left_connected}, right: {right_connected}")
                 return False
             
@@ -66,6 +79,30 @@ class ModbusClients:
             self.logger.error(f"Error connecting to clients {str(e)}")
             return None
 
+    async def reconnect(self, side, client, max_attempts=None) -> bool:
+        """Drops a dead connection and connects the same client again, so everything holding it keeps working"""
+        client.close()
+        return await self.connect_with_backoff(side, client, max_attempts=max_attempts)
+
+    async def connect_extra(self, host, port) -> List[AsyncModbusTcpClient]:
+        """
+        Opens the extra connections to a drive so reads can run in parallel.
+        Connections that fail are left out, the drive is then used with fewer.
+        """
+        clients = [AsyncModbusTcpClient(host=host, port=port) for _ in range(self.config.MODBUS_CONNECTIONS - 1)]
+        if not clients:
+            return []
+        results = await asyncio.gather(*[client.connect() for client in clients], return_exceptions=True)
+        connected = []
+        for client, result in zip(clients, results):
+            if result is True:
+                connected.append(client)
+            else:
+                client.close()
+        if len(connected) < len(clients):
+            self.logger.warning(f"Only {len(connected) + 1}/{self.config.MODBUS_CONNECTIONS} connections to {host}:{port} could be opened")
+        return connected
+
     def cleanup(self):
         try:
             self.logger.info(f"cleanup function executed at module {self.config.MODULE_NAME}")
@@ -73,6 +110,8 @@ class ModbusClients:
                 self.client_left.close()
             if self.client_right is not None:
                 self.client_right.close()    
+            for client in self.pool_left[1:] + self.pool_right[1:]:
+                client.close()
         except Exception as e:
             self.logger.info(f"error happened: {e}")
 
@@ -0,0 +1,100 @@
+"""
+Read throughput over one or more modbus tcp connections per drive. Independent
+readers (fault status, feedback position, telemetry) poll the simulated drives
+as fast as they can for each --connections setting, the reads overlap when there
+is more than one connection.
+
+run from src: python -m benchmarks.connection_pool --connections 1 2 4 --duration 3 --latency 0.005
+"""
+import argparse
+import asyncio
+import json
+import logging
+from ModbusClients import ModbusClients
+from services.drive_simulator import start_drive_simulators
+from services.latency_tracer import percentiles
+from services.MotorApi import MotorApi
+from settings.config import Config
+from settings.motors_config import MotorConfig
+
+async def reader(name, read, until, samples):
+    loop = asyncio.get_running_loop()
+    calls = 0
+    while loop.time() < until:
+        start = loop.time()
+        if not await read():
+            raise RuntimeError(f"{name} read failed")
+        samples.append(loop.time() - start)
+        calls += 1
+    return calls
+
+async def run_setting(args, connections, left, right):
+    logger = logging.getLogger("benchmark")
+    config = Config()
+    config.SERVER_IP_LEFT = config.SERVER_IP_RIGHT = "127.0.0.1"
+    config.SERVER_PORT_LEFT, config.SERVER_PORT_RIGHT = args.port_left, args.port_right
+    config.MODBUS_CONNECTIONS = connections
+    config.MODULE_NAME = "benchmark"
+    clients = ModbusClients(config, logger)
+    try:
+        if not await clients.connect():
+            raise RuntimeError("could not connect to the simulated drives")
+        motor_api = MotorApi(logger=logger, modbus_clients=clients, config=MotorConfig())
+        readers = {
+            "fault_status": lambda: motor_api.check_fault_stauts(log=False),
+            "feedback_position": lambda: motor_api.read_value("PFEEDBACK_POSITION"),
+            "telemetry": motor_api.get_telemetry_data,
+        }
+        loop = asyncio.get_running_loop()
+        samples = {name: [] for name in readers}
+        requests_before = left.drive.requests
+        start = loop.time()
+        calls = await asyncio.gather(*[
+            reader(name, read, start + args.duration, samples[name])
+            for name, read in readers.items()])
+        elapsed = loop.time() - start
+        transactions = left.drive.requests - requests_before
+        metrics = motor_api.scheduler_metrics()["left"]
+        motor_api.close_schedulers()
+        return {
+            "connections": len(clients.pool_left),
+            "transactions_per_s": transactions / elapsed,
+            "max_in_flight": metrics["max_in_flight"],
+            "readers": {
+                name: dict(percentiles(samples[name]), calls_per_s=count / elapsed)
+                for (name, count) in zip(readers, calls)
+            },
+        }
+    finally:
+        clients.cleanup()
+        await asyncio.sleep(0.1) ### let the connections close before the next setting
+
+async def main(args):
+    logging.getLogger().setLevel(logging.ERROR)
+    left, right = await start_drive_simulators(port_left=args.port_left, port_right=args.port_right,
+                                               latency=args.latency, jitter=args.jitter, seed=args.seed)
+    try:
+        results = [await run_setting(args, connections, left, right) for connections in args.connections]
+    finally:
+        await left.stop()
+        await right.stop()
+    baseline = results[0]["transactions_per_s"]
+    for result in results:
+        result["speedup"] = result["transactions_per_s"] / baseline
+    print(json.dumps({
+        "latency_ms": args.latency * 1000,
+        "jitter_ms": args.jitter * 1000,
+        "duration_s": args.duration,
+        "results": results,
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 2, 4], help="connections per drive to compare")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per setting")
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated drive response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random drive response time in seconds")
+    parser.add_argument("--port_left", type=int, default=5020)
+    parser.add_argument("--port_right", type=int, default=5021)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
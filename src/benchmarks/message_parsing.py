@@ -0,0 +1,55 @@
+"""
+Per message parse time of parse_message against the old handle_client parsing,
+which scanned the message once per key with extract_part (five keys in
+handle_client and six more in extract_parts).
+
+run from src: python -m benchmarks.message_parsing --number 100000
+"""
+import argparse
+import json
+from timeit import repeat
+from utils.message_parser import parse_message
+from utils.utils import extract_part
+
+MESSAGES = {
+    "rotate": "action=rotate|pitch=-3.2145|roll=7.8812|",
+    "identify": "action=identify|identity=gui|protocol=binary|",
+    "fault_message": "action=message|receiver=gui|identity=fault poller|event=fault|message=CRITICAL FAULT DETECTED: Board temperature is too high|",
+}
+
+def parse_with_extract_part(msg):
+    action = extract_part("action=", msg)
+    pitch = extract_part("pitch=", msg)
+    roll = extract_part("roll=", msg)
+    seconds = extract_part("seconds=", msg)
+    protocol = extract_part("protocol=", msg)
+    receiver = extract_part("receiver=", message=msg)
+    identity = extract_part("identity=", message=msg)
+    message = extract_part("message=", message=msg)
+    event = extract_part("event=", message=msg)
+    acceleration = extract_part("acc=", message=msg)
+    velocity = extract_part("vel=", message=msg)
+    return (action, pitch, roll, seconds, protocol, receiver, identity, message, event, acceleration, velocity)
+
+def parse_with_tokenizer(msg):
+    parsed = parse_message(msg)
+    return (parsed.action, parsed.pitch, parsed.roll, parsed.seconds, parsed.protocol, parsed.receiver,
+            parsed.identity, parsed.message, parsed.event, parsed.acc, parsed.vel)
+
+def per_message_us(func, msg, number, repeats):
+    return min(repeat(lambda: func(msg), number=number, repeat=repeats)) / number * 1e6
+
+def main(args):
+    results = {}
+    for name, msg in MESSAGES.items():
+        assert parse_with_extract_part(msg) == parse_with_tokenizer(msg)
+        old = per_message_us(parse_with_extract_part, msg, args.number, args.repeat)
+        new = per_message_us(parse_with_tokenizer, msg, args.number, args.repeat)
+        results[name] = {"extract_part_us": old, "parse_message_us": new, "speedup": old / new}
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=100000, help="parses per measurement")
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,142 @@
+"""
+End-to-end motion path benchmark. Runs the websocket server against simulated
+drives, streams action=rotate frames at each rate and reports the latency of
+every stage (receive, parse, dequeue, kinematics, write issued, write ack)
+and the achieved throughput as JSON.
+
+run from src: python -m benchmarks.motion_latency --rates 10 50 100 200 --duration 5 --latency 0.002
+--binary sends binary motion frames (utils/motion_frame.py) instead of text rotate messages
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import websockets
+from CommunicationHub import CommunicationHub
+from helpers import communication_hub_helpers as helpers
+from services.drive_simulator import start_drive_simulators
+from settings.config import Config
+from settings.motors_config import MotorConfig
+from utils.message_parser import parse_message
+from utils.motion_frame import encode_motion_frame
+
+async def wait_for_event(ws, event, timeout):
+    async def wait():
+        while True:
+            message = await ws.recv()
+            if f"event={event}" in message:
+                return message
+    return await asyncio.wait_for(wait(), timeout)
+
+def text_frame(sequence, pitch, roll):
+    return f"action=rotate|pitch={pitch:.4f}|roll={roll:.4f}|"
+
+def binary_frame(sequence, pitch, roll):
+    return encode_motion_frame(sequence, pitch, roll)
+
+async def stream(ws, rate, duration, make_frame):
+    """Sends rotate frames on absolute deadlines, returns (sent, bytes sent, elapsed)"""
+    loop = asyncio.get_running_loop()
+    period = 1.0 / rate
+    count = int(rate * duration)
+    sent_bytes = 0
+    start = loop.time()
+    for n in range(count):
+        delay = start + n * period - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        ### slow sine sweep so consecutive setpoints differ
+        t = n * period
+        frame = make_frame(n, 8 * math.sin(t), 5 * math.cos(t))
+        sent_bytes += len(frame)
+        await ws.send(frame)
+    return count, sent_bytes, loop.time() - start
+
+async def main(args):
+    logging.getLogger().setLevel(logging.WARNING)
+    left, right = await start_drive_simulators(port_left=args.port_left, port_right=args.port_right,
+                                               latency=args.latency, jitter=args.jitter,
+                                               initial_position=0.5, homing_velocity=5.0, seed=args.seed)
+    config = Config()
+    config.SERVER_IP_LEFT = config.SERVER_IP_RIGHT = "127.0.0.1"
+    config.SERVER_PORT_LEFT, config.SERVER_PORT_RIGHT = args.port_left, args.port_right
+    config.WEBSOCKET_SRV_PORT = args.ws_port
+    config.MODULE_NAME = "benchmark"
+    config.LATENCY_TRACE = True
+    config.MAX_MESSAGE_HZ = 0
+    config.TELEMETRY_SAMPLE_HZ = args.telemetry_hz
+    config.CONTROL_LOOP = args.control_loop
+    config.TRAJECTORY = args.trajectory
+    config.POS_UPDATE_HZ = args.freq
+
+    hub = CommunicationHub()
+    hub.logger.setLevel(logging.WARNING)
+    await hub.start_server(config, MotorConfig())
+    try:
+        async with websockets.connect(f"ws://localhost:{args.ws_port}") as ws:
+            if args.binary:
+                await ws.send("action=identify|identity=gui|protocol=binary|")
+                await wait_for_event(ws, "protocol", timeout=5)
+            else:
+                await ws.send("action=identify|identity=gui|")
+            await wait_for_event(ws, "motors_initialized", timeout=60)
+            make_frame = binary_frame if args.binary else text_frame
+
+            results = []
+            for rate in args.rates:
+                hub.latency_tracer.reset()
+                writes_before = hub.motion_writer.writes
+                sent, sent_bytes, elapsed = await stream(ws, rate, args.duration, make_frame)
+                await asyncio.sleep(args.drain)
+                summary = hub.latency_tracer.summary()
+                summary.update({
+                    "rate_hz": rate,
+                    "sent": sent,
+                    "send_rate_hz": sent / elapsed,
+                    "bytes_per_frame": sent_bytes / sent if sent else 0,
+                    "modbus_writes": hub.motion_writer.writes - writes_before,
+                    "throughput_hz": summary["completed"] / elapsed,
+                })
+                results.append(summary)
+
+            await ws.send("action=stats|")
+            server_stats = json.loads(parse_message(await wait_for_event(ws, "stats", timeout=5)).message)
+
+        print(json.dumps({
+            "latency_ms": args.latency * 1000,
+            "jitter_ms": args.jitter * 1000,
+            "duration_s": args.duration,
+            "writer": "control_loop" if args.control_loop else "motion_writer",
+            "protocol": "binary" if args.binary else "text",
+            "actions": server_stats["actions"],
+            "scheduler": server_stats["modbus_scheduler"],
+            "results": results,
+        }, indent=2))
+    finally:
+        helpers.close_tasks(hub)
+        hub.server.close()
+        await hub.server.wait_closed()
+        hub.motor_api.close_schedulers()
+        hub.clients.cleanup()
+        await asyncio.sleep(0.1) ### let the clients close before the servers go away
+        await left.stop()
+        await right.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=float, nargs="+", default=[10, 50, 100, 200], help="frame rates to stream in Hz")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per rate")
+    parser.add_argument("--drain", type=float, default=0.5, help="seconds to wait for the last writes after each rate")
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated drive response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.001, help="extra random drive response time in seconds")
+    parser.add_argument("--binary", action="store_true", help="send binary motion frames instead of text")
+    parser.add_argument("--control_loop", action="store_true", help="use the fixed rate control loop instead of the motion writer")
+    parser.add_argument("--trajectory", choices=["", "linear", "hermite"], default="", help="move along an interpolated trajectory at --freq")
+    parser.add_argument("--freq", type=float, default=100, help="control loop rate")
+    parser.add_argument("--telemetry_hz", type=float, default=1, help="background telemetry sampling, 0 disables it")
+    parser.add_argument("--port_left", type=int, default=5020)
+    parser.add_argument("--port_right", type=int, default=5021)
+    parser.add_argument("--ws_port", type=int, default=7100)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
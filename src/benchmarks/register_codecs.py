@@ -0,0 +1,47 @@
+"""
+Micro-benchmark of the compiled register codecs against the format string helpers in utils.
+
+run from src: python -m benchmarks.register_codecs --number 200000
+"""
+import argparse
+import json
+from timeit import timeit
+from utils.register_map import build_register_map
+from utils.utils import registers_convertion, convert_val_into_format, convert_vel_rpm_revs, convert_acc_rpm_revs, bit_high_low_both
+
+def main(number):
+    registers = build_register_map()
+    vbus = [41943, 1536]
+    current = [0, 640]
+    board_tmp = [1280]
+    cases = {
+        "decode VBUS 11.21 signed": (
+            lambda: registers_convertion(vbus, "11.21", signed=True),
+            lambda: registers.VBUS.decode(vbus)),
+        "decode ICONTINUOUS 9.23": (
+            lambda: registers_convertion(current, "9.23"),
+            lambda: registers.ICONTINUOUS.decode(current)),
+        "decode BOARD_TMP 11.5": (
+            lambda: bit_high_low_both(board_tmp[0], 5, "high"),
+            lambda: registers.BOARD_TMP.decode(board_tmp)),
+        "encode HOST_CURRENT_MAXIMUM 9.7": (
+            lambda: convert_val_into_format(5, "9.7"),
+            lambda: registers.HOST_CURRENT_MAXIMUM.encode(5)),
+        "encode HOST_VEL_MAXIMUM 8.24": (
+            lambda: convert_vel_rpm_revs(83),
+            lambda: registers.HOST_VEL_MAXIMUM.encode(83 / 60.0)),
+        "encode HOST_ACCELERATION_MAXIMUM 12.20": (
+            lambda: convert_acc_rpm_revs(155),
+            lambda: registers.HOST_ACCELERATION_MAXIMUM.encode(155 / 60.0)),
+    }
+    results = {}
+    for name, (helper, codec) in cases.items():
+        helper_ns = timeit(helper, number=number) / number * 1e9
+        codec_ns = timeit(codec, number=number) / number * 1e9
+        results[name] = {"helper_ns": round(helper_ns, 1), "codec_ns": round(codec_ns, 1), "speedup": round(helper_ns / codec_ns, 2)}
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=200000)
+    main(parser.parse_args().number)
@@ -0,0 +1,102 @@
+"""
+Compares get_telemetry_data block reads against the old one read per register
+approach on two local pymodbus servers with injected latency.
+
+run from src: python -m benchmarks.telemetry_block_reads --latency 0.002 --rounds 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+from time import perf_counter
+from pymodbus.datastore import ModbusSequentialDataBlock, ModbusServerContext, ModbusSlaveContext
+from pymodbus.server import ModbusTcpServer
+from ModbusClients import ModbusClients
+from services.MotorApi import MotorApi
+from settings.config import Config
+from settings.motors_config import MotorConfig
+
+class LatencySlaveContext(ModbusSlaveContext):
+    """Slave context that answers every request after a fixed delay"""
+    def __init__(self, latency, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.requests = 0
+
+    async def async_getValues(self, fc_as_hex, address, count=1):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        return self.getValues(fc_as_hex, address, count)
+
+async def start_server(host, port, latency):
+    context = LatencySlaveContext(latency, hr=ModbusSequentialDataBlock(0, [0] * 8192))
+    server = ModbusTcpServer(ModbusServerContext(slaves=context, single=True), address=(host, port))
+    task = asyncio.create_task(server.serve_forever())
+    await asyncio.sleep(0.1)
+    return server, task, context
+
+async def read_per_register(motor_api):
+    """get_telemetry_data before block reads, one transaction per register"""
+    config = motor_api.config
+    for address, count in ((config.BOARD_TMP, 1), (config.ACTUATOR_TMP, 1), (config.ICONTINUOUS, 2), (config.VBUS, 2)):
+        if not await motor_api._read(address=address, description="_read telemetry register", count=count, log=False):
+            return False
+    return True
+
+async def measure(func, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = perf_counter()
+        if not await func():
+            raise RuntimeError("telemetry read failed")
+        samples.append(perf_counter() - start)
+    samples.sort()
+    return {
+        "mean_ms": sum(samples) / len(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+    }
+
+async def main(args):
+    logger = logging.getLogger("benchmark")
+    config = Config()
+    config.SERVER_IP_LEFT = "127.0.0.1"
+    config.SERVER_IP_RIGHT = "127.0.0.2"
+    config.SERVER_PORT = args.port
+    config.MODULE_NAME = "benchmark"
+
+    left = await start_server(config.SERVER_IP_LEFT, config.SERVER_PORT, args.latency)
+    right = await start_server(config.SERVER_IP_RIGHT, config.SERVER_PORT, args.latency)
+    clients = ModbusClients(config, logger)
+    try:
+        if not await clients.connect():
+            raise RuntimeError("could not connect to the local modbus servers")
+        motor_api = MotorApi(logger=logger, modbus_clients=clients, config=MotorConfig())
+
+        requests_before = left[2].requests
+        per_register = await measure(lambda: read_per_register(motor_api), args.rounds)
+        per_register["transactions_per_drive"] = (left[2].requests - requests_before) / args.rounds
+
+        requests_before = left[2].requests
+        block = await measure(motor_api.get_telemetry_data, args.rounds)
+        block["transactions_per_drive"] = (left[2].requests - requests_before) / args.rounds
+
+        print(json.dumps({
+            "latency_ms": args.latency * 1000,
+            "rounds": args.rounds,
+            "per_register": per_register,
+            "block_reads": block,
+            "speedup": per_register["mean_ms"] / block["mean_ms"],
+        }, indent=2))
+    finally:
+        clients.cleanup()
+        for server, task, _ in (left, right):
+            await server.shutdown()
+            task.cancel()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated drive response time in seconds")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--port", type=int, default=5020)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+How smooth the host position commands are at different input rates. A pitch/roll
+sweep is sampled at each input rate (with random arrival jitter) and turned into
+commands at the control rate the way ControlLoop does it (hold the latest setpoint)
+and the way TrajectoryLoop does it (interpolate + limit). Reports the largest
+command step, peak acceleration and jerk of the commands and the tracking error
+against the (delayed) sweep itself, no drives or network needed.
+
+run from src: python -m benchmarks.trajectory_smoothing --rates 10 25 50 100 --freq 100
+"""
+import argparse
+import json
+import math
+import random
+from helpers.motor_api_helper import calculate_servo_revs
+from helpers.trajectory import Trajectory, MotionLimiter, LINEAR, HERMITE
+from settings.config import Config
+from settings.motors_config import MotorConfig
+
+def sweep(t):
+    ### stays inside the drives velocity limit and away from the pitch +-2 formula switch
+    return (1.5 * math.sin(0.2 * t), 4 * math.sin(0.25 * t + 1.0))
+
+def command_stats(commands, reference, period):
+    velocity = [(b - a) / period for a, b in zip(commands, commands[1:])]
+    acceleration = [(b - a) / period for a, b in zip(velocity, velocity[1:])]
+    jerk = [(b - a) / period for a, b in zip(acceleration, acceleration[1:])]
+    errors = [c - r for c, r in zip(commands, reference)]
+    return {
+        "max_step_revs": max(abs(v) for v in velocity) * period,
+        "peak_acceleration": max(abs(a) for a in acceleration),
+        "peak_jerk": max(abs(j) for j in jerk),
+        "rms_error_revs": math.sqrt(sum(e * e for e in errors) / len(errors)),
+    }
+
+def run_rate(args, rate, motor_config, config):
+    rng = random.Random(args.seed)
+    period = 1.0 / args.freq
+    ### setpoint arrival times with jitter, the sender timestamps are exact
+    setpoints = []
+    n = 0
+    while n / rate < args.duration:
+        t = n / rate
+        setpoints.append((t, t + rng.uniform(0, args.jitter), calculate_servo_revs(*sweep(t))[0]))
+        n += 1
+    setpoints.sort(key=lambda setpoint: setpoint[1])
+
+    ticks = [k * period for k in range(int(args.duration * args.freq))]
+    results = {}
+    for mode in ("hold", LINEAR, HERMITE):
+        trajectory = Trajectory(HERMITE if mode == "hold" else mode)
+        limiter = MotionLimiter(period, motor_config.VEL / 60, motor_config.ACC / 60, config.TRAJECTORY_MAX_JERK)
+        delay = 0.0 if mode == "hold" else max(config.TRAJECTORY_DELAY, 1.5 / rate)
+        latest = None
+        i = 0
+        commands = []
+        reference = []
+        for now in ticks:
+            while i < len(setpoints) and setpoints[i][1] <= now:
+                (sent, _, revs) = setpoints[i]
+                latest = revs
+                trajectory.push(sent, revs, revs)
+                i += 1
+            if latest is None:
+                continue
+            ### starting from rest the limiters lag behind the sweep until they have accelerated
+            if now < args.warmup:
+                if mode != "hold":
+                    limiter.step(trajectory.sample(now - delay)[0])
+                continue
+            if mode == "hold":
+                commands.append(latest)
+            else:
+                commands.append(limiter.step(trajectory.sample(now - delay)[0]))
+            reference.append(calculate_servo_revs(*sweep(now - delay))[0])
+        results[mode] = dict(command_stats(commands, reference, period), delay_ms=delay * 1000)
+    return results
+
+def main(args):
+    motor_config = MotorConfig()
+    config = Config()
+    print(json.dumps({
+        "control_hz": args.freq,
+        "jitter_ms": args.jitter * 1000,
+        "results": {str(rate): run_rate(args, rate, motor_config, config) for rate in args.rates},
+    }, indent=2))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rates", type=float, nargs="+", default=[10, 25, 50, 100], help="input setpoint rates in Hz")
+    parser.add_argument("--freq", type=float, default=100, help="control loop rate")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of sweep per rate")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds at the start that are not measured")
+    parser.add_argument("--jitter", type=float, default=0.01, help="max random arrival delay of a setpoint in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,56 @@
+"""
+Simulated left and right Tritex drives for running the server, fault poller
+and benchmarks without hardware.
+
+run from src: python drive_simulator.py --port_left 5020 --port_right 5021 --latency 0.002 --jitter 0.001
+and point the server to it: python main.py --server_left 127.0.0.1 --server_right 127.0.0.1 --port_left 5020 --port_right 5021
+"""
+import argparse
+import asyncio
+from services.drive_simulator import start_drive_simulators
+from utils.setup_logging import setup_logging
+
+async def inject_fault_later(simulator, code, delay, logger):
+    await asyncio.sleep(delay)
+    simulator.drive.inject_fault(code)
+    logger.warning(f"Injected fault {code} to the {simulator.drive.name} drive")
+
+async def main(args):
+    logger = setup_logging("drive_simulator", "drive_simulator.log")
+    left, right = await start_drive_simulators(
+        host=args.host, port_left=args.port_left, port_right=args.port_right,
+        latency=args.latency, jitter=args.jitter, initial_position=args.initial_position,
+        homing_velocity=args.homing_velocity, seed=args.seed)
+    logger.info(f"Simulated drives running on {args.host} left: {args.port_left} right: {args.port_right}")
+
+    tasks = []
+    if args.fault_code:
+        sides = {"left": (left,), "right": (right,), "both": (left, right)}[args.fault_side]
+        tasks = [asyncio.create_task(inject_fault_later(sim, args.fault_code, args.fault_after, logger)) for sim in sides]
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await left.stop()
+        await right.stop()
+        logger.info("Simulated drives stopped")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port_left", type=int, default=5020)
+    parser.add_argument("--port_right", type=int, default=5021)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniformly distributed delay in seconds")
+    parser.add_argument("--initial_position", type=float, default=5.0, help="actuator position in revs at startup")
+    parser.add_argument("--homing_velocity", type=float, default=1.0, help="revs/s")
+    parser.add_argument("--fault_code", type=int, help="fault from constants/fault_codes.py to inject")
+    parser.add_argument("--fault_side", type=str, choices=["left", "right", "both"], default="left")
+    parser.add_argument("--fault_after", type=float, default=10.0, help="seconds after startup")
+    parser.add_argument("--seed", type=int, help="jitter random seed")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
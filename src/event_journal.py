@@ -0,0 +1,69 @@
+"""
+Queries the drive event journal written by the server and the fault poller.
+
+run from src: python event_journal.py --since 2026-10-01 --until 2026-10-08 --fault critical
+              python event_journal.py --last 3600 --kind status fault --side left
+              python event_journal.py --fault 128 --summary
+"""
+import argparse
+import sys
+from datetime import datetime
+from time import time
+import numpy as np
+from helpers.fault_decoder import SEVERITY_NAMES
+from services.event_journal import JournalReader, describe_record, journal_path, KIND_NAMES, SIDE_NAMES, FAULT
+from settings.config import Config
+
+def parse_time(value):
+    """ISO date/time or unix seconds"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def parse_fault(value):
+    """severity name (that severity or worse) or a fault code (any of its bits)"""
+    if value in SEVERITY_NAMES:
+        return {"severity": SEVERITY_NAMES.index(value)}
+    return {"fault_bits": int(value, 0)}
+
+def main(args):
+    kinds = {name: kind for kind, name in KIND_NAMES.items()}
+    query = {
+        "since": time() - args.last if args.last else (parse_time(args.since) if args.since else None),
+        "until": parse_time(args.until) if args.until else None,
+        "kinds": [kinds[name] for name in args.kind] if args.kind else None,
+        "side": SIDE_NAMES.index(args.side) if args.side else None,
+    }
+    if args.fault:
+        query.update(parse_fault(args.fault))
+    with JournalReader(journal_path(args.path)) as reader:
+        records = reader.query(**query)
+        if args.summary:
+            print(f"{len(records)} of {len(reader)} records")
+            (pairs, counts) = np.unique(records[["kind", "side"]], return_counts=True)
+            for (kind, side), count in zip(pairs, counts):
+                print(f"{KIND_NAMES.get(int(kind), int(kind)):<8} {SIDE_NAMES[int(side)]:<5} {count}")
+            (codes, counts) = np.unique(records["value"][records["kind"] == FAULT], return_counts=True)
+            for i in np.argsort(-counts, kind="stable"):
+                print(f"fault {codes[i]}: {counts[i]}")
+            return
+        for record in records[-args.limit:] if args.limit else records:
+            print(describe_record(record))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default=Config.EVENT_JOURNAL or "drive_events.journal", help="journal file, relative paths are in the logs directory")
+    parser.add_argument("--since", help="ISO time or unix seconds")
+    parser.add_argument("--until", help="ISO time or unix seconds")
+    parser.add_argument("--last", type=float, help="only the last n seconds, overrides --since")
+    parser.add_argument("--kind", nargs="+", choices=list(KIND_NAMES.values()))
+    parser.add_argument("--side", choices=SIDE_NAMES, help="records of this drive (and of both)")
+    parser.add_argument("--fault", help="recoverable, critical or absolute (that severity or worse) or a fault code")
+    parser.add_argument("--limit", type=int, default=0, help="only the newest n matching records")
+    parser.add_argument("--summary", action="store_true", help="counts per kind, side and fault code instead of the records")
+    try:
+        main(parser.parse_args())
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
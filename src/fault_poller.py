@@ -5,10 +5,10 @@ from ModbusClients import ModbusClients
 from services.MotorApi import MotorApi
 from utils.launch_params import handle_launch_params
 import asyncio
-from utils.utils import  extract_part
-from helpers.fault_helpers import has_faulted, is_critical_fault, is_absolute_fault
-from constants.fault_codes import ABSOLUTE_FAULTS, CRITICAL_FAULTS
+from utils.message_parser import parse_message
+from helpers.fault_helpers import get_fault_event
 from services.WebSocketClient import WebSocketClient
+from services.event_journal import open_event_journal
 from settings.motors_config import MotorConfig
 
 class FaultPoller():
@@ -17,8 +17,9 @@ class FaultPoller():
         self.wsclient = None
 
     def on_message(self, msg):
-        event = extract_part("event=", msg)
-        message = extract_part("message=", msg)
+        parsed = parse_message(msg)
+        event = parsed.event
+        message = parsed.message
         if not event:
             self.logger.error("wsclient message does not have event specified in it.")
             return
@@ -45,6 +46,7 @@ class FaultPoller():
             return
         
         motor_api = MotorApi(logger=self.logger, modbus_clients=clients)
+        motor_api.journal = open_event_journal(config.EVENT_JOURNAL, self.logger)
         wsclient = WebSocketClient(identity="fault poller", logger=self.logger, on_message=self.on_message)
         self.wsclient = wsclient
         await wsclient.connect()
@@ -74,42 +76,37 @@ class FaultPoller():
                     self.logger.error("something went wrong while checkigng fault status")
                     continue
 
-                l_has_faulted, r_has_faulted = has_faulted(vals)
-                if (l_has_faulted or r_has_faulted):
-                    vals = await motor_api.get_recent_fault()
-
-                    if not vals:
-                        self.logger.error("Getting recent fault was not succesful")
-                        continue
-
-                    ## check if the fault is absolute
-                    if is_absolute_fault(vals):
-                        await wsclient.send(f"event=fault|action=absolutefault|message=ABSOLUTE FAULT DETECTED: {ABSOLUTE_FAULTS[2048]}|receiver=GUI|")
-                        self.logger.error(f"absolutefault DETECTED: {ABSOLUTE_FAULTS[2048]}")
-                        self.logger.error(f"Stopping polling...")
-                        self.has_faulted = True
-                        continue
+                fault = await get_fault_event(motor_api, vals)
+                if fault is None:
+                    continue
+                if fault is False:
+                    self.logger.error("Getting recent fault was not succesful")
+                    continue
 
-                    # Check that its not a critical fault
-                    if is_critical_fault(vals):
-                        if l_has_faulted:
-                            await wsclient.send(f"event=fault|action=message|message=CRITICAL FAULT DETECTED: {CRITICAL_FAULTS[vals[0]]}|receiver=GUI|")
-                            self.logger.error(f"CRITICAL FAULT DETECTED: {CRITICAL_FAULTS[vals[0]]}")
-                        else:
-                            await wsclient.send(f"event=fault|action=message|message=CRITICAL FAULT DETECTED: {CRITICAL_FAULTS[vals[1]]}|receiver=GUI|")
-                            self.logger.error(f"CRITICAL FAULT DETECTED: {CRITICAL_FAULTS[vals[1]]}")
-                        self.has_faulted = True
-                    else:
-                        ### raise reset fault bit and reset the register to 0
-                        await motor_api.set_ieg_mode(motor_config.RESET_FAULT_VALUE)
-                        await motor_api.set_ieg_mode(0)
-                        self.logger.info("Fault cleared")
+                (kind, message) = fault
+                ## check if the fault is absolute
+                if kind == "absolute":
+                    await wsclient.send(f"event=fault|action=absolutefault|message={message}|receiver=GUI|")
+                    self.logger.error(f"absolutefault DETECTED: {message}")
+                    self.logger.error(f"Stopping polling...")
+                    self.has_faulted = True
+                # Check that its not a critical fault
+                elif kind == "critical":
+                    await wsclient.send(f"event=fault|action=message|message={message}|receiver=GUI|")
+                    self.logger.error(message)
+                    self.has_faulted = True
+                else:
+                    ### raise reset fault bit and reset the register to 0
+                    await motor_api.set_ieg_mode(motor_config.RESET_FAULT_VALUE)
+                    await motor_api.set_ieg_mode(0)
+                    self.logger.info(f"Fault cleared: {message}")
         except KeyboardInterrupt:
             self.logger.info("Polling stopped by user")
         except Exception as e:
             self.logger.error(f"Unexpected error in polling loop: {str(e)}")
         finally:
             clients.cleanup()
+            motor_api.close_journal()
             self.logger.info("Fault poller has been closed")
             self.wsclient.close()
 
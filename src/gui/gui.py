@@ -7,7 +7,8 @@ from utils.setup_logging import setup_logging
 from services.WebSocketClient import WebSocketClient
 import os
 import subprocess
-from utils.utils import get_exe_temp_dir,find_venv_python,started_from_exe, get_base_path, get_current_path, extract_part
+from utils.utils import get_exe_temp_dir,find_venv_python,started_from_exe, get_base_path, get_current_path
+from utils.message_parser import parse_message
 from helpers import gui_helpers as helpers
 from pathlib import Path
 from services.process_manager import ProcessManager
@@ -64,8 +65,9 @@ class ServerStartupGUI(QWidget):
 
     def handle_client_message(self, message):
         """Update the GUI label with WebSocket messages."""
-        event = extract_part("event=", message=message)
-        clientmessage = extract_part("message=", message=message)
+        parsed = parse_message(message)
+        event = parsed.event
+        clientmessage = parsed.message
         if not event:
             self.logger.error("No event specified in message.")
             return 
@@ -90,6 +92,9 @@ class ServerStartupGUI(QWidget):
             QMessageBox.information(self, "Info", "Motors have been initialized successfully")
         elif event == "connected":
             self.message_label.setText(clientmessage)
+        elif event == "connection":
+            self.logger.warning(clientmessage)
+            self.message_label.setText(clientmessage)
         elif event == "shutdown":
             asyncio.create_task(self.websocket_client.close())
             self.start_button.setEnabled(True)
@@ -1,8 +1,10 @@
 
 from utils.utils import convert_acc_rpm_revs, convert_to_revs, convert_vel_rpm_revs,format_response
 from helpers import communication_hub_helpers as helpers
+from services.telemetry_sampler import format_telemetry_message, format_history_message
+from utils.motion_frame import decode_motion_frame, MotionSequence, BINARY_PROTOCOL, MOTION_FRAME_VERSION
+from handlers.dispatcher import ActionDispatcher, format_stats_message
 import math
-from time import time
 async def write(self, pitch, roll, wsclient):
     try:
         result = helpers.validate_pitch_and_roll_values(pitch,roll)
@@ -14,13 +16,15 @@ async def write(self, pitch, roll, wsclient):
     except Exception as e:
         self.logger.error(f"Something went wrong in validating pitch and roll values: {e}")
         
-async def identify(self, identity, wsclient):
+async def identify(self, identity, wsclient, protocol=None):
     try:
         if identity:
             self.wsclients[wsclient]["identity"] = identity.lower()
             self.logger.info(f"Updated identity for {wsclient.remote_address}: {identity}")
         else:
             await wsclient.send("event=error|message=No identity was given, example action=identify|identity=<identity>|")
+        if protocol:
+            await negotiate_protocol(self, protocol, wsclient)
         if identity and identity == "gui":
             self.logger.info("Gui has been identified")
             if not self.motors_initialized:
@@ -29,13 +33,46 @@ async def identify(self, identity, wsclient):
     except Exception as e:
         self.logger.error(f"Something went wrong in identify action: {e}")
 
-async def rotate(self, pitch, roll, wsclient):
+async def negotiate_protocol(self, protocol, wsclient):
+    """protocol=binary lets the client send rotate commands as binary motion frames, everything else stays text"""
+    if protocol.lower() != BINARY_PROTOCOL:
+        await wsclient.send(f"event=error|message=Unknown protocol {protocol}, supported: {BINARY_PROTOCOL}|")
+        return
+    self.wsclients[wsclient]["motion_sequence"] = MotionSequence()
+    self.logger.info(f"{wsclient.remote_address} uses binary motion frames")
+    await wsclient.send(f"event=protocol|message={BINARY_PROTOCOL}|version={MOTION_FRAME_VERSION}|")
+
+async def rotate_binary(self, data, wsclient, received_at=None):
+    """Binary rotate frame, see utils/motion_frame.py"""
+    try:
+        sequence_tracker = self.wsclients[wsclient].get("motion_sequence")
+        if sequence_tracker is None:
+            await wsclient.send("event=error|message=Binary frames have not been negotiated, use action=identify|protocol=binary|")
+            return
+        (sequence, timestamp, pitch, roll) = decode_motion_frame(data)
+        if not math.isfinite(pitch) or not math.isfinite(roll):
+            raise ValueError(f"pitch and roll have to be finite, got {pitch} {roll}")
+        ### old frames that arrive late would move the platform backwards
+        if not sequence_tracker.accept(sequence):
+            return
+        trace = None
+        if self.latency_tracer is not None:
+            trace = self.latency_tracer.begin(received_at)
+            trace.mark("parse")
+        self.motion_writer.submit(pitch, roll, trace, timestamp=timestamp)
+    except ValueError as e:
+        self.logger.error(f"Invalid motion frame: {e}")
+        await wsclient.send("event=error|message=Invalid motion frame|")
+    except Exception as e:
+        self.logger.error(f"Error while handling a motion frame: {e}")
+
+async def rotate(self, pitch, roll, wsclient, trace=None):
     try:
         result = helpers.validate_pitch_and_roll_values(pitch, roll)
         if result:
             (pitch, roll) = result
-            await self.motor_api.rotate(pitch,roll)
-            self.ow_file.write(f"{time() - self.start_time}\n")
+            ### only stores the latest setpoint, motion writer task sends it to the motors
+            self.motion_writer.submit(pitch, roll, trace)
 
     except ValueError as e:
         self.logger.error(f"pitch and roll were not numbers: {e}")
@@ -54,6 +91,9 @@ async def clear_fault(self, wsclient):
             succes_response = "event=faultcleared|message=Fault cleared succesfully!|"
             fault_poller_found = False
             await wsclient.send(succes_response) # Sending to GUI
+            if self.fault_monitor is not None:
+                self.fault_monitor.fault_cleared()
+                fault_poller_found = True
             for sckt, info in self.wsclients.items():
                 if info["identity"] == "fault poller":
                     await sckt.send(succes_response)
@@ -175,12 +215,91 @@ async def absolutefault(self):
 
 async def read_telemetry(self, wsclient):
     try:
-        data = await self.motor_api.get_telemetry_data()
+        ### served from the background sampler when it has a fresh sample -> no extra modbus traffic
+        ### otherwise the drives are read, so a failing drive shows up as an error
+        data = self.telemetry_sampler.snapshot() if self.telemetry_sampler is not None else None
+        if data is None:
+            data = await self.motor_api.get_telemetry_data()
         if not data:
             await wsclient.send(f"event=error|message=Something went wrong while reading telemetry data|")
             return False
-        await wsclient.send(f"event=telemetrydata|message=boardtemp:{data[0]}*actuatortemp:{data[1]}*IC:{data[2]}*VBUS:{data[3]}*|")
+        await wsclient.send(format_telemetry_message(data))
     except Exception as e:
         self.logger.error(f"Something went wrong while reading telemetry data: {e}")
         await wsclient.send(f"event=error|message=Something went wrong while reading telemetry data|")
-        
\ No newline at end of file
+
+async def telemetry_history(self, seconds, wsclient):
+    try:
+        if self.telemetry_sampler is None:
+            await wsclient.send("event=error|message=Telemetry sampler is not running|")
+            return
+        seconds = float(seconds) if seconds else None
+        await wsclient.send(format_history_message(self.telemetry_sampler.history(seconds=seconds)))
+    except ValueError:
+        await wsclient.send("event=error|message=seconds has to be a number, example action=telemetryhistory|seconds=60|")
+    except Exception as e:
+        self.logger.error(f"Something went wrong while reading telemetry history: {e}")
+        await wsclient.send("event=error|message=Something went wrong while reading telemetry history|")
+
+async def subscribe_telemetry(self, wsclient):
+    if self.telemetry_sampler is None:
+        await wsclient.send("event=error|message=Telemetry sampler is not running|")
+        return
+    self.telemetry_sampler.subscribe(wsclient)
+    self.logger.info(f"{self.wsclients[wsclient]['identity']} subscribed to telemetry")
+
+async def unsubscribe_telemetry(self, wsclient):
+    if self.telemetry_sampler is not None:
+        self.telemetry_sampler.unsubscribe(wsclient)
+
+async def stats(self, wsclient):
+    """Per action call counts, latencies and error rates plus motion path stats"""
+    stats = {"actions": self.dispatcher.stats_dict()}
+    if self.motion_writer is not None:
+        stats["motion_writer"] = self.motion_writer.stats()
+    if self.motor_api is not None:
+        stats["modbus_scheduler"] = self.motor_api.scheduler_metrics()
+        stats["circuit_breakers"] = self.motor_api.breaker_stats()
+        stats["state_watchers"] = self.motor_api.watcher_stats()
+        stats["register_cache"] = self.motor_api.register_cache.stats()
+        stats["position_filter"] = self.motor_api.position_filter.stats()
+        if self.motor_api.side_writer is not None:
+            stats["side_writer"] = self.motor_api.side_writer.stats()
+    if self.connection_monitor is not None:
+        stats["connections"] = self.connection_monitor.stats()
+    await wsclient.send(format_stats_message(stats))
+
+async def _rotate(self, request):
+    trace = None
+    if self.latency_tracer is not None:
+        trace = self.latency_tracer.begin(request.received_at)
+        trace.mark("parse")
+    return await rotate(self, request.msg.pitch, request.msg.roll, request.wsclient, trace)
+
+async def _message(self, request):
+    (receiver, _, text, _, _) = helpers.extract_parts(request.msg)
+    return await message(self, receiver, request.wsclient, text)
+
+def build_action_dispatcher(logger) -> ActionDispatcher:
+    """Every websocket action and its preconditions"""
+    dispatcher = ActionDispatcher(logger)
+    register = dispatcher.register
+    ### motion
+    register("rotate", _rotate, requires_motors_initialized=False, log_calls=False)
+    register("binaryrotate", lambda hub, r: rotate_binary(hub, r.data, r.wsclient, r.received_at), requires_motors_initialized=False, binary=True, log_calls=False)
+    register("write", lambda hub, r: write(hub, r.msg.pitch, r.msg.roll, r.wsclient))
+    register("stop", lambda hub, r: stop_motors(hub), allowed_during_shutdown=True)
+    ### session
+    register("identify", lambda hub, r: identify(hub, r.msg.identity, r.wsclient, r.msg.protocol), requires_motors_initialized=False)
+    register("shutdown", lambda hub, r: hub.shutdown_server(r.wsclient))
+    register("message", _message)
+    register("stats", lambda hub, r: stats(hub, r.wsclient), requires_motors_initialized=False, allowed_during_shutdown=True)
+    ### faults
+    register("clearfault", lambda hub, r: clear_fault(hub, wsclient=r.wsclient), requires_motors_initialized=False)
+    register("absolutefault", lambda hub, r: absolutefault(hub))
+    ### telemetry
+    register("readtelemetry", lambda hub, r: read_telemetry(hub, r.wsclient))
+    register("telemetryhistory", lambda hub, r: telemetry_history(hub, r.msg.seconds, r.wsclient))
+    register("subscribetelemetry", lambda hub, r: subscribe_telemetry(hub, r.wsclient))
+    register("unsubscribetelemetry", lambda hub, r: unsubscribe_telemetry(hub, r.wsclient))
+    return dispatcher
@@ -0,0 +1,114 @@
+import json
+from dataclasses import dataclass
+from time import perf_counter
+from typing import Awaitable, Callable, Dict, Optional
+from utils.utils import format_response
+
+class ActionRequest:
+    """What a handler gets besides the hub: the parsed message (or raw binary frame) and who sent it"""
+    __slots__ = ("msg", "wsclient", "received_at", "data")
+
+    def __init__(self, msg, wsclient, received_at=None, data=None):
+        self.msg = msg
+        self.wsclient = wsclient
+        self.received_at = received_at
+        self.data = data
+
+@dataclass
+class ActionSpec:
+    name: str
+    handler: Callable[..., Awaitable]
+    requires_motors_initialized: bool = True
+    allowed_during_shutdown: bool = False
+    binary: bool = False # only reachable with binary websocket frames
+    log_calls: bool = True # log every call, off for high rate motion actions
+
+class ActionStats:
+    __slots__ = ("calls", "errors", "rejected", "total_time", "max_time")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed, failed) -> None:
+        self.calls += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        if failed:
+            self.errors += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "rejected": self.rejected,
+            "mean_ms": self.total_time / self.calls * 1000 if self.calls else 0.0,
+            "max_ms": self.max_time * 1000,
+        }
+
+class ActionDispatcher:
+    """
+    Maps action names to handler coroutines handler(hub, request). Checks the
+    actions preconditions against the hub and times every call. A handler that
+    raises or returns False counts as an error.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.actions: Dict[str, ActionSpec] = {}
+        self.stats: Dict[str, ActionStats] = {}
+
+    def register(self, name, handler, requires_motors_initialized=True, allowed_during_shutdown=False, binary=False, log_calls=True) -> None:
+        if name in self.actions:
+            raise ValueError(f"Action {name} is already registered")
+        self.actions[name] = ActionSpec(name, handler, requires_motors_initialized, allowed_during_shutdown, binary, log_calls)
+        self.stats[name] = ActionStats()
+
+    def _precondition_error(self, hub, spec) -> Optional[str]:
+        if hub.shutdown and not spec.allowed_during_shutdown:
+            return "message=Server has been given an order to shutdown"
+        if spec.requires_motors_initialized and not hub.motors_initialized:
+            return "message=Motors are not initialized or server has been given an order to shutdown"
+        return None
+
+    async def dispatch(self, hub, action, request: ActionRequest, binary=False):
+        wsclient = request.wsclient
+        spec = self.actions.get(action) if action else None
+        if spec is None or spec.binary != binary:
+            if not action:
+                await wsclient.send(format_response(event="error", message="message=No action given, example action=<action>"))
+            else:
+                await wsclient.send(format_response(event="error", message="message=no action found here is all the actions"))
+            return None
+
+        stats = self.stats[action]
+        error = self._precondition_error(hub, spec)
+        if error:
+            stats.rejected += 1
+            await wsclient.send(format_response(event="error", message=error))
+            return None
+
+        if spec.log_calls:
+            self.logger.info(f"processing action: {action}")
+        start = perf_counter()
+        failed = False
+        try:
+            result = await spec.handler(hub, request)
+            failed = result is False
+            return result
+        except Exception as e:
+            failed = True
+            self.logger.error(f"Unexpected error in action {action}: {e}")
+            return None
+        finally:
+            stats.record(perf_counter() - start, failed)
+
+    def stats_dict(self) -> dict:
+        return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+def format_stats_message(stats) -> str:
+    return f"event=stats|message={json.dumps(stats, separators=(',', ':'))}|"
@@ -1,4 +1,3 @@
-from utils.utils import extract_part
 from time import time
 
 
@@ -13,6 +12,16 @@ def close_tasks(self):
     if hasattr(self, "monitor_fault_poller"):
         self.monitor_fault_poller.cancel()
         self.logger.info("Closed monitor fault poller")
+    if getattr(self, "motion_writer", None) is not None:
+        self.motion_writer.stop()
+    if getattr(self, "telemetry_sampler", None) is not None:
+        self.telemetry_sampler.stop()
+    if getattr(self, "fault_monitor", None) is not None:
+        self.fault_monitor.stop()
+    if getattr(self, "connection_monitor", None) is not None:
+        self.connection_monitor.stop()
+    if getattr(self, "cache_verifier", None) is not None:
+        self.cache_verifier.stop()
 
 def validate_pitch_and_roll_values(pitch,roll):
     try:
@@ -35,13 +44,13 @@ def validate_message(self,receiver, message):
         
     return (False, None, f"event=error|message=No receiver was found in the server with this identity: {receiver}|")
 
-def extract_parts(msg): # example message: "action=STOP|receiver=startup|identity=fault_poller|message=CRITICAL FAULT!|pitch=40.3"
-    receiver = extract_part("receiver=", message=msg)
-    identity = extract_part("identity=", message=msg)
-    message = extract_part("message=", message=msg)
-    event = extract_part("event=", message=msg)
-    acceleration = extract_part("acc=", message=msg)
-    velocity = extract_part("vel=", message=msg)
+def extract_parts(msg): # msg is a parsed message, example: "action=STOP|receiver=startup|identity=fault_poller|message=CRITICAL FAULT!|pitch=40.3|"
+    receiver = msg.receiver
+    identity = msg.identity
+    message = msg.message
+    event = msg.event
+    acceleration = msg.acc
+    velocity = msg.vel
     if receiver:
         receiver = receiver.lower()
     ### if message has event append it to it
@@ -53,6 +62,15 @@ def extract_parts(msg): # example message: "action=STOP|receiver=startup|identit
 import asyncio
 import psutil
 
+def drive_launch_args(config):
+    """Launch params that point a child process to the same drives as the server"""
+    args = ["--server_left", config.SERVER_IP_LEFT, "--server_right", config.SERVER_IP_RIGHT, "--port", str(config.SERVER_PORT)]
+    if config.SERVER_PORT_LEFT:
+        args.extend(["--port_left", str(config.SERVER_PORT_LEFT)])
+    if config.SERVER_PORT_RIGHT:
+        args.extend(["--port_right", str(config.SERVER_PORT_RIGHT)])
+    return args
+
 async def monitor_fault_poller(self):
     """
     Heathbeat monitor that makes sure fault poller
@@ -63,7 +81,7 @@ async def monitor_fault_poller(self):
             pid = self.fault_poller_pid
             if pid and not psutil.pid_exists(pid):
                 self.logger.warning(f"fault_poller (PID: {pid}) is not running, restarting...")
-                new_pid = self.module_manager.launch_process("fault_poller")
+                new_pid = self.module_manager.launch_process("fault_poller", args=drive_launch_args(self.config))
                 self.fault_poller_pid = new_pid
                 self.logger.info(f"Restarted fault_poller with PID: {new_pid}")
                 del self.module_manager.processes[pid]
@@ -92,7 +110,7 @@ async def create_hearthbeat_monitor_tasks(self):
         return
     elif result:
         self.logger.info(f"No lingering process remaining.")
-    fault_poller_pid = self.process_manager.launch_process("fault_poller")
+    fault_poller_pid = self.process_manager.launch_process("fault_poller", args=drive_launch_args(self.config))
     self.fault_poller_pid = fault_poller_pid
     self.monitor_fault_poller = asyncio.create_task(monitor_fault_poller(self))
 
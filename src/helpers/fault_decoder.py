@@ -0,0 +1,74 @@
+from functools import lru_cache
+from typing import Tuple
+from constants.fault_codes import CRITICAL_FAULTS, ABSOLUTE_FAULTS
+from constants.oeg_mode import OEG_MODE
+
+### fault severity classes, higher is worse
+NONE = 0
+RECOVERABLE = 1
+CRITICAL = 2
+ABSOLUTE = 3
+SEVERITY_NAMES = ("none", "recoverable", "critical", "absolute")
+
+def _fault_bit(bit):
+    if bit in ABSOLUTE_FAULTS:
+        return (ABSOLUTE, ABSOLUTE_FAULTS[bit])
+    if bit in CRITICAL_FAULTS:
+        return (CRITICAL, CRITICAL_FAULTS[bit])
+    return (RECOVERABLE, f"Fault bit {bit.bit_length() - 1}")
+
+def _status_bit(bit):
+    return OEG_MODE.get(bit, f"Status bit {bit.bit_length() - 1}")
+
+def _build_table(decode_bit):
+    """
+    65536 entry table of the decoded set bits of every 16 bit value, lowest bit first.
+    Every value is its lowest set bit plus a value that is already in the table.
+    """
+    bits = {1 << n: decode_bit(1 << n) for n in range(16)}
+    table = [()] * 65536
+    for value in range(1, 65536):
+        table[value] = (bits[value & -value],) + table[value & (value - 1)]
+    return table
+
+@lru_cache(maxsize=None)
+def fault_tables():
+    """
+    RECENT_FAULT/PRESENT_FAULT word -> ((severity, description), ...) and -> its worst severity.
+    Built on first use (~0.2 s), most processes never see a fault.
+    """
+    conditions = _build_table(_fault_bit)
+    severities = bytes(max((severity for (severity, _) in entry), default=NONE) for entry in conditions)
+    return (conditions, severities)
+
+@lru_cache(maxsize=None)
+def status_table():
+    """OEG_STATUS word -> (description, ...)"""
+    return _build_table(_status_bit)
+
+def fault_severity(value) -> int:
+    return fault_tables()[1][value & 0xFFFF]
+
+def fault_conditions(value) -> Tuple[Tuple[int, str], ...]:
+    return fault_tables()[0][value & 0xFFFF]
+
+def status_conditions(value) -> Tuple[str, ...]:
+    return status_table()[value & 0xFFFF]
+
+def describe_faults(vals, sides=(True, True)) -> Tuple[int, str]:
+    """
+    Worst severity of the fault words (left, right) of the drives in sides and the
+    descriptions of the conditions with that severity. When both drives have them
+    and they differ, each drives conditions are named separately.
+    """
+    severity = max((fault_severity(value) for (value, included) in zip(vals, sides) if included), default=NONE)
+    parts = []
+    for (side, value, included) in zip(("left", "right"), vals, sides):
+        texts = [text for (condition, text) in fault_conditions(value) if condition == severity]
+        if included and texts:
+            parts.append((side, ", ".join(texts)))
+    if not parts:
+        return (severity, "No fault code")
+    if len(parts) == 1 or parts[0][1] == parts[1][1]:
+        return (severity, parts[0][1])
+    return (severity, "; ".join(f"{side} drive: {text}" for (side, text) in parts))
@@ -1,21 +1,44 @@
 from utils.utils import is_nth_bit_on
-from constants.fault_codes import CRITICAL_FAULTS, ABSOLUTE_FAULTS
+from helpers.fault_decoder import fault_severity, describe_faults, CRITICAL, ABSOLUTE, SEVERITY_NAMES
 
 def has_faulted(data):
     left, right = data
     return (is_nth_bit_on(3, left), is_nth_bit_on(3, right))
 
 def is_critical_fault(data):
+    """True if either fault word has a critical (or worse) bit, in any combination with other bits"""
     left, right = data 
-    if not left in CRITICAL_FAULTS and not right in CRITICAL_FAULTS:
-        return False
-    return True
+    return fault_severity(left) >= CRITICAL or fault_severity(right) >= CRITICAL
 
 def is_absolute_fault(data):
     left, right = data
-    if not left in ABSOLUTE_FAULTS and not right in ABSOLUTE_FAULTS:
+    return fault_severity(left) == ABSOLUTE or fault_severity(right) == ABSOLUTE
+
+def fault_event(fault_vals, faulted=(True, True)):
+    """
+    (kind, message) of the fault words (left, right) of the drives that have faulted,
+    kind is "absolute", "critical" or "recoverable".
+    """
+    (severity, description) = describe_faults(fault_vals, faulted)
+    if severity < CRITICAL:
+        return ("recoverable", description)
+    return (SEVERITY_NAMES[severity], f"{SEVERITY_NAMES[severity].upper()} FAULT DETECTED: {description}")
+
+async def get_fault_event(motor_api, status_vals):
+    """
+    Classifies the fault behind OEG_STATUS values (left, right).
+    Returns None if neither drive has faulted, False if reading the fault register fails,
+    otherwise (kind, message), see fault_event.
+    """
+    faulted = has_faulted(status_vals)
+    if not any(faulted):
+        return None
+
+    vals = await motor_api.get_recent_fault()
+    if not vals:
         return False
-    return True
+
+    return fault_event(vals, faulted)
 
 
 async def validate_fault_register(self, gui_socket) -> bool:
@@ -23,8 +46,8 @@ async def validate_fault_register(self, gui_socket) -> bool:
     Check if the fault register have critical or absolute fault. Returns True if there's none.
     """
     vals = await self.check_fault_stauts(log=True)
-    l_has_faulted, r_has_faulted = has_faulted(vals) 
-    if (l_has_faulted or r_has_faulted):
+    faulted = has_faulted(vals) 
+    if any(faulted):
 
         vals = await self.get_present_fault()
 
@@ -32,22 +55,17 @@ async def validate_fault_register(self, gui_socket) -> bool:
             self.logger.error("Getting recent fault was not succesful")
             return False
 
+        (kind, message) = fault_event(vals, faulted)
         ### check if the fault is absolute
-        if is_absolute_fault(vals):
+        if kind == "absolute":
             if gui_socket:
-                await gui_socket.send(f"event=absolutefault|message=ABSOLUTE FAULT DETECTED: {ABSOLUTE_FAULTS[2048]}|")
+                await gui_socket.send(f"event=absolutefault|message={message}|")
             return False
         
         # Check that its not a critical fault
-        if is_critical_fault(vals):
-            if l_has_faulted:
-                if gui_socket: 
-                    await gui_socket.send(f"event=fault|message=CRITICAL FAULT DETECTED: {CRITICAL_FAULTS[vals[0]]}|")
-                return False
-            else:
-                if gui_socket:
-                    await gui_socket.send(f"event=fault|message=CRITICAL FAULT DETECTED: {CRITICAL_FAULTS[vals[1]]}|")
-                self.logger.error(f"CRITICAL FAULT DETECTED: {CRITICAL_FAULTS[vals[1]]}")
-                return False
-    else:
-        return True
\ No newline at end of file
+        if kind == "critical":
+            if gui_socket:
+                await gui_socket.send(f"event=fault|message={message}|")
+            self.logger.error(message)
+            return False
+    return True
\ No newline at end of file
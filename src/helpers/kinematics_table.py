@@ -0,0 +1,167 @@
+import json
+import math
+import random
+from pathlib import Path
+from typing import Callable, List
+from helpers.motor_api_helper import calculate_servo_revs, clamp_target_pos
+
+### Revolutions are stored pre-scaled into the drives 16.16 position format (revs * 2^16)
+POS_SCALE = 2**16
+
+### calculate_servo_revs is piecewise: Relaatio changes formula at pitch -2/2 and is exactly 1
+### when roll is 0. Each piece gets its own grid so we never interpolate across a jump.
+### (low, high, low_open, high_open)
+PITCH_SEGMENTS = ((-8.5, -2.0, False, True), (-2.0, 2.0, False, False), (2.0, 8.5, True, False))
+ROLL_SEGMENTS = ((-15.0, 0.0, False, True), (0.0, 0.0, False, False), (0.0, 15.0, True, False))
+
+### open segment edges are evaluated this much inside the segment
+EDGE_NUDGE = 1e-9
+
+def _axis_nodes(low, high, low_open, high_open, resolution) -> List[float]:
+    """Evenly spaced node positions covering [low, high] with a step of at most resolution"""
+    span = high - low
+    steps = max(1, math.ceil(span / resolution - 1e-9)) if span > 0 else 0
+    nodes = [low + span * i / steps for i in range(steps + 1)] if steps else [low]
+    if low_open:
+        nodes[0] += EDGE_NUDGE
+    if high_open:
+        nodes[-1] -= EDGE_NUDGE
+    return nodes
+
+class KinematicsTable:
+    """
+    Precomputed pitch/roll -> host position lookup table.
+    The grid stores both servos target revs in 16.16 form, lookup bilinearly
+    interpolates them and applies the safety clamp on the integer words,
+    so rotate costs a table lookup instead of the full kinematics.
+    """
+    FILE_VERSION = 1
+
+    def __init__(self, config, resolution, grids):
+        """grids: one (pitch_min, roll_min, inv_pitch_step, inv_roll_step, pitch_steps, roll_steps, left, right)
+        tuple per PITCH_SEGMENTS x ROLL_SEGMENTS piece, in that order"""
+        self.config = config
+        self.resolution = resolution
+        self.grids = grids
+        self.pitch_min = PITCH_SEGMENTS[0][0]
+        self.pitch_max = PITCH_SEGMENTS[-1][1]
+        self.roll_min = ROLL_SEGMENTS[0][0]
+        self.roll_max = ROLL_SEGMENTS[-1][1]
+
+    @staticmethod
+    def _make_grid(pitch_nodes, roll_nodes, left, right) -> tuple:
+        pitch_steps = len(pitch_nodes) - 1
+        roll_steps = len(roll_nodes) - 1
+        inv_pitch_step = pitch_steps / (pitch_nodes[-1] - pitch_nodes[0]) if pitch_steps else 0.0
+        inv_roll_step = roll_steps / (roll_nodes[-1] - roll_nodes[0]) if roll_steps else 0.0
+        return (pitch_nodes[0], roll_nodes[0], inv_pitch_step, inv_roll_step, pitch_steps, roll_steps, left, right)
+
+    @classmethod
+    def build(cls, config, resolution=0.1, kinematics: Callable[[float, float], tuple] = calculate_servo_revs):
+        """
+        Evaluates kinematics(pitch, roll) -> (left_revs, right_revs) on every grid node.
+        Resolution is the maximum node spacing in degrees.
+        """
+        if resolution <= 0:
+            raise ValueError("Kinematics table resolution has to be positive")
+
+        grids = []
+        for (p_low, p_high, p_low_open, p_high_open) in PITCH_SEGMENTS:
+            pitch_nodes = _axis_nodes(p_low, p_high, p_low_open, p_high_open, resolution)
+            for (r_low, r_high, r_low_open, r_high_open) in ROLL_SEGMENTS:
+                roll_nodes = _axis_nodes(r_low, r_high, r_low_open, r_high_open, resolution)
+                left = []
+                right = []
+                for pitch in pitch_nodes:
+                    for roll in roll_nodes:
+                        left_revs, right_revs = kinematics(pitch, roll)
+                        left.append(left_revs * POS_SCALE)
+                        right.append(right_revs * POS_SCALE)
+                grids.append(cls._make_grid(pitch_nodes, roll_nodes, left, right))
+        return cls(config, resolution, grids)
+
+    def lookup(self, pitch_value, roll_value) -> List[list]:
+        """
+        Returns:
+            list[[left_decimal, left_whole], [right_decimal, right_whole]]
+        """
+        (left_pos, right_pos) = self.lookup_pos(pitch_value, roll_value)
+        return clamp_target_pos(left_pos, right_pos, self.config)
+
+    def lookup_pos(self, pitch_value, roll_value) -> tuple[int, int]:
+        """Interpolated (left, right) revs in 16.16 form before the safety clamp"""
+        pitch = self.pitch_min if pitch_value < self.pitch_min else self.pitch_max if pitch_value > self.pitch_max else pitch_value
+        roll = self.roll_min if roll_value < self.roll_min else self.roll_max if roll_value > self.roll_max else roll_value
+
+        ### same comparisons as calculate_servo_revs uses to pick the formula
+        segment = 0 if pitch < -2 else 6 if pitch > 2 else 3
+        segment += 0 if roll < 0 else 2 if roll > 0 else 1
+        (pitch_min, roll_min, inv_pitch_step, inv_roll_step, pitch_steps, roll_steps, left, right) = self.grids[segment]
+
+        tp = (pitch - pitch_min) * inv_pitch_step
+        i = int(tp)
+        if i >= pitch_steps:
+            i = pitch_steps - 1 if pitch_steps else 0
+        tp = tp - i if tp > 0 else 0.0
+
+        tr = (roll - roll_min) * inv_roll_step
+        j = int(tr)
+        if j >= roll_steps:
+            j = roll_steps - 1 if roll_steps else 0
+        tr = tr - j if tr > 0 else 0.0
+
+        row = roll_steps + 1
+        i00 = i * row + j
+        i01 = i00 + 1 if roll_steps else i00
+        i10 = i00 + row if pitch_steps else i00
+        i11 = i10 + 1 if roll_steps else i10
+
+        l0 = left[i00] + (left[i01] - left[i00]) * tr
+        l1 = left[i10] + (left[i11] - left[i10]) * tr
+        r0 = right[i00] + (right[i01] - right[i00]) * tr
+        r1 = right[i10] + (right[i11] - right[i10]) * tr
+        return (int(l0 + (l1 - l0) * tp), int(r0 + (r1 - r0) * tp))
+
+    def verify(self, kinematics: Callable[[float, float], tuple] = calculate_servo_revs, samples=20000, seed=0) -> int:
+        """
+        Compares the table against the analytic kinematics on random points and on every
+        segment edge. Returns the maximum error in 1/65536 revolutions.
+        The comparison is done before the safety clamp, the clamp itself is the same code on both
+        paths and would only turn tiny interpolation errors at its wrap-around points into full revolutions.
+        """
+        rng = random.Random(seed)
+        points = [(rng.uniform(self.pitch_min, self.pitch_max), rng.uniform(self.roll_min, self.roll_max)) for _ in range(samples)]
+        edges_pitch = [self.pitch_min, -2.0, 2.0, self.pitch_max]
+        edges_roll = [self.roll_min, 0.0, self.roll_max]
+        points.extend((p, r) for p in edges_pitch for r in edges_roll)
+
+        max_error = 0
+        for pitch, roll in points:
+            (left_revs, right_revs) = kinematics(pitch, roll)
+            (left_pos, right_pos) = self.lookup_pos(pitch, roll)
+            error = max(abs(left_pos - int(left_revs * POS_SCALE)), abs(right_pos - int(right_revs * POS_SCALE)))
+            max_error = max(max_error, error)
+        return max_error
+
+    def save(self, path) -> None:
+        data = {
+            "version": self.FILE_VERSION,
+            "resolution": self.resolution,
+            "grids": [list(grid) for grid in self.grids],
+        }
+        Path(path).write_text(json.dumps(data), encoding="utf-8")
+
+    @classmethod
+    def load(cls, config, path, resolution=None):
+        """Loads a table saved with save(). Returns None if the file is missing or was built with another resolution"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != cls.FILE_VERSION:
+            return None
+        if resolution is not None and not math.isclose(data["resolution"], resolution):
+            return None
+        if len(data["grids"]) != len(PITCH_SEGMENTS) * len(ROLL_SEGMENTS):
+            return None
+        return cls(config, data["resolution"], [tuple(grid) for grid in data["grids"]])
@@ -1,5 +1,7 @@
 import math
+import numpy as np
 from utils.utils import unnormalize_decimal
+from settings.motors_config import MotorConfig
 from typing import Union
 
 def get_register_values(data):
@@ -53,56 +55,157 @@ def clamp_target_revs(left_revs, right_revs, config) -> list[list, list]:
 
     return [[left_pos_low, left_whole], [right_pos_low, right_whole]]
 
-def calculate_target_revs(self, pitch_value, roll_value) -> Union[list, None]:
-    """Calculates the target revolutions and unnormalizes the decimal part
-    while respecting the  motors safety limits
+def clamp_target_pos(left_pos, right_pos, config) -> list[list, list]:
+    """Same as clamp_target_revs but takes the revs already in 16.16 integer form
+    (whole << 16 | decimal), used by the precomputed kinematics table
+        Returns:
+            list[[left_decimal, left_whole], [right_decimal, right_whole)]]
+    """
+    left_whole = left_pos >> 16
+    left_pos_low = left_pos & 0xFFFF
+    right_whole = right_pos >> 16
+    right_pos_low = right_pos & 0xFFFF
+
+    if left_whole <= config.MIN_POS_WHOLE:
+            left_pos_low = max(config.MIN_POS_DECIMAL, left_pos_low)
+            left_whole = config.MIN_POS_WHOLE
+
+    if right_whole <= config.MIN_POS_WHOLE:
+            right_pos_low = max(config.MIN_POS_DECIMAL, right_pos_low)
+            right_whole = config.MIN_POS_WHOLE
+
+    if left_whole >= config.MAX_POS_WHOLE:
+            left_pos_low = min(config.MAX_POS_DECIMAL, left_pos_low)
+            left_whole = config.MAX_POS_WHOLE
+
+    if right_whole >= config.MAX_POS_WHOLE:
+            right_pos_low = min(config.MAX_POS_DECIMAL, right_pos_low)
+            right_whole = config.MAX_POS_WHOLE
+
+    return [[left_pos_low, left_whole], [right_pos_low, right_whole]]
+
+def calculate_servo_revs(pitch_value, roll_value) -> tuple[float, float]:
+    """Platform kinematics without the safety clamping
     Args:
         pitch_value (float): -8.5-8.5
         roll_value (float): -15.0-15.0
     Returns:
-        tuple or None: ((left_pos_low, left_whole), (right_pos_low, right_whole))
-        if success, None if something went wrong
+        tuple: (left_revs, right_revs)
     """
-    try:
-        roll_value = max(-8.5, min(roll_value, 8.5))
-        # Tarkistetaan että annettu pitch -kulma on välillä -8.5 <-> 8.5
-        pitch_value = max(-8.5, min(pitch_value, 8.5))
+    roll_value = max(-8.5, min(roll_value, 8.5))
+    # Tarkistetaan että annettu pitch -kulma on välillä -8.5 <-> 8.5
+    pitch_value = max(-8.5, min(pitch_value, 8.5))
 
-        # Laske MaxRoll pitch -kulman avulla
-        MaxRoll = 0.002964 * pitch_value**4 + 0.000939 * pitch_value**3 - 0.424523 * pitch_value**2 - 0.05936 * pitch_value + 15.2481
+    # Laske MaxRoll pitch -kulman avulla
+    MaxRoll = 0.002964 * pitch_value**4 + 0.000939 * pitch_value**3 - 0.424523 * pitch_value**2 - 0.05936 * pitch_value + 15.2481
 
-        # Laske MinRoll MaxRoll -arvon avulla
-        MinRoll = -1 * MaxRoll
+    # Laske MinRoll MaxRoll -arvon avulla
+    MinRoll = -1 * MaxRoll
 
-        # Verrataan Roll -kulmaa MaxRoll ja MinRoll -arvoihin
-        roll_value = max(MinRoll, min(roll_value, MaxRoll))
+    # Verrataan Roll -kulmaa MaxRoll ja MinRoll -arvoihin
+    roll_value = max(MinRoll, min(roll_value, MaxRoll))
 
-        # Valitse käytettävä Roll -lauseke
-        dif = roll_value - 0
-        if dif == 0:
-        # if roll_value == 0:
-            Relaatio = 1
-        elif pitch_value < -2:
-            Relaatio = 0.984723 * (1.5144)**roll_value
-        elif pitch_value > 2:
-            Relaatio = 0.999843 * (1.08302)**roll_value
-        else:    
-            Relaatio = 1.0126 * (1.22807)**roll_value
+    # Valitse käytettävä Roll -lauseke
+    dif = roll_value - 0
+    if dif == 0:
+    # if roll_value == 0:
+        Relaatio = 1
+    elif pitch_value < -2:
+        Relaatio = 0.984723 * (1.5144)**roll_value
+    elif pitch_value > 2:
+        Relaatio = 0.999843 * (1.08302)**roll_value
+    else:    
+        Relaatio = 1.0126 * (1.22807)**roll_value
 
-        # Laske keskipituus
-        Keskipituus = 0.027212 * (pitch_value)**2 + 8.73029 * pitch_value + 73.9818
+    # Laske keskipituus
+    Keskipituus = 0.027212 * (pitch_value)**2 + 8.73029 * pitch_value + 73.9818
 
-        # Määritä servomoottorien pituudet
-        # Vasen servomoottori kierroksina
-        VasenServo = ((2 * Keskipituus * Relaatio) / (1 + Relaatio)) / (0.2 * 25.4)
+    # Määritä servomoottorien pituudet
+    # Vasen servomoottori kierroksina
+    VasenServo = ((2 * Keskipituus * Relaatio) / (1 + Relaatio)) / (0.2 * 25.4)
 
-        # Oikea servomoottori kierroksina
-        OikeaServo = ((2 * Keskipituus) / (1 + Relaatio)) / (0.2 * 25.4) 
+    # Oikea servomoottori kierroksina
+    OikeaServo = ((2 * Keskipituus) / (1 + Relaatio)) / (0.2 * 25.4) 
 
+    return (VasenServo, OikeaServo)
+
+def calculate_target_revs(self, pitch_value, roll_value) -> Union[list, None]:
+    """Calculates the target revolutions and unnormalizes the decimal part
+    while respecting the  motors safety limits
+    Args:
+        pitch_value (float): -8.5-8.5
+        roll_value (float): -15.0-15.0
+    Returns:
+        tuple or None: ((left_pos_low, left_whole), (right_pos_low, right_whole))
+        if success, None if something went wrong
+    """
+    try:
+        (VasenServo, OikeaServo) = calculate_servo_revs(pitch_value, roll_value)
         revolutions = clamp_target_revs(VasenServo, OikeaServo, config=self.config)
         return revolutions
     except Exception as e:
         self.logger.error(f"soemthing went wrong in trying to calculate modbuscntrl vals")
         return None
-    
 
+def calculate_servo_revs_batch(pitch_array, roll_array) -> tuple[np.ndarray, np.ndarray]:
+    """Vectorized calculate_servo_revs for whole arrays of samples
+    Returns:
+        tuple: (left_revs, right_revs) float64 arrays of shape (N,)
+    """
+    pitch = np.clip(np.asarray(pitch_array, dtype=np.float64).ravel(), -8.5, 8.5)
+    roll = np.clip(np.asarray(roll_array, dtype=np.float64).ravel(), -8.5, 8.5)
+    if pitch.shape != roll.shape:
+        raise ValueError(f"pitch and roll arrays have different lengths: {pitch.size} != {roll.size}")
+
+    max_roll = 0.002964 * pitch**4 + 0.000939 * pitch**3 - 0.424523 * pitch**2 - 0.05936 * pitch + 15.2481
+    roll = np.maximum(-max_roll, np.minimum(roll, max_roll))
+
+    relaatio = np.where(pitch < -2, 0.984723 * np.power(1.5144, roll),
+               np.where(pitch > 2, 0.999843 * np.power(1.08302, roll),
+                        1.0126 * np.power(1.22807, roll)))
+    relaatio = np.where(roll == 0, 1.0, relaatio)
+
+    keskipituus = 0.027212 * pitch**2 + 8.73029 * pitch + 73.9818
+    left_revs = ((2 * keskipituus * relaatio) / (1 + relaatio)) / (0.2 * 25.4)
+    right_revs = ((2 * keskipituus) / (1 + relaatio)) / (0.2 * 25.4)
+    return (left_revs, right_revs)
+
+def _clamp_side_batch(revs, config) -> tuple[np.ndarray, np.ndarray]:
+    decimal, whole = np.modf(revs)
+    decimal = np.minimum(config.MAX_POS32_DECIMAL, decimal)
+    pos_low = np.abs(np.trunc(decimal * 2**16))
+
+    below = whole <= config.MIN_POS_WHOLE
+    pos_low = np.where(below, np.maximum(config.MIN_POS_DECIMAL, pos_low), pos_low)
+    whole = np.where(below, config.MIN_POS_WHOLE, whole)
+
+    above = whole >= config.MAX_POS_WHOLE
+    pos_low = np.where(above, np.minimum(config.MAX_POS_DECIMAL, pos_low), pos_low)
+    whole = np.where(above, config.MAX_POS_WHOLE, whole)
+    return (pos_low, whole)
+
+def clamp_target_revs_batch(left_revs, right_revs, config) -> np.ma.MaskedArray:
+    """Vectorized clamp_target_revs
+        Returns:
+            uint16 masked array of shape (N, 2, 2): [[left_decimal, left_whole], [right_decimal, right_whole]] per sample,
+            samples with a NaN or infinite revs value are masked (None in tolist()), the scalar path has no value for them either
+    """
+    left_revs = np.asarray(left_revs, dtype=np.float64).ravel()
+    right_revs = np.asarray(right_revs, dtype=np.float64).ravel()
+    invalid = ~(np.isfinite(left_revs) & np.isfinite(right_revs))
+    registers = np.empty((left_revs.size, 2, 2), dtype=np.uint16)
+    registers[:, 0, 0], registers[:, 0, 1] = _clamp_side_batch(np.where(invalid, 0.0, left_revs), config)
+    registers[:, 1, 0], registers[:, 1, 1] = _clamp_side_batch(np.where(invalid, 0.0, right_revs), config)
+    return np.ma.masked_array(registers, mask=np.broadcast_to(invalid[:, None, None], registers.shape).copy())
+
+def calculate_target_revs_batch(pitch_array, roll_array, config=MotorConfig()) -> np.ma.MaskedArray:
+    """Vectorized calculate_target_revs for validating and pre-planning recorded trajectories offline
+    Args:
+        pitch_array: pitch samples (-8.5-8.5)
+        roll_array: roll samples (-15.0-15.0), same length as pitch_array
+    Returns:
+        uint16 masked array of shape (N, 2, 2): [[left_pos_low, left_whole], [right_pos_low, right_whole]] per sample,
+        samples with a NaN pitch or roll are masked like in clamp_target_revs_batch
+    """
+    (left_revs, right_revs) = calculate_servo_revs_batch(pitch_array, roll_array)
+    return clamp_target_revs_batch(left_revs, right_revs, config)
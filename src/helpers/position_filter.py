@@ -0,0 +1,76 @@
+from time import monotonic
+from typing import Optional
+
+SIDES = ("left", "right")
+
+class _Suppressed:
+    """
+    What MotorApi.set_host_position returns when the filter left every drive out.
+    Truthy like True because the drives already hold the setpoint, use
+    `result is SUPPRESSED` to tell it apart from an acknowledged write.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return "SUPPRESSED"
+
+SUPPRESSED = _Suppressed()
+
+class _SideState:
+    __slots__ = ("position", "written_at")
+
+    def __init__(self):
+        self.position: Optional[int] = None
+        self.written_at = 0.0
+
+class PositionWriteFilter:
+    """
+    Per drive dead-band for host position writes. A [low, whole] setpoint within
+    deadband (1/65536 revs) of the last acknowledged one is not written, unless
+    keepalive seconds have passed since that drives last write (0 never refreshes).
+    invalidate() forgets the acknowledged positions, e.g. after a drive restart.
+    """
+    def __init__(self, deadband=0, keepalive=1.0, clock=monotonic):
+        self.deadband = deadband
+        self.keepalive = keepalive
+        self.clock = clock
+        self.sides = {side: _SideState() for side in SIDES}
+        self.suppressed = {side: 0 for side in SIDES}
+        self.written = {side: 0 for side in SIDES}
+        self.keepalives = {side: 0 for side in SIDES}
+
+    def needs_write(self, side, values) -> bool:
+        """values: [low, whole] of the new setpoint"""
+        state = self.sides[side]
+        if state.position is None:
+            return True
+        if abs((values[1] << 16 | values[0]) - state.position) > self.deadband:
+            return True
+        if self.keepalive and self.clock() - state.written_at >= self.keepalive:
+            self.keepalives[side] += 1
+            return True
+        self.suppressed[side] += 1
+        return False
+
+    def acknowledge(self, side, values) -> None:
+        state = self.sides[side]
+        state.position = values[1] << 16 | values[0]
+        state.written_at = self.clock()
+        self.written[side] += 1
+
+    def invalidate(self, side=None) -> None:
+        for name in (SIDES if side is None else (side,)):
+            self.sides[name].position = None
+
+    def stats(self) -> dict:
+        return {
+            side: {
+                "written": self.written[side],
+                "suppressed": self.suppressed[side],
+                "keepalives": self.keepalives[side],
+            }
+            for side in SIDES
+        }
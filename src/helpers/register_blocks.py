@@ -0,0 +1,55 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+
+### Modbus limits a single read_holding_registers request to 125 registers
+MODBUS_MAX_READ_COUNT = 125
+
+@dataclass
+class RegisterBlock:
+    """One read_holding_registers transaction covering several registers"""
+    address: int
+    count: int
+    ### name -> (offset inside the block, register count)
+    slices: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+
+def plan_register_blocks(registers: Dict[str, Tuple[int, int]], max_gap=8, max_size=32) -> List[RegisterBlock]:
+    """
+    Merges nearby registers into as few read requests as possible.
+    Args:
+        registers: name -> (address, count)
+        max_gap: max number of unused registers allowed between two merged registers
+        max_size: max register count of a single block
+    Returns:
+        list of RegisterBlock sorted by address
+    """
+    max_size = min(max_size, MODBUS_MAX_READ_COUNT)
+    blocks: List[RegisterBlock] = []
+    for name, (address, count) in sorted(registers.items(), key=lambda item: item[1][0]):
+        if count > max_size:
+            raise ValueError(f"Register {name} count {count} is larger than the max block size {max_size}")
+
+        if blocks:
+            block = blocks[-1]
+            block_end = block.address + block.count
+            new_end = max(block_end, address + count)
+            if address - block_end <= max_gap and new_end - block.address <= max_size:
+                block.count = new_end - block.address
+                block.slices[name] = (address - block.address, count)
+                continue
+
+        blocks.append(RegisterBlock(address=address, count=count, slices={name: (0, count)}))
+    return blocks
+
+def slice_register_blocks(blocks: List[RegisterBlock], results) -> Dict[str, Tuple[list, list]]:
+    """
+    Cuts the block read results back into the planned registers.
+    Args:
+        results: list of (left_vals, right_vals) per block in the same order as blocks
+    Returns:
+        name -> (left_vals, right_vals)
+    """
+    values = {}
+    for block, (left_vals, right_vals) in zip(blocks, results):
+        for name, (offset, count) in block.slices.items():
+            values[name] = (left_vals[offset:offset + count], right_vals[offset:offset + count])
+    return values
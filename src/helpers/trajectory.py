@@ -0,0 +1,148 @@
+import math
+from collections import deque
+from typing import Optional, Tuple
+
+LINEAR = "linear"
+HERMITE = "hermite"
+INTERPOLATIONS = (LINEAR, HERMITE)
+
+class Trajectory:
+    """
+    Timestamped (left, right) rev setpoints that can be sampled at any time in between.
+    linear interpolates straight between the neighbouring setpoints, hermite runs a
+    cubic Hermite curve through them with finite difference (Catmull-Rom) tangents,
+    so the velocity doesn't jump at every setpoint. Before the first and after the
+    last setpoint the end values are held, nothing is extrapolated.
+    """
+    def __init__(self, interpolation=HERMITE, max_points=64):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation: {interpolation}, expected one of {INTERPOLATIONS}")
+        self.interpolation = interpolation
+        self.points = deque(maxlen=max_points)
+
+    def push(self, t, left, right) -> bool:
+        """Adds a setpoint, returns False if it is not newer than the latest one"""
+        if self.points and t <= self.points[-1][0]:
+            return False
+        self.points.append((t, left, right))
+        return True
+
+    def clear(self) -> None:
+        self.points.clear()
+
+    def latest(self) -> Optional[Tuple[float, float, float]]:
+        return self.points[-1] if self.points else None
+
+    def _tangent(self, k, side):
+        points = self.points
+        before = points[k - 1] if k > 0 else points[k]
+        after = points[k + 1] if k + 1 < len(points) else points[k]
+        dt = after[0] - before[0]
+        return (after[side] - before[side]) / dt if dt > 0 else 0.0
+
+    def sample(self, t) -> Optional[Tuple[float, float]]:
+        """(left, right) revs at t or None if there are no setpoints"""
+        points = self.points
+        if not points:
+            return None
+        if t <= points[0][0]:
+            return (points[0][1], points[0][2])
+        if t >= points[-1][0]:
+            return (points[-1][1], points[-1][2])
+
+        ### segment k..k+1 that contains t, the last ones are the usual case
+        k = len(points) - 2
+        while points[k][0] > t:
+            k -= 1
+        ### setpoints that can't be sampled anymore, one is kept for the tangents
+        while k > 1:
+            points.popleft()
+            k -= 1
+
+        (t0, left0, right0) = points[k]
+        (t1, left1, right1) = points[k + 1]
+        h = t1 - t0
+        s = (t - t0) / h
+        if self.interpolation == LINEAR:
+            return (left0 + (left1 - left0) * s, right0 + (right1 - right0) * s)
+
+        s2 = s * s
+        s3 = s2 * s
+        h00 = 2 * s3 - 3 * s2 + 1
+        h10 = s3 - 2 * s2 + s
+        h01 = -2 * s3 + 3 * s2
+        h11 = s3 - s2
+        return (
+            h00 * left0 + h10 * h * self._tangent(k, 1) + h01 * left1 + h11 * h * self._tangent(k + 1, 1),
+            h00 * right0 + h10 * h * self._tangent(k, 2) + h01 * right1 + h11 * h * self._tangent(k + 1, 2),
+        )
+
+class MotionLimiter:
+    """
+    Follows a target position sampled every period seconds while keeping velocity,
+    acceleration and jerk within their limits (revs/s, revs/s^2, revs/s^3), 0 disables a limit.
+    A trapezoidal follower limits velocity and acceleration and slows down in time to
+    stop at the target without overshooting. Its output is averaged over
+    2 * max_acceleration / max_jerk seconds (long enough for a full acceleration
+    reversal), which turns the acceleration steps into ramps (S-curve) at the cost
+    of half that window of extra lag.
+    """
+    def __init__(self, period, max_velocity=0.0, max_acceleration=0.0, max_jerk=0.0):
+        if period <= 0:
+            raise ValueError(f"Limiter period has to be positive, got: {period}")
+        self.period = period
+        self.max_velocity = max_velocity
+        self.max_acceleration = max_acceleration
+        self.max_jerk = max_jerk
+        window = 1
+        if max_jerk and max_acceleration:
+            window = max(1, math.ceil(2 * max_acceleration / max_jerk / period))
+        self.window = deque(maxlen=window)
+        self.window_sum = 0.0
+        self.position: Optional[float] = None
+        self.velocity = 0.0
+        self.last_target: Optional[float] = None
+        self.limited = 0
+
+    def reset(self, position=None) -> None:
+        self.position = position
+        self.velocity = 0.0
+        self.last_target = position
+        self.window.clear()
+        self.window_sum = 0.0
+        if position is not None:
+            self.window.extend([position] * self.window.maxlen)
+            self.window_sum = position * self.window.maxlen
+
+    def step(self, target) -> float:
+        """Next position towards target, one period later"""
+        if self.position is None:
+            self.reset(target)
+            return target
+        dt = self.period
+        ### the target keeps moving, only the error to it has to be braked
+        target_velocity = (target - self.last_target) / dt
+        self.last_target = target
+        error = target - self.position
+        velocity = error / dt
+        if self.max_acceleration:
+            half_step = self.max_acceleration * dt / 2
+            braking = -half_step + (half_step * half_step + 2 * self.max_acceleration * abs(error)) ** 0.5
+            correction = min(braking, abs(error) / dt)
+            velocity = target_velocity + (correction if error > 0 else -correction)
+        if self.max_velocity:
+            velocity = max(-self.max_velocity, min(self.max_velocity, velocity))
+        if self.max_acceleration:
+            max_change = self.max_acceleration * dt
+            velocity = max(self.velocity - max_change, min(self.velocity + max_change, velocity))
+        self.velocity = velocity
+        self.position += velocity * dt
+
+        if len(self.window) == self.window.maxlen:
+            self.window_sum -= self.window[0]
+        self.window.append(self.position)
+        self.window_sum += self.position
+        position = self.window_sum / len(self.window)
+        if abs(position - target) > 1e-6:
+            self.limited += 1
+        return position
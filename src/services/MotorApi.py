@@ -4,61 +4,269 @@ from pymodbus.exceptions import ConnectionException, ModbusIOException
 from utils.utils import IEG_MODE_bitmask_alternative, IEG_MODE_bitmask_default, combine_to_23bit, normlize_decimal_ucur32
 import asyncio
 from time import sleep, time
-from utils.utils import is_nth_bit_on, convert_to_revs, convert_vel_rpm_revs, convert_acc_rpm_revs, bit_high_low_both, registers_convertion, convert_val_into_format
-from helpers.motor_api_helper import calculate_target_revs, get_register_values
+from utils.utils import is_nth_bit_on, convert_to_revs, convert_vel_rpm_revs, convert_acc_rpm_revs, bit_high_low_both
+from helpers.motor_api_helper import calculate_target_revs, calculate_servo_revs, clamp_target_revs, get_register_values
+from helpers.kinematics_table import KinematicsTable
+from helpers.register_blocks import plan_register_blocks, slice_register_blocks
+from utils.register_map import build_register_map
+from services.modbus_scheduler import ModbusScheduler, RequestDroppedError, RequestExpiredError, PRIORITY_STOP, PRIORITY_MOTION, PRIORITY_FAULT, PRIORITY_BACKGROUND
+from services.retry_policy import RetryPolicy, CircuitBreaker, CircuitOpenError, RequestTimeoutError, TIMED_OUT
+from services.state_watcher import StateWatcher
+from services.register_cache import RegisterCache
+from helpers.position_filter import PositionWriteFilter, SIDES, SUPPRESSED
+from services.side_writer import SideWriter
+from services import event_journal
 import math
 from helpers import fault_helpers as fault_helper  
 
 class MotorApi():
     def __init__(self, logger, modbus_clients,config=MotorConfig(), retry_delay = 0.2, max_retries = 10):
+        """
+        retry_delay caps the backoff between retries of stop commands and fault reads.
+        Every public call takes timeout (seconds) that covers all of its transactions and
+        retries, when it runs out the call returns TIMED_OUT instead of finishing late.
+        """
         self.logger = logger
         self.client_right = modbus_clients.client_right
         self.client_left = modbus_clients.client_left
+        ### every connection to a drive can run a read at the same time
+        self.pool_left = modbus_clients.pool_left
+        self.pool_right = modbus_clients.pool_right
         self.retry_delay = retry_delay
         self.max_retries = max_retries
         self.config = config
-    async def _write_registers_left(self, address, vals):
-        return await self.client_left.write_registers(
+        self.retry_policies = {
+            PRIORITY_STOP: RetryPolicy(max_attempts=max_retries, base_delay=config.RETRY_BASE_DELAY, max_delay=retry_delay, jitter=config.RETRY_JITTER, bypass_breaker=True),
+            PRIORITY_MOTION: RetryPolicy(max_attempts=config.MOTION_WRITE_ATTEMPTS, base_delay=0.0, jitter=0.0),
+            PRIORITY_FAULT: RetryPolicy(max_attempts=config.FAULT_READ_ATTEMPTS, base_delay=config.RETRY_BASE_DELAY, max_delay=retry_delay, jitter=config.RETRY_JITTER),
+            PRIORITY_BACKGROUND: RetryPolicy(max_attempts=max_retries, base_delay=config.RETRY_BASE_DELAY, max_delay=config.RETRY_MAX_DELAY, jitter=config.RETRY_JITTER),
+        }
+        self.breakers = {
+            side: CircuitBreaker(side, logger, failure_threshold=config.BREAKER_FAILURE_THRESHOLD, reset_timeout=config.BREAKER_RESET_TIMEOUT)
+            for side in ("left", "right")
+        }
+        self.registers = build_register_map(self.config)
+        self.telemetry_blocks = plan_register_blocks({
+                "BOARD_TMP": (self.config.BOARD_TMP, 1),
+                "ACTUATOR_TMP": (self.config.ACTUATOR_TMP, 1),
+                "ICONTINUOUS": (self.config.ICONTINUOUS, 2),
+                "VBUS": (self.config.VBUS, 2),
+            }, max_gap=self.config.BLOCK_READ_MAX_GAP, max_size=self.config.BLOCK_READ_MAX_SIZE)
+        self.scheduler_left = ModbusScheduler("left", logger, self.pool_left, queue_depth=self.config.SCHEDULER_QUEUE_DEPTH)
+        self.scheduler_right = ModbusScheduler("right", logger, self.pool_right, queue_depth=self.config.SCHEDULER_QUEUE_DEPTH)
+        self.homing_watcher = self._state_watcher("homing", {
+                "OEG_STATUS": (self.config.OEG_STATUS, 1),
+                "PFEEDBACK_POSITION": (self.config.PFEEDBACK_POSITION, self.registers.PFEEDBACK_POSITION.count),
+            })
+        self.velocity_watcher = self._state_watcher("velocity", {
+                "VFEEDBACK_VELOCITY": (self.config.VFEEDBACK_VELOCITY, self.registers.VFEEDBACK_VELOCITY.count),
+            })
+        self.restart_watcher = self._state_watcher("restart", {
+                "COMMAND_MODE": (self.config.COMMAND_MODE, 1),
+            })
+        ### last configuration values written to the drives, see _write(cache=True)
+        self.register_cache = RegisterCache(logger)
+        ### last acknowledged host positions, unchanged motion setpoints are not written again
+        self.position_filter = PositionWriteFilter(deadband=config.POSITION_DEADBAND, keepalive=config.POSITION_KEEPALIVE)
+        ### motion setpoints are written to each drive by its own task, see SideWriter
+        self.side_writer = None
+        if self.config.INDEPENDENT_SIDES:
+            self.side_writer = SideWriter(self.set_side_position, logger, skew_warning=self.config.SIDE_SKEW_WARNING)
+        ### optional EventJournal, drive state transitions are recorded to it
+        self.journal = None
+        self.kinematics_table = None
+        if self.config.KINEMATICS_TABLE:
+            self.kinematics_table = self.load_kinematics_table()
+    def load_kinematics_table(self) -> Optional[KinematicsTable]:
+        """
+        Loads the precomputed kinematics table from KINEMATICS_TABLE_PATH or builds it.
+        Returns None if the table could not be made or it fails verification,
+        in which case rotate uses the analytic kinematics.
+        """
+        try:
+            resolution = self.config.KINEMATICS_TABLE_RESOLUTION
+            path = self.config.KINEMATICS_TABLE_PATH
+            table = None
+            if path:
+                table = KinematicsTable.load(self.config, path, resolution=resolution)
+            if table is None:
+                start_time = time()
+                table = KinematicsTable.build(self.config, resolution=resolution)
+                self.logger.info(f"Built kinematics table with resolution {resolution} in {time() - start_time:.2f}s")
+                if path:
+                    table.save(path)
+
+            if self.config.KINEMATICS_TABLE_VERIFY:
+                max_error = table.verify()
+                if max_error > self.config.KINEMATICS_TABLE_TOLERANCE:
+                    self.logger.error(f"Kinematics table max error {max_error} is over the tolerance {self.config.KINEMATICS_TABLE_TOLERANCE}, using analytic kinematics")
+                    return None
+                self.logger.info(f"Kinematics table verified, max error: {max_error}/65536 revs")
+            return table
+        except Exception as e:
+            self.logger.error(f"Failed to load kinematics table, using analytic kinematics: {e}")
+            return None
+    def _state_watcher(self, name, registers) -> StateWatcher:
+        """StateWatcher polling registers (name -> (address, count)) of both motors with block reads"""
+        blocks = plan_register_blocks(registers, max_gap=self.config.BLOCK_READ_MAX_GAP, max_size=self.config.BLOCK_READ_MAX_SIZE)
+        async def read(timeout):
+            return await self.read_register_blocks(blocks, description=f"_read {name} state", timeout=timeout)
+        return StateWatcher(name, read, self.logger, fast_interval=self.config.WATCH_FAST_INTERVAL,
+                            slow_interval=self.config.WATCH_SLOW_INTERVAL, read_timeout=self.config.WATCH_READ_TIMEOUT)
+    def watcher_stats(self) -> dict:
+        return {watcher.name: watcher.stats() for watcher in (self.homing_watcher, self.velocity_watcher, self.restart_watcher)}
+    def close_watchers(self) -> None:
+        for watcher in (self.homing_watcher, self.velocity_watcher, self.restart_watcher):
+            watcher.close()
+    def _deadline(self, timeout) -> Optional[float]:
+        """Event loop time when a call with timeout seconds runs out, None waits as long as it takes"""
+        if timeout is None:
+            return None
+        return asyncio.get_running_loop().time() + timeout
+    def _remaining(self, deadline) -> Optional[float]:
+        if deadline is None:
+            return None
+        return deadline - asyncio.get_running_loop().time()
+    async def _write_registers_left(self, address, vals, priority=PRIORITY_BACKGROUND, deadline=None):
+        return await self.scheduler_left.submit(priority, lambda client: client.write_registers(
             address=address,
             values=vals,
             slave=self.config.SLAVE_ID
-        )
-    async def _write_registers_right(self, address, vals):
-        return await self.client_right.write_registers(
+        ), deadline=deadline, key=address if priority == PRIORITY_MOTION else None)
+    async def _write_registers_right(self, address, vals, priority=PRIORITY_BACKGROUND, deadline=None):
+        return await self.scheduler_right.submit(priority, lambda client: client.write_registers(
             address=address,
             values=vals,
             slave=self.config.SLAVE_ID
-        )
-    async def _read_registers_left(self, address, count):
-        return await self.client_left.read_holding_registers(
+        ), deadline=deadline, key=address if priority == PRIORITY_MOTION else None)
+    async def _read_registers_left(self, address, count, priority=PRIORITY_BACKGROUND, deadline=None):
+        return await self.scheduler_left.submit(priority, lambda client: client.read_holding_registers(
                 address=address,
                 count=count,
                 slave=self.config.SLAVE_ID
-            )
-    async def _read_registers_right(self, address, count):
-        return await self.client_right.read_holding_registers(
+            ), deadline=deadline, concurrent=True)
+    async def _read_registers_right(self, address, count, priority=PRIORITY_BACKGROUND, deadline=None):
+        return await self.scheduler_right.submit(priority, lambda client: client.read_holding_registers(
                 address=address,
                 count=count,
                 slave=self.config.SLAVE_ID
-            )
-    def check_gather_result(self, results):
-        left_result, right_result = results
-        success_left = False
-        success_right = False
-        
-        if not isinstance(left_result, Exception):
-            success_left = True
-
-        if not isinstance(right_result, Exception):
-            success_right = True
-        return success_left, success_right 
-    async def _write(self, address, description, values=None, different_values=False, left_vals=None, right_vals=None) -> bool:
-        attempt_left = 0
-        attempt_right = 0
-        success_right = False
-        success_left = False
-        max_retries = self.max_retries
-        
+            ), deadline=deadline, concurrent=True)
+    def scheduler_metrics(self) -> dict:
+        """Queue wait times and dropped request counts per drive and priority class"""
+        return {
+            "left": self.scheduler_left.metrics(),
+            "right": self.scheduler_right.metrics(),
+        }
+    def close_schedulers(self) -> None:
+        self.scheduler_left.close()
+        self.scheduler_right.close()
+        if self.side_writer is not None:
+            self.side_writer.close()
+    def close_journal(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+    def connection_busy(self, side, client) -> bool:
+        """True while a scheduled request is running on the client"""
+        scheduler = self.scheduler_left if side == "left" else self.scheduler_right
+        return scheduler.busy(client)
+    def connection_restored(self, side) -> None:
+        """Called after a drive has been reconnected, closes its circuit breaker right away"""
+        self.breakers[side].record_success()
+        ### the drive may have power cycled while it was unreachable
+        self.invalidate_drive_state(f"{side} drive reconnected")
+    def invalidate_drive_state(self, reason, restart=False) -> None:
+        """The drives may not have what was last written to them anymore. After a restart
+        the cached configuration is gone for sure, otherwise it is read back before it's trusted again"""
+        if restart:
+            self.register_cache.clear(reason)
+        else:
+            self.register_cache.invalidate(reason)
+        self.position_filter.invalidate()
+    def _journal(self, kind, value, success=True) -> None:
+        """Records a command sent to both drives, success False if it was not acknowledged"""
+        if self.journal is not None:
+            self.journal.record(kind, event_journal.BOTH, value, detail=1 if success is True else 0)
+    def breaker_stats(self) -> dict:
+        return {side: breaker.stats() for side, breaker in self.breakers.items()}
+    def was_dropped(self, results, description) -> bool:
+        """True if the scheduler dropped the request on either side, these are not retried"""
+        for result in results:
+            if isinstance(result, RequestDroppedError):
+                self.logger.debug(f"{description} dropped by the request scheduler: {result}")
+                return True
+        return False
+    async def _request_with_retries(self, side, request, description, priority, deadline=None):
+        """
+        One side of a transaction with the priority classes retry policy and the sides circuit breaker.
+        No attempt or backoff runs past deadline.
+        Returns the response or the exception that ended the attempts
+        """
+        policy = self.retry_policies[priority]
+        breaker = self.breakers[side]
+        error = None
+        for attempt in range(policy.max_attempts):
+            remaining = self._remaining(deadline)
+            if remaining is not None and remaining <= 0:
+                return RequestTimeoutError(f"{side} drive: deadline passed after {attempt} attempts")
+            if not policy.bypass_breaker and not breaker.allow_request():
+                return CircuitOpenError(f"{side} drive circuit breaker is open")
+            try:
+                if remaining is None:
+                    response = await request()
+                else:
+                    response = await asyncio.wait_for(request(), remaining)
+                if not response.isError():
+                    breaker.record_success()
+                    return response
+                error = ModbusIOException(f"{response}")
+            except RequestExpiredError:
+                return RequestTimeoutError(f"{side} drive: deadline passed while the request was queued")
+            except RequestDroppedError as e:
+                return e
+            except asyncio.TimeoutError:
+                ### the callers budget ran out, that doesn't mean the drive is failing so the breaker isn't fed
+                return RequestTimeoutError(f"{side} drive: no response within the deadline")
+            except Exception as e:
+                error = e
+            breaker.record_failure()
+            self.logger.debug(f"Failed to {description} on {side} motor. Attempt {attempt + 1}/{policy.max_attempts}: {error}")
+            if attempt + 1 < policy.max_attempts:
+                delay = policy.delay(attempt)
+                remaining = self._remaining(deadline)
+                if remaining is not None and delay >= remaining:
+                    return RequestTimeoutError(f"{side} drive: no time left to retry after: {error}")
+                await asyncio.sleep(delay)
+        return error
+    def _failure(self, results, description, priority) -> Optional[bool]:
+        """
+        Logs why a transaction failed. Returns None if both sides succeeded,
+        otherwise the calls result: TIMED_OUT if a side ran out of time or False
+        """
+        if self.was_dropped(results, description):
+            return False
+        success_left = not isinstance(results[0], Exception)
+        success_right = not isinstance(results[1], Exception)
+        if success_left and success_right:
+            return None
+        errors = [result for result in results if isinstance(result, Exception)]
+        if any(isinstance(error, RequestTimeoutError) for error in errors):
+            ### stale motion setpoints are abandoned all the time, that is the point of their deadline
+            log = self.logger.debug if priority == PRIORITY_MOTION else self.logger.warning
+            log(f"Timed out trying to {description}. Left: {success_left} | Right: {success_right}")
+            return TIMED_OUT
+        if all(isinstance(error, CircuitOpenError) for error in errors):
+            ### the breaker already logged when it opened
+            self.logger.debug(f"Failed to {description}, circuit breaker open. Left: {success_left} | Right: {success_right}")
+        else:
+            self.logger.error(f"Failed to {description} on both motors. Left: {success_left} | Right: {success_right} ({', '.join(str(error) for error in errors)})")
+        return False
+    async def _skipped(self):
+        return None
+    async def _write(self, address, description, values=None, different_values=False, left_vals=None, right_vals=None, priority=PRIORITY_BACKGROUND, deadline=None, cache=False, sides=SIDES) -> bool:
+        """Writes both motors (or only the ones in sides), returns True, False or TIMED_OUT if deadline (event loop time) passed.
+        cache=True is for idempotent configuration registers: the write is skipped if
+        the register cache says the drives already have these values"""
         ### Figure out the settings based on the context
         try:
             if not different_values:
@@ -70,103 +278,43 @@ class MotorApi():
         except Exception as e:
             self.logger.error(f"Error while trying to setup settings for register _write operation: {e}")
     
+        cache = cache and self.config.REGISTER_CACHE
+        if cache and self.register_cache.is_current(address, left_motor_vals, right_motor_vals):
+            self.logger.debug(f"Skipped {description}, the drives already have the values")
+            return True
         try:
-            ### tries to _write to both registers in parallel first
-            results = await asyncio.gather(self._write_registers_left(address, vals=left_motor_vals), self._write_registers_right(address=address, vals=right_motor_vals), return_exceptions=True)
-            success_left, success_right = self.check_gather_result(results)
-            if success_left and success_right:
-                return True
-            
-            while max_retries > attempt_left and max_retries > attempt_right:
-                if not success_right:
-                    response_right = await self._write_registers_right(values=right_motor_vals, address=address)
-                if not success_left:
-                    response_left = await self._write_registers_left(values=left_vals, address=address)
-
-                if response_left.isError():
-                    attempt_left += 1
-                    self.logger.error(f"Failed to {description} on left. Attempt {attempt_left}")
-                else:
-                    success_left = True
-
-                if response_right.isError():
-                    attempt_right += 1
-                    self.logger.error(f"Failed to {description} on right motor. Attempt {attempt_right}")
-                else:
-                    success_right = True
-                
-                if success_left and success_right:
-                    self.logger.info(f"succesfully {description} on both motors!")
-                    return True
-                
-                # Delay between retries
-                await asyncio.sleep(self.retry_delay)
-            
-            if not success_left or not success_right:
-                self.logger.error(f"Failed to {description} on both motors. Left: {success_left} | Right: {success_right}")
-                return False
+            ### both sides are written and retried in parallel
+            results = await asyncio.gather(
+                self._request_with_retries("left", lambda: self._write_registers_left(address, vals=left_motor_vals, priority=priority, deadline=deadline), description, priority, deadline)
+                if "left" in sides else self._skipped(),
+                self._request_with_retries("right", lambda: self._write_registers_right(address, vals=right_motor_vals, priority=priority, deadline=deadline), description, priority, deadline)
+                if "right" in sides else self._skipped())
+            failure = self._failure(results, description, priority)
+            ### after a failed write one side may have the new values and the other the old ones
+            if cache and failure is None:
+                self.register_cache.store(address, left_motor_vals, right_motor_vals)
+            else:
+                self.register_cache.discard(address)
+            return True if failure is None else failure
         except Exception as e:
             self.logger.error(f"Unexpected error while {description}: {str(e)}")
             return False
-    async def _read(self, address, description, count=2, log=True) -> Union[tuple, bool]:
+    async def _read(self, address, description, count=2, log=True, priority=PRIORITY_BACKGROUND, deadline=None) -> Union[tuple, bool]:
         """Reads the specified register addresses values and returns them
-        as a tuple (left, right) or False if the operation was not successful"""
+        as a tuple (left, right) or False if the operation was not successful
+        and TIMED_OUT if deadline (event loop time) passed"""
         try:
-            attempt_left = 0
-            attempt_right = 0
-            success_left = False
-            success_right = False
-            max_retries = self.max_retries
-
-            ### tries to _read to both registers in parallel first
-            results = await asyncio.gather(self._read_registers_left(address, count=count), self._read_registers_right(address=address, count=count), return_exceptions=True)
-            success_left, success_right = self.check_gather_result(results)
-            if success_left and success_right:
-                left_vals, right_vals = get_register_values(results)
-                if count==1:
-                    return (left_vals[0], right_vals[0])
-                else:
-                    return (left_vals, right_vals)
-
-            while max_retries > attempt_left and max_retries > attempt_right:
-                # _write to left motor if not yet successful
-                if not success_left:
-                    response_left = await self._read_registers_left(address=address, count=count)
-                    if response_left.isError():
-                        attempt_left += 1
-                        self.logger.error(f"Failed to {description} on left motor. Attempt {attempt_left}/{max_retries}")
-                    else:
-                        success_left = True
-                        if log:
-                            self.logger.info(f"Successfully {description} on left motor")
-
-                # _read from right motor if not yet successful
-                if not success_right:
-                    response_right = await self._read_registers_right(address=address, count=count)
-                    if response_right.isError():
-                        attempt_right += 1
-                        self.logger.error(f"Failed to {description} on right motor. Attempt {attempt_right}/{max_retries}")
-                    else:
-                        success_right = True
-                        if log:
-                            self.logger.info(f"Successfully {description} on right motor")
-
-                # Break if both are successful
-                if success_left and success_right:
-                    break
-
-                # Delay between retries
-                await asyncio.sleep(self.retry_delay)
-
-            if not success_left or not success_right:
-                self.logger.error(f"Failed to {description} on both motors. Left: {success_left}, Right: {success_right}")
-                return False
+            ### both sides are read and retried in parallel
+            results = await asyncio.gather(
+                self._request_with_retries("left", lambda: self._read_registers_left(address, count=count, priority=priority, deadline=deadline), description, priority, deadline),
+                self._request_with_retries("right", lambda: self._read_registers_right(address, count=count, priority=priority, deadline=deadline), description, priority, deadline))
+            failure = self._failure(results, description, priority)
+            if failure is not None:
+                return failure
 
             if log:
                 self.logger.info(f"Successfully {description} on both motors")
-            
-            
-            left_vals, right_vals = get_register_values((response_left, response_right))
+            left_vals, right_vals = get_register_values(results)
             if count==1:
                 return (left_vals[0], right_vals[0])
             else:
@@ -175,88 +323,109 @@ class MotorApi():
         except Exception as e:
             self.logger.error(f"Unexpected error while reading motor REVS: {str(e)}")
             return False
-    async def reset_motors(self) -> bool:
+    async def reset_motors(self, timeout=None) -> bool:
         """ 
         Removes all temporary settings from both motors
         and goes back to default ones
         """
-        return await self._write(address=self.config.SYSTEM_COMMAND, values=[self.config.RESTART_VALUE], description="force a software power-on restart of the drive")
-    async def get_recent_fault(self, count=1) -> tuple[Optional[int], Optional[int]]:
+        ### the drives go back to their power-on values even if the write is not acknowledged
+        self.invalidate_drive_state("drive restart", restart=True)
+        result = await self._write(address=self.config.SYSTEM_COMMAND, values=[self.config.RESTART_VALUE], description="force a software power-on restart of the drive", deadline=self._deadline(timeout))
+        self._journal(event_journal.RESTART, self.config.RESTART_VALUE, result)
+        return result
+    async def get_recent_fault(self, count=1, timeout=None) -> tuple[Optional[int], Optional[int]]:
         """
         _read fault registers from both clients.
         Returns tuple of (left_fault, right_fault), None if _read fails
         """
-        return await self._read(address=self.config.RECENT_FAULT_ADDRESS, description="_read fault register", count=count)
-    async def get_present_fault(self, count=1) -> tuple[Optional[int], Optional[int]]:
+        result = await self._read(address=self.config.RECENT_FAULT_ADDRESS, description="_read fault register", count=count, priority=PRIORITY_FAULT, deadline=self._deadline(timeout))
+        if result and count == 1 and self.journal is not None:
+            self.journal.faults(result)
+        return result
+    async def get_present_fault(self, count=1, timeout=None) -> tuple[Optional[int], Optional[int]]:
         """
         _read fault registers from both clients.
         Returns tuple of (left_fault, right_fault), None if _read fails
         """
-        return await self._read(address=self.config.PRESENT_FAULT_ADDRESS, description="_read present disabling fault status register", count=count)
-    async def fault_reset(self) -> bool:
+        result = await self._read(address=self.config.PRESENT_FAULT_ADDRESS, description="_read present disabling fault status register", count=count, priority=PRIORITY_FAULT, deadline=self._deadline(timeout))
+        if result and count == 1 and self.journal is not None:
+            self.journal.faults(result)
+        return result
+    async def fault_reset(self, timeout=None) -> bool:
         # Makes sure bits can be only valid bits that we want to control
         # no matter what you give as a input
-        return await self._write(values=[IEG_MODE_bitmask_default(65535)], address=self.config.IEG_MODE, description="reset faults")
-    async def check_fault_stauts(self, log=True) -> Optional[bool]:
+        self.invalidate_drive_state("fault reset")
+        result = await self._write(values=[IEG_MODE_bitmask_default(65535)], address=self.config.IEG_MODE, description="reset faults", priority=PRIORITY_FAULT, deadline=self._deadline(timeout))
+        self._journal(event_journal.IEG_MODE, IEG_MODE_bitmask_default(65535), result)
+        return result
+    async def check_fault_stauts(self, log=True, timeout=None) -> Optional[bool]:
         """
         _read drive status from both motors.
         Returns (left, right) values as a tuple if success
         or False if it fails
         """
-        return await self._read(log=log, address=self.config.OEG_STATUS, description="_read driver status",count=1)
-    async def get_vel(self) -> bool:
+        result = await self._read(log=log, address=self.config.OEG_STATUS, description="_read driver status",count=1, priority=PRIORITY_FAULT, deadline=self._deadline(timeout))
+        if result and any(fault_helper.has_faulted(result)):
+            self.invalidate_drive_state("drive fault")
+        if result and self.journal is not None:
+            self.journal.status(result)
+        return result
+    async def get_vel(self, timeout=None) -> bool:
         """
-        Gets VEL32_HIGH register for both motors
+        Gets VEL32_HIGH register (8.8 revs/s) for both motors
         """
-        return await self._read(address=self.config.VFEEDBACK_VELOCITY,description="_read velocity register", count=1)
-    async def stop(self) -> bool:
+        codec = self.registers.VFEEDBACK_VELOCITY
+        return await self._read(address=codec.address,description="_read velocity register", count=codec.count, deadline=self._deadline(timeout))
+    async def stop(self, timeout=None) -> bool:
         """
         Attempts to stop both motors by writing to the IEG_MOTION register.
         Returns True if successful, False if failed after retries.
         """
-        return await self._write(address=self.config.IEG_MOTION, values=[self.config.STOP_VALUE], description="Stop motors")
-    async def home(self) -> bool:
+        ### setpoints queued for the drives must not be written after the stop
+        if self.side_writer is not None:
+            self.side_writer.cancel_pending()
+        ### the drives hold where they stopped, not at the last setpoint, so the next one is always written
+        self.position_filter.invalidate()
+        result = await self._write(address=self.config.IEG_MOTION, values=[self.config.STOP_VALUE], description="Stop motors", priority=PRIORITY_STOP, deadline=self._deadline(timeout))
+        self._journal(event_journal.MOTION_COMMAND, self.config.STOP_VALUE, result)
+        return result
+    async def home(self, timeout=None) -> bool:
+        """Homes both motors, waits HOMING_TIMEOUT seconds by default for them to report homed"""
         try:
+            if timeout is None:
+                timeout = self.config.HOMING_TIMEOUT
+            deadline = self._deadline(timeout)
             ### Reset IEG_MOTION bit to 0 so we can trigger rising edge with our home command
-            if not await self._write(address=self.config.IEG_MOTION, values=[0], description="reset IEG_MOTION to 0"):
-                return False
+            result = await self._write(address=self.config.IEG_MOTION, values=[0], description="reset IEG_MOTION to 0", deadline=deadline)
+            if not result:
+                return result
                 
             ### Initiate homing command
-            if not await self._write(values=[self.config.HOME_VALUE], address=self.config.IEG_MOTION, description="initiate homing command"): 
-                return False
+            result = await self._write(values=[self.config.HOME_VALUE], address=self.config.IEG_MOTION, description="initiate homing command", deadline=deadline)
+            self._journal(event_journal.MOTION_COMMAND, self.config.HOME_VALUE, result)
+            if not result: 
+                return result
             
-            ### homing order was success for both motos make a poller coroutine to poll when the homing is done.
-            #Checks if both actuators are homed or not. Returns True when homed.
-            homing_max_duration = 30
-            start_time = time()
-            elapsed_time = 0
-            while elapsed_time <= homing_max_duration:
-                response = await self._read(address=self.config.OEG_STATUS, description="_read OEG_STATUS",count=1)
-                if not response:
-                    await asyncio.sleep(self.retry_delay)
-                    continue
-                
-                (OEG_STATUS_right, OEG_STATUS_left) = response
-                
-                ishomed_right = is_nth_bit_on(1, OEG_STATUS_right)
-                ishomed_left = is_nth_bit_on(1, OEG_STATUS_left)
+            ### homing order was success for both motors, wait for both to report homed
+            def homed(state):
+                (OEG_STATUS_left, OEG_STATUS_right) = state["OEG_STATUS"]
+                return is_nth_bit_on(1, OEG_STATUS_left[0]) and is_nth_bit_on(1, OEG_STATUS_right[0])
+            def near_home(state):
+                return all(abs(self.registers.PFEEDBACK_POSITION.decode(vals)) <= self.config.HOMING_NEAR_REVS for vals in state["PFEEDBACK_POSITION"])
 
-                # Success
-                if ishomed_right and ishomed_left:
-                    self.logger.info(f"Both motors homes successfully:")
-                    await self._write(address=self.config.IEG_MOTION, values=[0], description="reset IEG_MOTION to 0")
-                    return True
-                
-                await asyncio.sleep(1)
-                elapsed_time = time() - start_time
-            
-            self.logger.error(f"Failed to home both motors within the time limit of: {homing_max_duration}")
-            return False
+            result = await self.homing_watcher.wait_until(homed, near=near_home, timeout=self._remaining(deadline))
+            if result is TIMED_OUT:
+                self.logger.error(f"Failed to home both motors within the time limit of: {timeout}")
+                return TIMED_OUT
+
+            self.logger.info(f"Both motors homes successfully:")
+            self._journal(event_journal.HOMED, 0)
+            return await self._write(address=self.config.IEG_MOTION, values=[0], description="reset IEG_MOTION to 0", deadline=deadline)
 
         except Exception as e:
             self.logger.error(f"Unexpected error while homing motors: {e}")
             return False
-    async def set_analog_pos_max(self, decimal: int, whole: int) -> bool:
+    async def set_analog_pos_max(self, decimal: int, whole: int, timeout=None) -> bool:
         """
         Sets the analog position maximum for both motors.
         Args:
@@ -266,8 +435,8 @@ class MotorApi():
             bool: True if successful for both motors, False otherwise.
         """
         values = [decimal, whole]
-        return await self._write(values=values, description="set analog positition max", address=self.config.ANALOG_POSITION_MAXIMUM)
-    async def set_analog_pos_min(self, decimal: int, whole: int) -> bool:
+        return await self._write(values=values, description="set analog positition max", address=self.config.ANALOG_POSITION_MAXIMUM, deadline=self._deadline(timeout), cache=True)
+    async def set_analog_pos_min(self, decimal: int, whole: int, timeout=None) -> bool:
         """
         Sets the analog position minium for both motors.
         Args:
@@ -277,8 +446,8 @@ class MotorApi():
             bool: True if successful for both motors, False otherwise.
         """
         values = [decimal, whole]
-        return await self._write(values=values, description="set analog position min", address=self.config.ANALOG_POSITION_MINIMUM)
-    async def set_analog_vel_max(self, decimal: int, whole: int) -> bool:
+        return await self._write(values=values, description="set analog position min", address=self.config.ANALOG_POSITION_MINIMUM, deadline=self._deadline(timeout), cache=True)
+    async def set_analog_vel_max(self, decimal: int, whole: int, timeout=None) -> bool:
         """
         Sets the analog velocity maximum for both motors.
         Args:
@@ -288,8 +457,8 @@ class MotorApi():
             bool: True if successful for both motors, False otherwise.
         """
         values = [decimal, whole]
-        return await self._write(values=values, description="set analog velocity max", address=self.config.ANALOG_VEL_MAXIMUM)
-    async def set_host_vel_max(self, decimal: int, whole: int) -> bool:
+        return await self._write(values=values, description="set analog velocity max", address=self.config.ANALOG_VEL_MAXIMUM, deadline=self._deadline(timeout), cache=True)
+    async def set_host_vel_max(self, decimal: int, whole: int, timeout=None) -> bool:
         """
         Sets the host velocity maximum for both motors.
         Args:
@@ -299,8 +468,8 @@ class MotorApi():
             bool: True if successful for both motors, False otherwise.
         """
         values = [decimal, whole]
-        return await self._write(values=values, description="set host velocity max", address=self.config.HOST_VEL_MAXIMUM)
-    async def set_analog_acc_max(self, decimal: int, whole: int) -> bool:
+        return await self._write(values=values, description="set host velocity max", address=self.config.HOST_VEL_MAXIMUM, deadline=self._deadline(timeout), cache=True)
+    async def set_analog_acc_max(self, decimal: int, whole: int, timeout=None) -> bool:
         """
         Sets the analog acceleration maxium for both motors.
         Args:
@@ -310,8 +479,8 @@ class MotorApi():
             bool: True if successful for both motors, False otherwise.
         """
         values = [decimal, whole]
-        return await self._write(values=values, description="set analog acceleration maxium", address=self.config.ANALOG_ACCELERATION_MAXIMUM)
-    async def set_host_acc_max(self, decimal: int, whole: int) -> bool:
+        return await self._write(values=values, description="set analog acceleration maxium", address=self.config.ANALOG_ACCELERATION_MAXIMUM, deadline=self._deadline(timeout), cache=True)
+    async def set_host_acc_max(self, decimal: int, whole: int, timeout=None) -> bool:
         """
         Sets the host acceleration maxium for both motors.
         Args:
@@ -321,8 +490,8 @@ class MotorApi():
             bool: True if successful for both motors, False otherwise.
         """
         values = [decimal, whole]
-        return await self._write(values=values, description="set host acceleration maxium", address=self.config.HOST_ACCELERATION_MAXIMUM)
-    async def set_analog_input_channel(self, value: int) -> bool:
+        return await self._write(values=values, description="set host acceleration maxium", address=self.config.HOST_ACCELERATION_MAXIMUM, deadline=self._deadline(timeout), cache=True)
+    async def set_analog_input_channel(self, value: int, timeout=None) -> bool:
         """
         Sets the analog input channel for both motors.
         Args:
@@ -330,8 +499,8 @@ class MotorApi():
         Returns:
             bool: True if successful for both motors, False otherwise.
         """
-        return await self._write(values=[value], address=self.config.ANALOG_INPUT_CHANNEL, description="set analog input channel")
-    async def get_current_revs(self) ->  Union[Tuple[List[int], List[int]], bool]:
+        return await self._write(values=[value], address=self.config.ANALOG_INPUT_CHANNEL, description="set analog input channel", deadline=self._deadline(timeout), cache=True)
+    async def get_current_revs(self, timeout=None) ->  Union[Tuple[List[int], List[int]], bool]:
         """
         Gets the current REVS for both motors
         Returns:
@@ -340,8 +509,8 @@ class MotorApi():
             - response_right: [decimal_part, whole_part] for the right motor
             Returns False if the operation is not successful.
         """
-        return await self._read(address=self.config.PFEEDBACK_POSITION, description="_read current REVS", count=2)
-    async def set_analog_modbus_cntrl(self, values: Tuple[int, int]) -> bool:
+        return await self._read(address=self.config.PFEEDBACK_POSITION, description="_read current REVS", count=2, deadline=self._deadline(timeout))
+    async def set_analog_modbus_cntrl(self, values: Tuple[int, int], timeout=None) -> bool:
         """
         Sets the analog input Modbus control value for both motors,
         where 0 makes the motor go to the analog_pos_min position
@@ -353,53 +522,99 @@ class MotorApi():
             bool: True if successful for both motors, False otherwise.
         """
         value_left, value_right = values
-        return await self._write(different_values=True, right_vals=[value_right], left_vals=[value_left], description="Set analog modbus control value", address=self.config.ANALOG_MODBUS_CNTRL)
-    async def set_host_position(self, values: Tuple[List,List]) -> bool:
+        return await self._write(different_values=True, right_vals=[value_right], left_vals=[value_left], description="Set analog modbus control value", address=self.config.ANALOG_MODBUS_CNTRL, deadline=self._deadline(timeout))
+    async def set_host_position(self, values: Tuple[List,List], priority=PRIORITY_MOTION, timeout=None, sides=SIDES) -> bool:
             """
-            Sets the host position values for both motors. 
+            Sets the host position values for the motors in sides, both by default.
+            Motion priority setpoints are dropped if a newer one is queued and abandoned
+            after timeout, MOTION_REQUEST_DEADLINE by default. A drive whose setpoint is within
+            POSITION_DEADBAND of its last acknowledged one is only written every POSITION_KEEPALIVE seconds,
+            SUPPRESSED is returned when neither drive was written.
             """
+            if timeout is None and priority == PRIORITY_MOTION:
+                timeout = self.config.MOTION_REQUEST_DEADLINE
             values_left, values_right = values
-            return await self._write(different_values=True, right_vals=values_right, left_vals=values_left, description="Set host position values", address=self.config.HOST_POSITION)
-    async def set_host_current(self, value: int) -> bool:
+            if priority == PRIORITY_MOTION and self.config.POSITION_WRITE_FILTER:
+                sides = tuple(side for side, vals in zip(SIDES, values) if side in sides and self.position_filter.needs_write(side, vals))
+                if not sides:
+                    return SUPPRESSED
+            result = await self._write(different_values=True, right_vals=values_right, left_vals=values_left, description="Set host position values", address=self.config.HOST_POSITION, priority=priority, deadline=self._deadline(timeout), sides=sides)
+            for side, vals in zip(SIDES, values):
+                if side not in sides:
+                    continue
+                if result:
+                    self.position_filter.acknowledge(side, vals)
+                else:
+                    ### either side may or may not have the new setpoint
+                    self.position_filter.invalidate(side)
+            return result
+    async def set_side_position(self, side, values: List, timeout=None) -> bool:
+        """Writes the host position of one motor only, values: [low, whole]"""
+        values = (values, None) if side == "left" else (None, values)
+        return await self.set_host_position(values, timeout=timeout, sides=(side,))
+    async def _command_position(self, values, trace=None, timeout=None) -> bool:
+        """Writes a motion setpoint to both motors. With INDEPENDENT_SIDES it is handed to the
+        side writer and True is returned right away, the trace is finished once both drives have it"""
+        if self.side_writer is not None:
+            self.side_writer.submit(values, trace)
+            return True
+        if trace is not None:
+            trace.mark("write_issued")
+        success = await self.set_host_position(values, timeout=timeout)
+        if trace is not None:
+            if success is SUPPRESSED:
+                trace.suppress()
+            else:
+                trace.mark("write_ack")
+                trace.finish(success)
+        return success
+    async def set_host_current(self, value: int, timeout=None) -> bool:
         """
         Sets the host maxium current that will override IPEAK value(15A as long as its below it) UCUR16 - 9.7.
         """
-        return await self._write(values=[value], description="Set host maximum current", address=self.config.HOST_CURRENT_MAXIMUM)
-    async def wait_for_motors_to_stop(self) -> bool:
-        """ Polls for motors to stop returns True or False"""
-        ### TODO - figure out velocity feedback register
+        return await self._write(values=[value], description="Set host maximum current", address=self.config.HOST_CURRENT_MAXIMUM, deadline=self._deadline(timeout), cache=True)
+    async def wait_for_motors_to_stop(self, timeout=None) -> bool:
+        """
+        Waits until both motors velocity has stayed zero for STOP_SETTLE_TIME,
+        STOP_WAIT_TIMEOUT seconds by default. Returns True, False or TIMED_OUT
+        """
         try:
-            waiting_duration = 30
-            start_time = time()
-            elapsed_time = 0
-            while elapsed_time <= waiting_duration:
-                response_left, response_right = await self.get_vel()
-                if response_left == None or response_right == None:
-                    await asyncio.sleep(0.2)
-                    elapsed_time = time() - start_time
-                    self.logger.error(f"Failed to get current motor velocity:")
-                    continue
-                
-                ### get the whole number
-                velocity_left = response_left >> 8
-                velocity_right = response_right >> 8
+            if timeout is None:
+                timeout = self.config.STOP_WAIT_TIMEOUT
+            codec = self.registers.VFEEDBACK_VELOCITY
+            def velocities(state):
+                return [abs(codec.decode(vals)) for vals in state["VFEEDBACK_VELOCITY"]]
+            def stopped(state):
+                return max(velocities(state)) <= self.config.STOP_VELOCITY_TOLERANCE
+            def near_stop(state):
+                return max(velocities(state)) <= self.config.STOP_NEAR_VELOCITY
 
-                # Success
-                if velocity_left == 0 and velocity_right == 0:
-                    self.logger.info(f"Both motors have successfully stopped:")
-                    await asyncio.sleep(0.5) ### add some safety buffer 
-                    return True
-                
-                await asyncio.sleep(0.2)
-                elapsed_time = time() - start_time
-            
-            self.logger.error(f"Waiting for motors to stop was not successful within the time limit of: {waiting_duration}")
-            return False
+            result = await self.velocity_watcher.wait_until(stopped, near=near_stop, settle=self.config.STOP_SETTLE_TIME, timeout=timeout)
+            if result is TIMED_OUT:
+                self.logger.error(f"Waiting for motors to stop was not successful within the time limit of: {timeout}")
+                return TIMED_OUT
+            self.logger.info(f"Both motors have successfully stopped:")
+            self._journal(event_journal.STOPPED, 0)
+            return True
 
         except Exception as e:
             self.logger.error(f"Unexpected error while waiting for motors to stop: {e}")
             return False
-    async def set_host_command_mode(self, value: int) -> bool:
+    async def wait_for_restart(self, timeout=None) -> bool:
+        """
+        Waits until both drives answer again after reset_motors and have dropped
+        the host position mode, RESTART_TIMEOUT seconds by default.
+        Returns True or TIMED_OUT
+        """
+        if timeout is None:
+            timeout = self.config.RESTART_TIMEOUT
+        def restarted(state):
+            return all(vals[0] != self.config.HOST_POSITION_MODE for vals in state["COMMAND_MODE"])
+        result = await self.restart_watcher.wait_until(restarted, timeout=timeout)
+        if result is TIMED_OUT:
+            self.logger.error(f"Drives did not come back from the restart within: {timeout}")
+        return result
+    async def set_host_command_mode(self, value: int, timeout=None) -> bool:
         """
         Sets both of the motors host command mode to value
         Args:
@@ -413,8 +628,8 @@ class MotorApi():
         Returns:
             bool: True if successful for both motors, False otherwise.
         """
-        return await self._write(address=self.config.COMMAND_MODE, values=[value], description="set host command mode")
-    async def set_ieg_mode(self, value: int) -> bool:
+        return await self._write(address=self.config.COMMAND_MODE, values=[value], description="set host command mode", deadline=self._deadline(timeout), cache=True)
+    async def set_ieg_mode(self, value: int, timeout=None) -> bool:
         """
         Sets IEG_MODE bits
         !!! IMPORTANT NOTE !!! 
@@ -435,17 +650,22 @@ class MotorApi():
         Returns:
             bool: True if successful for both motors, False otherwise.
         """
-        return await self._write(description="set IEG_MODE", values=[IEG_MODE_bitmask_default(value)], address=self.config.IEG_MODE)
-    async def get_modbuscntrl_val(self) -> Union[tuple, bool]:
+        value = IEG_MODE_bitmask_default(value)
+        if is_nth_bit_on(15, value):
+            self.invalidate_drive_state("fault reset")
+        result = await self._write(description="set IEG_MODE", values=[value], address=self.config.IEG_MODE, deadline=self._deadline(timeout))
+        self._journal(event_journal.IEG_MODE, value, result)
+        return result
+    async def get_modbuscntrl_val(self, timeout=None) -> Union[tuple, bool]:
         """
         Gets the current revolutions of both motors and calculates with linear interpolation
         the percentile where they are in the current max_rev - min_rev range.
         After that we multiply it with the maxium modbuscntrl val (10k)
         """
-        result = await self.get_current_revs()
+        result = await self.get_current_revs(timeout=timeout)
         
-        if result is False:
-            return False
+        if not result:
+            return result
 
         try:
             pfeedback_client_left, pfeedback_client_right = result
@@ -467,94 +687,170 @@ class MotorApi():
         except Exception as e:
             self.logger.error(f"Unexpected error while converting to revs: {e}")
             return False
-    async def initialize_motor(self, gui_socket) -> bool:
-        """ Tries to initialize the motors with initial values returns true if succesful """
-        await self.set_host_command_mode(0)
+    async def initialize_motor(self, gui_socket, timeout=None) -> bool:
+        """ Tries to initialize the motors with initial values returns true if succesful,
+        timeout covers the whole initialization including homing """
+        deadline = self._deadline(timeout)
+        await self.set_host_command_mode(0, timeout=self._remaining(deadline))
         # if not await fault_helper.validate_fault_register(self, gui_socket):
         #     return False
         
-        await self.set_ieg_mode(self.config.RESET_FAULT_VALUE)
-        homed = await self.home()
+        await self.set_ieg_mode(self.config.RESET_FAULT_VALUE, timeout=self._remaining(deadline))
+        homed = await self.home(timeout=self._remaining(deadline))
+        if not homed:
+            return homed
+        ### the fault reset made the cached values untrusted, read them back
+        ### so only the registers that actually changed get written again
+        if self.register_cache.registers(unverified_only=True):
+            await self.verify_register_cache(timeout=self._remaining(deadline))
 
-        if homed: 
-            ### HOST VEL
-            (velocity_whole, velocity_decimal) = convert_vel_rpm_revs(self.config.VEL)
-            if not await self.set_host_vel_max(velocity_decimal, velocity_whole):
-                return False
-            ### HOST ACC
-            (acc_whole, acc_decimal) = convert_acc_rpm_revs(self.config.ACC)
-            if not await self.set_host_acc_max(acc_decimal, acc_whole):
-                return False
-            ### current revs for initializing host position
-            response = await self.get_current_revs()
-            if not response:
-                return False
-            (position_client_left, position_client_right) = response
-            ### Set host position
-            if not await self.set_host_position((position_client_left, position_client_right)):
-                return False
+        ### HOST VEL
+        (velocity_whole, velocity_decimal) = convert_vel_rpm_revs(self.config.VEL)
+        result = await self.set_host_vel_max(velocity_decimal, velocity_whole, timeout=self._remaining(deadline))
+        if not result:
+            return result
+        ### HOST ACC
+        (acc_whole, acc_decimal) = convert_acc_rpm_revs(self.config.ACC)
+        result = await self.set_host_acc_max(acc_decimal, acc_whole, timeout=self._remaining(deadline))
+        if not result:
+            return result
+        ### current revs for initializing host position
+        response = await self.get_current_revs(timeout=self._remaining(deadline))
+        if not response:
+            return response
+        (position_client_left, position_client_right) = response
+        ### Set host position
+        result = await self.set_host_position((position_client_left, position_client_right), priority=PRIORITY_BACKGROUND, timeout=self._remaining(deadline))
+        if not result:
+            return result
 
-            ### set host current limit
-            if not await self.set_host_current(value=convert_val_into_format(5, format="9.7")):
-                return False
+        ### set host current limit
+        result = await self.set_host_current(value=self.registers.HOST_CURRENT_MAXIMUM.encode(5)[0], timeout=self._remaining(deadline))
+        if not result:
+            return result
 
-            # # Finally - Ready for operation
-            if not await self.set_host_command_mode(self.config.HOST_POSITION_MODE):
-                return False
+        # # Finally - Ready for operation
+        result = await self.set_host_command_mode(self.config.HOST_POSITION_MODE, timeout=self._remaining(deadline))
+        if not result:
+            return result
 
-            # Enable motors
-            if not await self.set_ieg_mode(self.config.ENABLE_MAINTAINED_VALUE):
-                return False
-            return True
-    async def rotate(self, pitch_value, roll_value) -> None:
+        # Enable motors
+        return await self.set_ieg_mode(self.config.ENABLE_MAINTAINED_VALUE, timeout=self._remaining(deadline))
+    async def rotate(self, pitch_value, roll_value, trace=None, timeout=None) -> None:
+        """trace is an optional MotionTrace that gets the kinematics and modbus write timestamps,
+        timeout is the setpoints write budget (see set_host_position)"""
         try:
-            result = calculate_target_revs(self,pitch_value=pitch_value, roll_value=roll_value)
+            if self.kinematics_table is not None:
+                result = self.kinematics_table.lookup(pitch_value, roll_value)
+            else:
+                result = calculate_target_revs(self,pitch_value=pitch_value, roll_value=roll_value)
+            if trace is not None:
+                trace.mark("kinematics")
             if result:
                 left_vals, right_vals = result 
                 
-                await self.set_host_position((left_vals, right_vals))
+                await self._command_position((left_vals, right_vals), trace=trace, timeout=timeout)
         except Exception as e:
             self.logger.error(f"Something went wrong trying to rotate the platform: {e}")
-    async def get_telemetry_data(self) -> Union[tuple, bool]:
+    def target_revs(self, pitch_value, roll_value) -> Optional[Tuple[float, float]]:
+        """(left, right) target revs for pitch and roll before the safety clamp, None if it can't be calculated"""
+        try:
+            if self.kinematics_table is not None:
+                (left_pos, right_pos) = self.kinematics_table.lookup_pos(pitch_value, roll_value)
+                return (left_pos / 65536, right_pos / 65536)
+            return calculate_servo_revs(pitch_value, roll_value)
+        except Exception as e:
+            self.logger.error(f"Something went wrong calculating the target revs: {e}")
+            return None
+    async def move_to_revs(self, left_revs, right_revs, trace=None, timeout=None) -> bool:
+        """Clamps the revs within the safety limits and writes them as the host positions,
+        trace and timeout work like in rotate"""
+        values = clamp_target_revs(left_revs, right_revs, self.config)
+        if trace is not None:
+            trace.mark("kinematics")
+        return await self._command_position((values[0], values[1]), trace=trace, timeout=timeout)
+    async def read_value(self, name, log=False, timeout=None) -> Union[tuple, bool]:
+        """Reads a register from REGISTER_FORMATS from both motors and decodes it with its compiled codec
+        Returns:
+            (left_value, right_value) or False if the read fails
+        """
+        codec = self.registers[name]
+        vals = await self._read(address=codec.address, description=f"_read {name}", count=codec.count, log=log, deadline=self._deadline(timeout))
+        if not vals:
+            return vals
+        left_vals, right_vals = vals
+        if codec.count == 1:
+            left_vals, right_vals = [left_vals], [right_vals]
+        return (codec.decode(left_vals), codec.decode(right_vals))
+    async def write_value(self, name, value, timeout=None) -> bool:
+        """Encodes value with the registers compiled codec and writes it to both motors"""
+        codec = self.registers[name]
+        return await self._write(address=codec.address, values=codec.encode(value), description=f"write {name}", deadline=self._deadline(timeout))
+    async def verify_register_cache(self, unverified_only=True, timeout=None) -> Union[int, bool]:
+        """Reads the cached registers back from both motors. Matching entries are trusted again,
+        drifted ones are dropped so the next configuration write goes through.
+        Returns:
+            the number of drifted registers or False (TIMED_OUT) if the read fails
+        """
+        registers = self.register_cache.registers(unverified_only=unverified_only)
+        if not registers:
+            return 0
+        blocks = plan_register_blocks(registers, max_gap=self.config.BLOCK_READ_MAX_GAP, max_size=self.config.BLOCK_READ_MAX_SIZE)
+        vals = await self.read_register_blocks(blocks, description="_read cached registers", timeout=timeout)
+        if not vals:
+            return vals
+        drifted = 0
+        for name, (left_vals, right_vals) in vals.items():
+            if not self.register_cache.confirm(int(name), left_vals, right_vals):
+                drifted += 1
+        return drifted
+    async def read_register_blocks(self, blocks, description, log=False, timeout=None) -> Union[dict, bool]:
+        """Reads planned register blocks (see plan_register_blocks) from both motors
+        Returns:
+            dict of name -> (left_vals, right_vals) or False (TIMED_OUT) if any of the reads fail
+        """
+        deadline = self._deadline(timeout)
+        ### the blocks are independent, with a connection pool they are read in parallel
+        responses = await asyncio.gather(*[
+            self._read(address=block.address, description=description, count=block.count, log=log, deadline=deadline)
+            for block in blocks])
+        results = []
+        for block, vals in zip(blocks, responses):
+            if not vals:
+                return vals
+            left_vals, right_vals = vals
+            if block.count == 1:
+                left_vals, right_vals = [left_vals], [right_vals]
+            results.append((left_vals, right_vals))
+        return slice_register_blocks(blocks, results)
+    async def get_telemetry_data(self, timeout=None) -> Union[tuple, bool]:
         """Reads the motors current board tempereature,
         actuator temperature, continuous current and present VBUS voltage
         Returns:
             ((left_board_tmp, right_board_tmp), (left_actuator_tmp, right_actuator_tmp), (left_IC, right_IC), (left_VBUS, right_VBUS))
         """
-        vals = await self._read(address=self.config.BOARD_TMP, description="_read board temperature", count=1)
+        vals = await self.read_register_blocks(self.telemetry_blocks, description="_read telemetry registers", timeout=timeout)
         if not vals:
-            return False
+            return vals
+
         ### 11.5
-        left_board_tmp, right_board_tmp = vals
-        left_board_tmp = bit_high_low_both(left_board_tmp, 5, "high")
-        right_board_tmp = bit_high_low_both(right_board_tmp, 5, "high")
+        left_board_tmp, right_board_tmp = vals["BOARD_TMP"]
+        left_board_tmp = bit_high_low_both(left_board_tmp[0], 5, "high")
+        right_board_tmp = bit_high_low_both(right_board_tmp[0], 5, "high")
 
-        vals = await self._read(address=self.config.ACTUATOR_TMP, description="_read actuator temperature", count=1)
-        if not vals:
-            return False
         ### 13.3
-        left_actuator_tmp, right_actuator_tmp = vals
-        left_actuator_tmp = bit_high_low_both(left_actuator_tmp, 3, "high")
-        right_actuator_tmp = bit_high_low_both(right_actuator_tmp, 3, "high")
+        left_actuator_tmp, right_actuator_tmp = vals["ACTUATOR_TMP"]
+        left_actuator_tmp = bit_high_low_both(left_actuator_tmp[0], 3, "high")
+        right_actuator_tmp = bit_high_low_both(right_actuator_tmp[0], 3, "high")
 
-        vals = await self._read(address=self.config.ICONTINUOUS, description="_read present current ", count=2)
-        if not vals:
-            return False
-        
-        left_IC, right_IC = vals
-        left_VBUS = registers_convertion(left_IC, "9.23")
-        right_VBUS = registers_convertion(right_VBUS, "9.23")
+        ### 9.23
+        left_IC, right_IC = vals["ICONTINUOUS"]
+        left_IC = self.registers.ICONTINUOUS.decode(left_IC)
+        right_IC = self.registers.ICONTINUOUS.decode(right_IC)
 
-        vals = await self._read(address=self.config.VBUS, description="_read present VBUS voltage ", count=2)
         ### 11.21
-        if not vals:
-            return False
-        left_VBUS, right_VBUS = vals
-
-        ### Extract the high value part and deccimal part 11.21
-        left_VBUS = registers_convertion(left_VBUS, "11.21", signed=True)
-        right_VBUS = registers_convertion(right_VBUS, "11.21", signed=True)
+        left_VBUS, right_VBUS = vals["VBUS"]
+        left_VBUS = self.registers.VBUS.decode(left_VBUS)
+        right_VBUS = self.registers.VBUS.decode(right_VBUS)
         
         return ((left_board_tmp, right_board_tmp), (left_actuator_tmp, right_actuator_tmp), (left_IC, right_IC), (left_VBUS, right_VBUS))
-    
-        
@@ -0,0 +1,136 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+CONNECTED = "connected"
+RECONNECTING = "reconnecting"
+DISCONNECTED = "disconnected"
+
+class ConnectionMonitor:
+    """
+    Health checks every modbus connection of both drives with a lightweight read
+    (probe) every interval. A connection that is closed or whose probe has raised or
+    taken longer than timeout failures_before_reconnect times in a row is closed and
+    connected again, the client objects stay the same so MotorApi keeps using them.
+    State changes per drive are handed to on_state_change(side, state, message).
+    Probes go straight to the clients instead of the request scheduler so they
+    still run when the breaker is open. Connections is_busy(side, client) reports
+    as running a request are not probed, the probe would only time the wait for
+    the clients lock and closing them would fail the request.
+    """
+    def __init__(self, clients, logger, probe: Callable[[object], Awaitable[object]],
+                 on_state_change: Optional[Callable[[str, str, str], Awaitable[None]]] = None,
+                 is_busy: Optional[Callable[[str, object], bool]] = None,
+                 interval=0.5, timeout=0.5, reconnect_attempts=3, failures_before_reconnect=3):
+        self.clients = clients
+        self.logger = logger
+        self.probe = probe
+        self.on_state_change = on_state_change
+        self.is_busy = is_busy
+        self.interval = interval
+        self.timeout = timeout
+        self.reconnect_attempts = reconnect_attempts
+        self.failures_before_reconnect = max(1, int(failures_before_reconnect))
+        ### failed probes in a row per client id
+        self._failures = {}
+        self.states = {"left": CONNECTED, "right": CONNECTED}
+        self.checks = 0
+        self.failed_probes = 0
+        self.skipped_probes = 0
+        self.dead_connections = 0
+        self.reconnects = 0
+        self.last_recovery_ms: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.task is not None and not self.task.done():
+            return
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def is_alive(self, client) -> bool:
+        if not client.connected:
+            return False
+        try:
+            ### an error response still means the drive answered
+            await asyncio.wait_for(self.probe(client), self.timeout)
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.debug(f"Connection health check failed: {e!r}")
+            return False
+
+    async def _set_state(self, side, state, message) -> None:
+        if self.states[side] == state:
+            return
+        self.states[side] = state
+        log = self.logger.info if state == CONNECTED else self.logger.warning
+        log(f"{side} drive connection {state}: {message}")
+        if self.on_state_change is not None:
+            try:
+                await self.on_state_change(side, state, message)
+            except Exception as e:
+                self.logger.error(f"Error while publishing connection state: {e}")
+
+    async def check(self, side) -> bool:
+        """Checks and reconnects one drives connections, returns True if they all are up"""
+        loop = asyncio.get_running_loop()
+        pool = self.clients.pool(side)
+        idle = [client for client in pool if self.is_busy is None or not self.is_busy(side, client)]
+        self.skipped_probes += len(pool) - len(idle)
+        alive = await asyncio.gather(*[self.is_alive(client) for client in idle])
+        self.checks += 1
+        dead = []
+        for client, ok in zip(idle, alive):
+            failures = 0 if ok else self._failures.get(id(client), 0) + 1
+            self._failures[id(client)] = failures
+            if not ok:
+                self.failed_probes += 1
+            ### a single slow answer doesn't make a connection dead, a closed one is
+            if not client.connected or failures >= self.failures_before_reconnect:
+                dead.append(client)
+        if not dead:
+            if all(alive):
+                await self._set_state(side, CONNECTED, "all connections answer")
+            return True
+
+        self.dead_connections += len(dead)
+        await self._set_state(side, RECONNECTING, f"{len(dead)}/{len(pool)} connections dead")
+        start = loop.time()
+        results = await asyncio.gather(*[
+            self.clients.reconnect(side, client, max_attempts=self.reconnect_attempts) for client in dead])
+        for client, result in zip(dead, results):
+            if result:
+                self._failures[id(client)] = 0
+        if all(results):
+            self.reconnects += len(dead)
+            self.last_recovery_ms = (loop.time() - start) * 1000
+            await self._set_state(side, CONNECTED, f"reconnected in {self.last_recovery_ms:.1f} ms")
+            return True
+        await self._set_state(side, DISCONNECTED, "reconnecting failed, retrying on the next check")
+        return False
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.gather(self.check("left"), self.check("right"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Unexpected error in connection monitor: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "states": dict(self.states),
+            "checks": self.checks,
+            "failed_probes": self.failed_probes,
+            "skipped_probes": self.skipped_probes,
+            "dead_connections": self.dead_connections,
+            "reconnects": self.reconnects,
+            "last_recovery_ms": self.last_recovery_ms,
+        }
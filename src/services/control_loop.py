@@ -0,0 +1,122 @@
+import asyncio
+from collections import deque
+from typing import Optional
+from services.motion_writer import MotionWriter
+
+class ControlLoop(MotionWriter):
+    """
+    Fixed-rate motion control loop. Ticks at POS_UPDATE_HZ on absolute deadlines
+    (start + n * period) so the schedule doesn't drift, samples the latest
+    requested pitch/roll and writes the host positions every tick.
+    Ticks that are missed because a write took longer than the period are
+    skipped and counted as overruns instead of being run late back to back.
+    If status_listener is set OEG_STATUS is read every status_every ticks and
+    handed to it, so the fault monitor doesn't need its own polling. The read
+    runs beside the ticks, a slow drive delays the status and not the motion.
+    clock and sleep default to the event loops time and asyncio.sleep.
+    """
+    def __init__(self, motor_api, logger, frequency, jitter_samples=1000, status_every=1, clock=None, sleep=asyncio.sleep):
+        super().__init__(motor_api, logger)
+        self.clock = clock
+        self.sleep = sleep
+        self.status_listener = None
+        self.status_every = max(1, int(status_every))
+        self._status_task: Optional[asyncio.Task] = None
+        self.status_skips = 0
+        frequency = float(frequency)
+        if frequency <= 0:
+            raise ValueError(f"Control loop frequency has to be positive, got: {frequency}")
+        self.frequency = frequency
+        self.period = 1.0 / frequency
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        self.max_jitter = 0.0
+        self._jitter_sum = 0.0
+        ### most recent wake-up delays (s) for percentiles
+        self.jitter = deque(maxlen=jitter_samples)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        recent = sorted(self.jitter)
+        stats.update({
+            "frequency": self.frequency,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "jitter_mean_ms": (self._jitter_sum / self.ticks * 1000) if self.ticks else 0.0,
+            "jitter_p99_ms": recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000 if recent else 0.0,
+            "jitter_max_ms": self.max_jitter * 1000,
+            "status_skips": self.status_skips,
+        })
+        return stats
+
+    def _record_tick(self, jitter) -> None:
+        self.ticks += 1
+        self._jitter_sum += jitter
+        self.jitter.append(jitter)
+        if jitter > self.max_jitter:
+            self.max_jitter = jitter
+
+    async def tick(self) -> None:
+        """One control cycle, write the latest setpoint to the motors"""
+        ### the latest setpoint is re-sent every tick even if nothing new has arrived
+        setpoint = self.slot.consume()
+        if setpoint is None:
+            return
+        trace = self.slot.take_trace()
+        self._count_coalesced()
+        (pitch, roll) = setpoint
+        await self.motor_api.rotate(pitch, roll, trace=trace)
+        self.writes += 1
+
+    def stop(self) -> None:
+        if self._status_task is not None:
+            self._status_task.cancel()
+            self._status_task = None
+        super().stop()
+
+    async def read_status(self) -> None:
+        ### given up when the next status read is due
+        vals = await self.motor_api.check_fault_stauts(log=False, timeout=self.status_every * self.period)
+        if vals and self.status_listener is not None:
+            self.status_listener(vals)
+
+    def _start_status_read(self) -> None:
+        if self._status_task is not None and not self._status_task.done():
+            self.status_skips += 1
+            return
+        self._status_task = asyncio.create_task(self.read_status())
+
+    async def _run(self):
+        clock = self.clock or asyncio.get_running_loop().time
+        self._dropped_before = self.slot.dropped
+        start = clock()
+        n = 0
+        self.logger.info(f"Control loop started at {self.frequency} Hz")
+        while True:
+            try:
+                deadline = start + n * self.period
+                delay = deadline - clock()
+                if delay > 0:
+                    await self.sleep(delay)
+                self._record_tick(max(0.0, clock() - deadline))
+
+                await self.tick()
+                if self.status_listener is not None and self.ticks % self.status_every == 0:
+                    self._start_status_read()
+
+                ### next deadline, skipping the ones the tick already ran over
+                n += 1
+                now = clock()
+                next_deadline = start + n * self.period
+                if now > next_deadline:
+                    missed = int((now - next_deadline) / self.period) + 1
+                    self.overruns += 1
+                    self.missed_ticks += missed
+                    n += missed
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Unexpected error in control loop: {e}")
+                n += 1
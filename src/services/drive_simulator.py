@@ -0,0 +1,257 @@
+import asyncio
+import math
+import random
+from time import monotonic
+from typing import Optional
+from pymodbus.datastore import ModbusSequentialDataBlock, ModbusServerContext, ModbusSlaveContext
+from pymodbus.server import ModbusTcpServer
+from helpers.fault_decoder import fault_severity, ABSOLUTE
+from settings.motors_config import MotorConfig
+from utils.register_map import build_register_map, RegisterCodec, RegisterSpec
+from utils.utils import is_nth_bit_on
+
+### OEG_STATUS bits the host code reads
+OEG_HOMED_BIT = 1
+OEG_FAULT_BIT = 3
+### IEG_MOTION bits
+IEG_MOTION_STOP_BIT = 2
+IEG_MOTION_HOME_BIT = 8
+### IEG_MODE bits
+IEG_MODE_ENABLE_BIT = 1
+IEG_MODE_RESET_FAULT_BIT = 15
+
+HOLDING_REGISTERS = 8192 # covers every address in MotorConfig
+PHYSICS_STEP = 0.001 # seconds
+MAX_CATCH_UP = 60.0 # seconds of motion integrated at once after the drive has been idle
+
+class SimulatedDrive(ModbusSlaveContext):
+    """
+    Holding register model of one Tritex drive for running the stack without hardware.
+    Motion is integrated lazily on every request, so PFEEDBACK_POSITION follows
+    HOST_POSITION (in host position mode, enabled and homed) with the velocity and
+    acceleration limits written to HOST_VEL_MAXIMUM / HOST_ACCELERATION_MAXIMUM.
+    Every request is answered after latency + uniform(0, jitter) seconds.
+    """
+    def __init__(self, name="drive", motor_config=MotorConfig(), latency=0.0, jitter=0.0,
+                 initial_position=5.0, homing_velocity=1.0, default_velocity=1.0,
+                 default_acceleration=2.0, seed=None):
+        super().__init__(hr=ModbusSequentialDataBlock(0, [0] * HOLDING_REGISTERS))
+        self.name = name
+        self.config = motor_config
+        self.registers = build_register_map(motor_config)
+        ### the whole VEL32 8.24 feedback velocity, the host reads only its high word VFEEDBACK_VELOCITY
+        self.vel32 = RegisterCodec(RegisterSpec(name="VEL32", address=motor_config.VFEEDBACK_VELOCITY - 1, fmt="8.24", signed=True))
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.homing_velocity = homing_velocity
+        self.default_velocity = default_velocity
+        self.default_acceleration = default_acceleration
+
+        self.position = initial_position # revs
+        self.velocity = 0.0 # revs/s
+        self.homed = False
+        self.homing = False
+        self.hold = False # set by the stop bit, released by the next HOST_POSITION write
+        self.present_fault = 0
+        self.board_temperature = 35.0
+        self.actuator_temperature = 30.0
+        self.bus_voltage = 48.0
+        self.requests = 0
+        self.last_update = monotonic()
+        self._publish()
+
+    ### register access
+    def _get(self, name) -> float:
+        codec = self.registers[name]
+        return codec.decode(self.getValues(3, codec.address, codec.count))
+
+    def _set(self, name, value) -> None:
+        codec = self.registers[name]
+        self.setValues(3, codec.address, codec.encode(value))
+
+    def _raw(self, name) -> int:
+        return self.getValues(3, self.registers[name].address, 1)[0]
+
+    async def _delay(self) -> None:
+        self.requests += 1
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def async_getValues(self, fc_as_hex, address, count=1):
+        await self._delay()
+        self.advance()
+        return self.getValues(fc_as_hex, address, count)
+
+    async def async_setValues(self, fc_as_hex, address, values):
+        await self._delay()
+        self.advance()
+        previous = {name: self._raw(name) for name in ("IEG_MOTION", "IEG_MODE")}
+        self.setValues(fc_as_hex, address, values)
+        self._on_write(address, len(values), previous)
+
+    ### drive behaviour
+    def _written(self, name, address, count) -> bool:
+        codec = self.registers[name]
+        return address < codec.address + codec.count and codec.address < address + count
+
+    def _on_write(self, address, count, previous) -> None:
+        if self._written("SYSTEM_COMMAND", address, count) and self._raw("SYSTEM_COMMAND") == self.config.RESTART_VALUE:
+            self.restart()
+            return
+
+        if self._written("IEG_MOTION", address, count):
+            rising = self._raw("IEG_MOTION") & ~previous["IEG_MOTION"]
+            if is_nth_bit_on(IEG_MOTION_STOP_BIT, rising):
+                self.homing = False
+                self.hold = True
+            if is_nth_bit_on(IEG_MOTION_HOME_BIT, rising) and not self.present_fault:
+                self.homing = True
+                self.homed = False
+                self.hold = False
+
+        if self._written("IEG_MODE", address, count):
+            rising = self._raw("IEG_MODE") & ~previous["IEG_MODE"]
+            if is_nth_bit_on(IEG_MODE_RESET_FAULT_BIT, rising):
+                self.reset_fault()
+
+        if self._written("HOST_POSITION", address, count):
+            self.hold = False
+
+        self._publish()
+
+    def restart(self) -> None:
+        """SYSTEM_COMMAND restart, host settings go back to power-on values"""
+        for name in ("IEG_MODE", "IEG_MOTION", "COMMAND_MODE", "SYSTEM_COMMAND", "HOST_VEL_MAXIMUM",
+                     "HOST_ACCELERATION_MAXIMUM", "HOST_CURRENT_MAXIMUM"):
+            self._set(name, 0)
+        self._set("HOST_POSITION", self.position)
+        self.homed = False
+        self.homing = False
+        self.hold = False
+        self._publish()
+
+    def inject_fault(self, code) -> None:
+        """Raises a fault (value from constants.fault_codes), the drive stops and sets the OEG_STATUS fault bit"""
+        self.advance()
+        self.present_fault = code
+        self._set("RECENT_FAULT_ADDRESS", code)
+        self.homing = False
+        self._publish()
+
+    def reset_fault(self) -> None:
+        """Fault reset bit, absolute faults can't be cleared"""
+        if fault_severity(self.present_fault) == ABSOLUTE:
+            return
+        self.present_fault = 0
+        self._publish()
+
+    def _limits(self):
+        velocity = self._get("HOST_VEL_MAXIMUM") or self.default_velocity
+        acceleration = self._get("HOST_ACCELERATION_MAXIMUM") or self.default_acceleration
+        return velocity, acceleration
+
+    def _target(self) -> Optional[float]:
+        if self.present_fault or self.hold:
+            return None
+        if self.homing:
+            return 0.0
+        enabled = is_nth_bit_on(IEG_MODE_ENABLE_BIT, self._raw("IEG_MODE"))
+        if self.homed and enabled and self._raw("COMMAND_MODE") == self.config.HOST_POSITION_MODE:
+            return min(max(self._get("HOST_POSITION"), 0.0), self.config.POS_MAX_REVS)
+        return None
+
+    def advance(self, now=None) -> None:
+        """Integrates motion up to now"""
+        now = monotonic() if now is None else now
+        elapsed = min(now - self.last_update, MAX_CATCH_UP)
+        self.last_update = now
+        if elapsed <= 0:
+            return
+
+        target = self._target()
+        max_velocity, acceleration = self._limits()
+        if self.homing:
+            max_velocity = self.homing_velocity
+
+        while elapsed > 0:
+            dt = min(elapsed, PHYSICS_STEP)
+            elapsed -= dt
+            if target is None:
+                desired = 0.0
+                if self.velocity == 0.0:
+                    break
+            else:
+                distance = target - self.position
+                if abs(distance) <= max(abs(self.velocity) * dt, 1e-9) and abs(self.velocity) <= acceleration * dt * 2:
+                    self.position = target
+                    self.velocity = 0.0
+                    break
+                ### fastest velocity that can still brake before the target
+                desired = math.copysign(min(max_velocity, math.sqrt(2 * acceleration * abs(distance))), distance)
+            change = max(-acceleration * dt, min(desired - self.velocity, acceleration * dt))
+            self.velocity += change
+            self.position += self.velocity * dt
+
+        if self.homing and target is not None and self.position == target and self.velocity == 0.0:
+            self.homing = False
+            self.homed = True
+        self._publish()
+
+    def _publish(self) -> None:
+        """Writes the drives state into its output registers"""
+        status = 0
+        if self.homed:
+            status |= 1 << OEG_HOMED_BIT
+        if self.present_fault:
+            status |= 1 << OEG_FAULT_BIT
+        self._set("OEG_STATUS", status)
+        self._set("PRESENT_FAULT_ADDRESS", self.present_fault)
+        self._set("PFEEDBACK_POSITION", self.position)
+        self.setValues(3, self.vel32.address, self.vel32.encode(self.velocity))
+        self._set("BOARD_TMP", self.board_temperature)
+        self._set("ACTUATOR_TMP", self.actuator_temperature)
+        self._set("ICONTINUOUS", 0.2 + abs(self.velocity) * 0.5)
+        self._set("VBUS", self.bus_voltage)
+
+class DriveSimulator:
+    """Serves a SimulatedDrive over modbus tcp, port 0 picks a free port (read it from port once started)"""
+    def __init__(self, drive: SimulatedDrive, host="127.0.0.1", port=5020):
+        self.drive = drive
+        self.host = host
+        self.port = port
+        self.server: Optional[ModbusTcpServer] = None
+        self.task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self.server = ModbusTcpServer(ModbusServerContext(slaves=self.drive, single=True), address=(self.host, self.port))
+        self.task = asyncio.create_task(self.server.serve_forever())
+        ### wait until the socket is listening
+        for _ in range(100):
+            if self.server.transport is not None:
+                ### keep the port, a restart after stop() listens on the same one
+                self.port = self.server.transport.sockets[0].getsockname()[1]
+                return
+            await asyncio.sleep(0.01)
+        raise RuntimeError(f"Drive simulator {self.drive.name} did not start on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self.server is not None:
+            await self.server.shutdown()
+            self.server = None
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+async def start_drive_simulators(host="127.0.0.1", port_left=5020, port_right=5021, **drive_kwargs):
+    """Starts left and right simulated drives, returns (left, right) DriveSimulators"""
+    left = DriveSimulator(SimulatedDrive(name="left", **drive_kwargs), host, port_left)
+    right = DriveSimulator(SimulatedDrive(name="right", **drive_kwargs), host, port_right)
+    await left.start()
+    try:
+        await right.start()
+    except Exception:
+        await left.stop()
+        raise
+    return left, right
@@ -0,0 +1,174 @@
+import mmap
+import os
+import struct
+from datetime import datetime
+from time import monotonic, time
+from typing import Optional
+import numpy as np
+from helpers.fault_decoder import fault_conditions, fault_severity, status_conditions, SEVERITY_NAMES
+from utils.setup_logging import get_log_dir
+
+### record kinds
+STATUS = 1 # OEG_STATUS changed, previous has the old value
+FAULT = 2 # fault register changed, detail has the severity
+IEG_MODE = 3 # IEG_MODE write, detail 1 if it was acknowledged
+MOTION_COMMAND = 4 # IEG_MOTION write (home, stop), detail 1 if it was acknowledged
+HOMED = 5
+STOPPED = 6
+RESTART = 7 # software power-on restart of the drives
+KIND_NAMES = {STATUS: "status", FAULT: "fault", IEG_MODE: "ieg_mode", MOTION_COMMAND: "motion",
+              HOMED: "homed", STOPPED: "stopped", RESTART: "restart"}
+
+### record sides
+LEFT = 0
+RIGHT = 1
+BOTH = 2
+SIDE_NAMES = ("left", "right", "both")
+
+### file header: magic, version, record size, creation time
+HEADER = struct.Struct("<4sHHd")
+MAGIC = b"LJRN"
+VERSION = 1
+### wall time, monotonic time, kind, side, detail, value, previous value, writer pid
+RECORD = struct.Struct("<ddBBHIII")
+RECORD_DTYPE = np.dtype([("time", "<f8"), ("monotonic", "<f8"), ("kind", "u1"), ("side", "u1"),
+                         ("detail", "<u2"), ("value", "<u4"), ("previous", "<u4"), ("pid", "<u4")])
+
+class EventJournal:
+    """
+    Append-only journal of drive state transitions with fixed size binary records.
+    Every record is a single O_APPEND write, so the server and the fault poller can
+    share one file. Read it with JournalReader or the event_journal.py CLI.
+    """
+    def __init__(self, path, logger, clock=time):
+        self.path = path
+        self.logger = logger
+        self.clock = clock
+        self.pid = os.getpid()
+        self.records = 0
+        self.errors = 0
+        self._status = [None, None]
+        self._faults = [None, None]
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        if os.fstat(self.fd).st_size == 0:
+            os.write(self.fd, HEADER.pack(MAGIC, VERSION, RECORD.size, self.clock()))
+
+    def record(self, kind, side, value, previous=0, detail=0) -> bool:
+        if self.fd is None:
+            return False
+        try:
+            os.write(self.fd, RECORD.pack(self.clock(), monotonic(), kind, side, detail,
+                                          value & 0xFFFFFFFF, previous & 0xFFFFFFFF, self.pid))
+            self.records += 1
+            return True
+        except (OSError, struct.error) as e:
+            self.errors += 1
+            self.logger.error(f"Writing to the event journal {self.path} failed: {e}")
+            return False
+
+    def status(self, vals) -> None:
+        """OEG_STATUS (left, right), only changes are recorded"""
+        for side, value in enumerate(vals):
+            if value != self._status[side]:
+                self.record(STATUS, side, value, previous=self._status[side] or 0)
+                self._status[side] = value
+
+    def faults(self, vals) -> None:
+        """Fault register values (left, right), only changes are recorded"""
+        for side, value in enumerate(vals):
+            if value != self._faults[side]:
+                self.record(FAULT, side, value, previous=self._faults[side] or 0, detail=fault_severity(value))
+                self._faults[side] = value
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def journal_path(path) -> str:
+    """Relative journal paths are in the logs directory"""
+    return path if os.path.isabs(path) else os.path.join(get_log_dir(), path)
+
+def open_event_journal(path, logger) -> Optional[EventJournal]:
+    """Returns None if path is empty or the journal can't be opened, motor control works without it"""
+    if not path:
+        return None
+    try:
+        return EventJournal(journal_path(path), logger)
+    except OSError as e:
+        logger.error(f"Could not open the event journal {path}: {e}")
+        return None
+
+class JournalReader:
+    """
+    Memory-maps a journal as a numpy record array, a trailing partial record
+    (a write in progress) is left out. Use as a context manager.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = None
+        self.created = None
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            return
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, record_size, self.created) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is not an event journal (version {VERSION})")
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=(size - HEADER.size) // RECORD.size, offset=HEADER.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.records)
+
+    def query(self, since=None, until=None, kinds=None, side=None, severity=None, fault_bits=None) -> np.ndarray:
+        """
+        Records in the wall time range [since, until) of the given kinds and side
+        (records of both drives included). severity and fault_bits select fault
+        records with at least that severity or any of those bits set.
+        """
+        records = self.records
+        mask = np.ones(len(records), dtype=bool)
+        if since is not None:
+            mask &= records["time"] >= since
+        if until is not None:
+            mask &= records["time"] < until
+        if kinds is not None:
+            mask &= np.isin(records["kind"], list(kinds))
+        if side is not None:
+            mask &= (records["side"] == side) | (records["side"] == BOTH)
+        if severity is not None:
+            mask &= (records["kind"] == FAULT) & (records["detail"] >= severity)
+        if fault_bits is not None:
+            mask &= (records["kind"] == FAULT) & ((records["value"] & fault_bits) != 0)
+        return records[mask]
+
+    def close(self) -> None:
+        ### the numpy view has to go before the mapping can be closed
+        self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+def describe_record(record) -> str:
+    kind = int(record["kind"])
+    value = int(record["value"])
+    text = f"{value}"
+    if kind == STATUS:
+        text = f"{value} ({', '.join(status_conditions(value)) or 'none'}) was {int(record['previous'])}"
+    elif kind == FAULT:
+        conditions = ", ".join(description for (_, description) in fault_conditions(value)) or "cleared"
+        text = f"{value} {SEVERITY_NAMES[int(record['detail'])]}: {conditions}"
+    elif kind in (IEG_MODE, MOTION_COMMAND):
+        text = f"{value}{'' if record['detail'] else ' (not acknowledged)'}"
+    stamp = datetime.fromtimestamp(float(record["time"])).isoformat(timespec="milliseconds")
+    return f"{stamp} pid {int(record['pid'])} {SIDE_NAMES[int(record['side'])]:<5} {KIND_NAMES.get(kind, kind):<8} {text}"
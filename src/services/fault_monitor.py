@@ -0,0 +1,96 @@
+import asyncio
+from time import time
+from typing import Awaitable, Callable, Optional
+from helpers.fault_helpers import has_faulted, get_fault_event
+from helpers.fault_decoder import status_conditions
+
+class FaultMonitor:
+    """
+    In-process replacement for the fault_poller.py process. Uses the hubs own
+    MotorApi (same modbus connections) and either gets OEG_STATUS from the control
+    loops read cycle through on_status or polls it itself every poll_interval.
+    """
+    def __init__(self, motor_api, logger, motor_config,
+                 on_absolute_fault: Callable[[str], Awaitable[None]],
+                 on_critical_fault: Callable[[str], Awaitable[None]],
+                 poll_interval=5.0):
+        self.motor_api = motor_api
+        self.logger = logger
+        self.motor_config = motor_config
+        self.on_absolute_fault = on_absolute_fault
+        self.on_critical_fault = on_critical_fault
+        self.poll_interval = poll_interval
+        self.has_faulted = False
+        self.task: Optional[asyncio.Task] = None
+        self._handler: Optional[asyncio.Task] = None
+        self.last_detection: Optional[float] = None
+
+    def start(self, attached=False) -> None:
+        """attached=True when OEG_STATUS comes from the control loop, otherwise polls on its own"""
+        if attached or (self.task is not None and not self.task.done()):
+            return
+        self.task = asyncio.create_task(self._poll())
+
+    def stop(self) -> None:
+        ### the absolute fault shutdown runs in the handler task and stops the monitor on its way
+        current = asyncio.current_task()
+        for task in (self.task, self._handler):
+            if task is not None and task is not current:
+                task.cancel()
+        self.task = None
+        self._handler = None
+
+    def fault_cleared(self) -> None:
+        self.has_faulted = False
+        self.logger.info("Fault has cleared, fault monitor active again")
+
+    def on_status(self, vals) -> None:
+        """OEG_STATUS (left, right) from the control loop. Never blocks the loop, handling runs as its own task"""
+        if self.has_faulted or (self._handler is not None and not self._handler.done()):
+            return
+        l_has_faulted, r_has_faulted = has_faulted(vals)
+        if l_has_faulted or r_has_faulted:
+            self.last_detection = time()
+            self._handler = asyncio.create_task(self.handle_status(vals))
+
+    async def handle_status(self, vals) -> None:
+        try:
+            fault = await get_fault_event(self.motor_api, vals)
+            if fault is None:
+                return
+            if fault is False:
+                self.logger.error("Getting recent fault was not succesful")
+                return
+
+            (kind, message) = fault
+            (left, right) = vals
+            self.logger.info(f"Drive status left: {', '.join(status_conditions(left))}, right: {', '.join(status_conditions(right))}")
+            if kind == "absolute":
+                self.has_faulted = True
+                self.logger.error(f"absolutefault DETECTED: {message}")
+                await self.on_absolute_fault(message)
+            elif kind == "critical":
+                self.has_faulted = True
+                self.logger.error(message)
+                await self.on_critical_fault(message)
+            else:
+                ### raise reset fault bit and reset the register to 0
+                await self.motor_api.set_ieg_mode(self.motor_config.RESET_FAULT_VALUE)
+                await self.motor_api.set_ieg_mode(0)
+                self.logger.info(f"Fault cleared: {message}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.error(f"Unexpected error while handling a fault: {e}")
+
+    async def _poll(self):
+        self.logger.info(f"Starting fault monitor with polling time interval: {self.poll_interval}")
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if self.has_faulted:
+                continue
+            vals = await self.motor_api.check_fault_stauts(log=False)
+            if not vals:
+                self.logger.error("something went wrong while checkigng fault status")
+                continue
+            self.on_status(vals)
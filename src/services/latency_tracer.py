@@ -0,0 +1,87 @@
+from collections import deque
+from time import perf_counter
+from typing import Dict, List
+
+### motion path stages in the order a rotate frame goes through them
+MOTION_STAGES = ("receive", "parse", "dequeue", "kinematics", "write_issued", "write_ack")
+
+def percentiles(samples) -> dict:
+    """Latency summary of samples given in seconds, reported in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": ordered[int(last * 0.50)] * 1000,
+        "p95_ms": ordered[int(last * 0.95)] * 1000,
+        "p99_ms": ordered[int(last * 0.99)] * 1000,
+        "max_ms": ordered[last] * 1000,
+    }
+
+class MotionTrace:
+    """Timestamps of one rotate frame, finished by MotorApi.rotate once the write is acknowledged"""
+    __slots__ = ("tracer", "stamps")
+
+    def __init__(self, tracer, received_at):
+        self.tracer = tracer
+        self.stamps: Dict[str, float] = {"receive": received_at}
+
+    def mark(self, stage) -> None:
+        self.stamps[stage] = perf_counter()
+
+    def finish(self, success) -> None:
+        self.tracer.complete(self, success)
+
+    def suppress(self) -> None:
+        """The drives already had the setpoint and nothing was written"""
+        self.tracer.suppressed += 1
+
+class LatencyTracer:
+    """
+    Collects per stage timestamps of rotate frames from the websocket reader to
+    the modbus acknowledgement. Frames that never get written (coalesced, dropped
+    or suppressed by the position write filter) are counted but left out of the latencies.
+    """
+    def __init__(self, capacity=100000):
+        self.completed = deque(maxlen=capacity)
+        self.started = 0
+        self.failed = 0
+        self.suppressed = 0
+
+    def begin(self, received_at=None) -> MotionTrace:
+        self.started += 1
+        return MotionTrace(self, perf_counter() if received_at is None else received_at)
+
+    def complete(self, trace, success) -> None:
+        if not success:
+            self.failed += 1
+            return
+        self.completed.append(trace.stamps)
+
+    def reset(self) -> None:
+        self.completed.clear()
+        self.started = 0
+        self.failed = 0
+        self.suppressed = 0
+
+    def summary(self) -> dict:
+        stamps: List[dict] = list(self.completed)
+        stages = {}
+        for previous, stage in zip(MOTION_STAGES, MOTION_STAGES[1:]):
+            stages[f"{previous}->{stage}"] = percentiles([s[stage] - s[previous] for s in stamps if stage in s and previous in s])
+        return {
+            "started": self.started,
+            "completed": len(stamps),
+            "failed": self.failed,
+            "suppressed": self.suppressed,
+            "not_written": self.started - len(stamps) - self.failed - self.suppressed,
+            "end_to_end": percentiles([s["write_ack"] - s["receive"] for s in stamps]),
+            "stages": stages,
+            ### only with independent side writes, each drive's own write latency
+            "sides": {
+                side: percentiles([s[f"write_ack_{side}"] - s["write_issued"] for s in stamps if f"write_ack_{side}" in s])
+                for side in ("left", "right")
+            },
+        }
@@ -0,0 +1,221 @@
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+### Priority classes, smaller runs first
+PRIORITY_STOP = 0
+PRIORITY_MOTION = 1
+PRIORITY_FAULT = 2
+PRIORITY_BACKGROUND = 3 # telemetry and configuration
+PRIORITY_NAMES = ("stop", "motion", "fault", "background")
+
+class RequestDroppedError(Exception):
+    """Request was never sent to the drive"""
+
+class RequestExpiredError(RequestDroppedError):
+    """Request's deadline passed while it was waiting in the queue"""
+
+class RequestSupersededError(RequestDroppedError):
+    """A newer request with the same key replaced this one in the queue"""
+
+class QueueFullError(RequestDroppedError):
+    """Priority class queue was full"""
+
+class NotConnectedError(ConnectionError):
+    """The drive has no connections yet"""
+
+class _Request:
+    __slots__ = ("request", "deadline", "key", "concurrent", "queued_at", "future")
+
+    def __init__(self, request, deadline, key, concurrent, queued_at, future):
+        self.request = request
+        self.deadline = deadline
+        self.key = key
+        self.concurrent = concurrent
+        self.queued_at = queued_at
+        self.future = future
+
+class _ClassStats:
+    __slots__ = ("executed", "expired", "superseded", "rejected", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.executed = 0
+        self.expired = 0
+        self.superseded = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "executed": self.executed,
+            "expired": self.expired,
+            "superseded": self.superseded,
+            "rejected": self.rejected,
+            "wait_mean_ms": (self.wait_total / self.executed * 1000) if self.executed else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+
+class ModbusScheduler:
+    """
+    Per drive request queue in front of the modbus connections. Always starts the
+    highest priority class first, so a stop or a motion setpoint only ever waits
+    for the transactions that are already on the wire.
+    With several connections to the drive, concurrent requests (independent reads)
+    run in parallel, one per connection. Every other request runs alone, so writes
+    are never reordered.
+    Motion requests with the same key replace each other and requests whose
+    deadline has passed are dropped instead of being sent late.
+    connections is the drives connection list, it is shared (not copied) so
+    connections opened after the scheduler was made are used too.
+    """
+    def __init__(self, name, logger, connections, queue_depth=16):
+        if connections is None:
+            raise ValueError(f"{name}: the scheduler needs the drives connection list")
+        self.name = name
+        self.logger = logger
+        self.queue_depth = queue_depth
+        self.connections = connections
+        self.queues = [deque() for _ in PRIORITY_NAMES]
+        self.stats = [_ClassStats() for _ in PRIORITY_NAMES]
+        self.max_in_flight = 0
+        self._known = set()
+        self._idle = []
+        self._sync_connections()
+        self._in_flight = set()
+        self._exclusive_running = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def _sync_connections(self) -> None:
+        """Takes connections added to the shared list into use"""
+        for connection in self.connections:
+            if id(connection) not in self._known:
+                self._known.add(id(connection))
+                self._idle.append(connection)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def submit(self, priority: int, request: Callable[[Any], Awaitable[Any]], deadline=None, key=None, concurrent=False) -> Any:
+        """
+        Queues request (a coroutine function doing one modbus transaction on the connection
+        it is given) and returns its result.
+        Args:
+            deadline: event loop time after which the request is dropped with RequestExpiredError
+            key: queued requests of the same class and key are replaced with RequestSupersededError
+            concurrent: may run at the same time as other concurrent requests
+        """
+        self._sync_connections()
+        if not self._known:
+            raise NotConnectedError(f"{self.name}: drive is not connected")
+        self._ensure_worker()
+        loop = asyncio.get_running_loop()
+        queue = self.queues[priority]
+        stats = self.stats[priority]
+
+        if key is not None:
+            for item in list(queue):
+                if item.key == key:
+                    queue.remove(item)
+                    stats.superseded += 1
+                    if not item.future.done():
+                        item.future.set_exception(RequestSupersededError(f"{self.name}: superseded by a newer request"))
+
+        if len(queue) >= self.queue_depth:
+            stats.rejected += 1
+            raise QueueFullError(f"{self.name}: {PRIORITY_NAMES[priority]} queue is full ({self.queue_depth})")
+
+        item = _Request(request, deadline, key, concurrent, loop.time(), loop.create_future())
+        queue.append(item)
+        self._wakeup.set()
+        return await item.future
+
+    def _can_start(self, item) -> bool:
+        if self._exclusive_running or not self._idle:
+            return False
+        return item.concurrent or not self._in_flight
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            for queue in self.queues:
+                while queue and queue[0].future.done(): # callers gave up
+                    queue.popleft()
+            priority = next((p for p, queue in enumerate(self.queues) if queue), None)
+            ### the head of the highest class waits for a free connection, nothing overtakes it
+            if priority is None or not self._can_start(self.queues[priority][0]):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            item = self.queues[priority].popleft()
+            stats = self.stats[priority]
+            if item.future.done(): # caller gave up
+                continue
+
+            now = loop.time()
+            if item.deadline is not None and now > item.deadline:
+                stats.expired += 1
+                item.future.set_exception(RequestExpiredError(f"{self.name}: {PRIORITY_NAMES[priority]} request expired in the queue"))
+                continue
+
+            wait = now - item.queued_at
+            stats.executed += 1
+            stats.wait_total += wait
+            if wait > stats.wait_max:
+                stats.wait_max = wait
+
+            connection = self._idle.pop()
+            if not item.concurrent:
+                self._exclusive_running = True
+            task = asyncio.create_task(self._execute(item, connection))
+            self._in_flight.add(task)
+            if len(self._in_flight) > self.max_in_flight:
+                self.max_in_flight = len(self._in_flight)
+
+    async def _execute(self, item, connection):
+        try:
+            result = await item.request(connection)
+            if not item.future.done():
+                item.future.set_result(result)
+        except asyncio.CancelledError:
+            if not item.future.done():
+                item.future.cancel()
+            raise
+        except Exception as e:
+            if not item.future.done():
+                item.future.set_exception(e)
+        finally:
+            self._in_flight.discard(asyncio.current_task())
+            self._idle.append(connection)
+            if not item.concurrent:
+                self._exclusive_running = False
+            self._wakeup.set()
+
+    def busy(self, connection) -> bool:
+        """True while a request of this scheduler is running on the connection"""
+        return id(connection) in self._known and not any(idle is connection for idle in self._idle)
+
+    def queue_lengths(self) -> dict:
+        return {name: len(queue) for name, queue in zip(PRIORITY_NAMES, self.queues)}
+
+    def metrics(self) -> dict:
+        metrics = {name: stats.as_dict() for name, stats in zip(PRIORITY_NAMES, self.stats)}
+        metrics["connections"] = len(self.connections)
+        metrics["max_in_flight"] = self.max_in_flight
+        return metrics
+
+    def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for task in list(self._in_flight):
+            task.cancel()
+        for queue in self.queues:
+            while queue:
+                item = queue.popleft()
+                if not item.future.done():
+                    item.future.cancel()
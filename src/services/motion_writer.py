@@ -0,0 +1,107 @@
+import asyncio
+from typing import Optional, Tuple
+
+class SetpointSlot:
+    """
+    Latest-value-wins pitch/roll slot. Writing a new setpoint replaces the one
+    that hasn't been picked up yet, so the reader always gets the newest value.
+    """
+    def __init__(self):
+        self.value: Optional[Tuple[float, float]] = None
+        self.trace = None # latency trace of the latest value, if tracing is on
+        self._event = asyncio.Event()
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, pitch, roll, trace=None) -> None:
+        self.received += 1
+        if self._event.is_set():
+            ### previous setpoint was never sent -> stale
+            self.dropped += 1
+        self.value = (pitch, roll)
+        self.trace = trace
+        self._event.set()
+
+    def peek(self) -> Optional[Tuple[float, float]]:
+        return self.value
+
+    def consume(self) -> Optional[Tuple[float, float]]:
+        """Returns the latest value and marks it as sent"""
+        self._event.clear()
+        return self.value
+
+    async def get(self) -> Tuple[float, float]:
+        await self._event.wait()
+        return self.consume()
+
+    def take_trace(self):
+        """Trace of the consumed value, only handed out once since a value can be re-sent"""
+        trace, self.trace = self.trace, None
+        if trace is not None:
+            trace.mark("dequeue")
+        return trace
+
+    def clear(self) -> None:
+        self.value = None
+        self.trace = None
+        self._event.clear()
+
+class MotionWriter:
+    """
+    Decouples the websocket reader from the modbus writes. The reader only
+    overwrites the latest pitch/roll and this task always sends the newest one
+    with MotorApi.rotate, so motion latency stays bounded by one modbus round-trip
+    no matter how fast the frames come in.
+    """
+    def __init__(self, motor_api, logger):
+        self.motor_api = motor_api
+        self.logger = logger
+        self.slot = SetpointSlot()
+        self.task: Optional[asyncio.Task] = None
+        self.writes = 0
+        self.coalesced_writes = 0
+        self._dropped_before = 0
+
+    def start(self) -> None:
+        if self.task is not None and not self.task.done():
+            return
+        self.slot.clear()
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+            self.logger.info(f"Motion writer stopped: {self.stats()}")
+
+    def submit(self, pitch, roll, trace=None, timestamp=None) -> None:
+        """timestamp is the senders time of the setpoint, only the trajectory loop uses it"""
+        self.slot.put(pitch, roll, trace)
+
+    def stats(self) -> dict:
+        return {
+            "received": self.slot.received,
+            "written": self.writes,
+            "dropped": self.slot.dropped,
+            "coalesced": self.coalesced_writes,
+        }
+
+    def _count_coalesced(self) -> None:
+        ### frames that were overwritten while the previous write was in flight
+        if self.slot.dropped != self._dropped_before:
+            self.coalesced_writes += 1
+            self._dropped_before = self.slot.dropped
+
+    async def _run(self):
+        self._dropped_before = self.slot.dropped
+        while True:
+            try:
+                (pitch, roll) = await self.slot.get()
+                trace = self.slot.take_trace()
+                self._count_coalesced()
+                await self.motor_api.rotate(pitch, roll, trace=trace)
+                self.writes += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Unexpected error in motion writer: {e}")
@@ -0,0 +1,122 @@
+import asyncio
+from typing import Dict, Optional
+
+class _Entry:
+    __slots__ = ("left", "right", "verified")
+
+    def __init__(self, left, right):
+        self.left = left
+        self.right = right
+        self.verified = True
+
+class RegisterCache:
+    """
+    Write-through shadow of the configuration values last written to both drives,
+    per register address. A write whose values match a trusted entry doesn't have
+    to be sent again. invalidate() (faults, reconnects) makes every entry untrusted
+    until a read-back confirms it, clear() (drive restart) forgets everything.
+    """
+    def __init__(self, logger):
+        self.logger = logger
+        self.entries: Dict[int, _Entry] = {}
+        self.skipped = 0
+        self.stored = 0
+        self.invalidations = 0
+        self.confirmed = 0
+        self.drift = 0
+
+    def is_current(self, address, left_vals, right_vals) -> bool:
+        entry = self.entries.get(address)
+        if entry is None or not entry.verified:
+            return False
+        if entry.left != list(left_vals) or entry.right != list(right_vals):
+            return False
+        self.skipped += 1
+        return True
+
+    def store(self, address, left_vals, right_vals) -> None:
+        self.entries[address] = _Entry(list(left_vals), list(right_vals))
+        self.stored += 1
+
+    def discard(self, address) -> None:
+        self.entries.pop(address, None)
+
+    def invalidate(self, reason) -> None:
+        if not self.entries:
+            return
+        self.invalidations += 1
+        self.logger.info(f"Register cache invalidated: {reason}")
+        for entry in self.entries.values():
+            entry.verified = False
+
+    def clear(self, reason) -> None:
+        if self.entries:
+            self.logger.info(f"Register cache cleared: {reason}")
+        self.entries.clear()
+
+    def registers(self, unverified_only=False) -> Dict[str, tuple]:
+        """Cached registers as name -> (address, count) for plan_register_blocks"""
+        return {
+            str(address): (address, len(entry.left))
+            for address, entry in self.entries.items()
+            if not unverified_only or not entry.verified
+        }
+
+    def confirm(self, address, left_vals, right_vals) -> bool:
+        """
+        Compares read-back values with the entry. A match makes it trusted again,
+        a mismatch means the drive drifted from what was written and the entry is dropped
+        """
+        entry = self.entries.get(address)
+        if entry is None:
+            return True
+        if entry.left == list(left_vals) and entry.right == list(right_vals):
+            entry.verified = True
+            self.confirmed += 1
+            return True
+        self.drift += 1
+        self.logger.warning(f"Register {address} drifted from the written values. Written: {entry.left} {entry.right} | Read: {list(left_vals)} {list(right_vals)}")
+        del self.entries[address]
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "unverified": sum(1 for entry in self.entries.values() if not entry.verified),
+            "skipped_writes": self.skipped,
+            "stored": self.stored,
+            "invalidations": self.invalidations,
+            "confirmed": self.confirmed,
+            "drift": self.drift,
+        }
+
+class CacheVerifier:
+    """Reads every cached register back every interval to detect drift"""
+    def __init__(self, motor_api, logger, interval=60.0):
+        interval = float(interval)
+        if interval <= 0:
+            raise ValueError(f"Cache verification interval has to be positive, got: {interval}")
+        self.motor_api = motor_api
+        self.logger = logger
+        self.interval = interval
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self.task is not None and not self.task.done():
+            return
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.motor_api.verify_register_cache(unverified_only=False)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Unexpected error while verifying the register cache: {e}")
@@ -0,0 +1,96 @@
+import random
+from dataclasses import dataclass
+from time import monotonic
+
+class CircuitOpenError(Exception):
+    """Request was not sent because the drives circuit breaker is open"""
+
+class RequestTimeoutError(Exception):
+    """Callers deadline passed before the drive answered"""
+
+class _TimedOut:
+    """
+    What a MotorApi call returns when its timeout runs out. Falsy like the False
+    of a failed call so existing `if not result` checks keep working,
+    use `result is TIMED_OUT` to tell the two apart.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return "TIMED_OUT"
+
+TIMED_OUT = _TimedOut()
+
+@dataclass
+class RetryPolicy:
+    """
+    How many times one side of a modbus transaction is tried and how long to wait
+    in between: base_delay * multiplier^attempt capped to max_delay, of which
+    the jitter fraction is randomized so both sides and all callers don't retry in sync.
+    """
+    max_attempts: int = 10
+    base_delay: float = 0.05
+    max_delay: float = 1.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    bypass_breaker: bool = False # keep trying even if the breaker is open (stop commands)
+
+    def delay(self, attempt, rng=random) -> float:
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** attempt)
+        return delay * (1.0 - self.jitter * rng.random())
+
+class CircuitBreaker:
+    """
+    Per drive breaker. Opens after failure_threshold consecutive failed requests
+    (errors and timeouts), fails requests fast while open and after reset_timeout
+    lets requests through half-open: the first success closes it, a failure opens it again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, logger, failure_threshold=5, reset_timeout=2.0, clock=monotonic):
+        self.name = name
+        self.logger = logger
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+            self.logger.info(f"{self.name} drive circuit breaker half-open, probing the drive")
+        return True
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            self.logger.info(f"{self.name} drive circuit breaker closed, drive is responding again")
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+            self.times_opened += 1
+            self.logger.error(f"{self.name} drive circuit breaker opened after {self.consecutive_failures} consecutive failures, failing fast for {self.reset_timeout}s")
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,166 @@
+import asyncio
+from collections import deque
+from time import perf_counter
+from typing import Optional
+from services.latency_tracer import percentiles
+from helpers.position_filter import SIDES, SUPPRESSED
+
+class _Pipeline:
+    __slots__ = ("side", "pending", "event", "task", "latencies", "writes", "failures",
+                 "coalesced", "suppressed", "acked_generation", "acked_at", "acked_written", "generation")
+
+    def __init__(self, side, samples):
+        self.side = side
+        self.pending = None # (values, generation, submitted_at) of the latest setpoint
+        self.event = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.latencies = deque(maxlen=samples)
+        self.writes = 0
+        self.failures = 0
+        self.coalesced = 0
+        self.suppressed = 0
+        self.generation = 0 # last generation picked up for writing
+        self.acked_generation = 0
+        self.acked_at: Optional[float] = None
+        self.acked_written = False # False when the write filter left the acknowledged setpoint out
+
+class SideWriter:
+    """
+    Independent host position pipelines for the two drives. Every submitted setpoint
+    goes to a latest-value slot per drive and each drive has its own writer task, so a
+    slow or retrying drive only delays its own setpoints. write(side, values) does the
+    actual write. Setpoints carry a generation number, when both drives have
+    acknowledged the same generation the time between the acknowledgements is the
+    skew, skews over skew_warning are logged. A write that returns SUPPRESSED counts
+    as acknowledged but is left out of the latencies and skews.
+    """
+    def __init__(self, write, logger, skew_warning=0.05, samples=1000, clock=perf_counter):
+        self.write = write
+        self.logger = logger
+        self.skew_warning = skew_warning
+        self.clock = clock
+        self.samples = samples
+        self.pipelines = None
+        self.generation = 0
+        self.skews = deque(maxlen=samples)
+        self.max_skew = 0.0
+        self.skew_warnings = 0
+        self._skewed = False
+        ### latency trace of the newest setpoint, finished once both drives have it
+        self._trace = None
+        self._trace_generation = 0
+        self._trace_acks = {} # side -> written
+
+    def _start(self) -> None:
+        if self.pipelines is None:
+            self.pipelines = {side: _Pipeline(side, self.samples) for side in SIDES}
+        for pipeline in self.pipelines.values():
+            if pipeline.task is None or pipeline.task.done():
+                pipeline.task = asyncio.create_task(self._run(pipeline))
+
+    def submit(self, values, trace=None) -> None:
+        """values: ([left_low, left_whole], [right_low, right_whole])"""
+        self._start()
+        self.generation += 1
+        now = self.clock()
+        if trace is not None:
+            trace.mark("write_issued")
+        ### an unfinished older trace was coalesced away on at least one side
+        self._trace = trace
+        self._trace_generation = self.generation
+        self._trace_acks = {}
+        for side, vals in zip(SIDES, values):
+            pipeline = self.pipelines[side]
+            if pipeline.event.is_set():
+                pipeline.coalesced += 1
+            pipeline.pending = (vals, self.generation, now)
+            pipeline.event.set()
+
+    async def _run(self, pipeline):
+        while True:
+            await pipeline.event.wait()
+            pipeline.event.clear()
+            (vals, generation, submitted_at) = pipeline.pending
+            pipeline.generation = generation
+            try:
+                success = await self.write(pipeline.side, vals)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Unexpected error in {pipeline.side} side writer: {e}")
+                success = False
+            now = self.clock()
+            if not success:
+                pipeline.failures += 1
+                continue
+            written = success is not SUPPRESSED
+            if written:
+                pipeline.writes += 1
+                pipeline.latencies.append(now - submitted_at)
+            else:
+                pipeline.suppressed += 1
+            pipeline.acked_generation = generation
+            pipeline.acked_at = now
+            pipeline.acked_written = written
+            self._acknowledged(pipeline, generation, now)
+
+    def _acknowledged(self, pipeline, generation, now) -> None:
+        other = self.pipelines["right" if pipeline.side == "left" else "left"]
+        if other.acked_generation == generation and pipeline.acked_written and other.acked_written:
+            skew = now - other.acked_at
+            self.skews.append(skew)
+            if skew > self.max_skew:
+                self.max_skew = skew
+            if skew > self.skew_warning:
+                self.skew_warnings += 1
+                if not self._skewed:
+                    self.logger.warning(f"{pipeline.side} drive acknowledged {skew * 1000:.1f} ms after the {other.side} drive")
+                self._skewed = True
+            elif self._skewed:
+                self.logger.info(f"Drives are in step again, skew {skew * 1000:.1f} ms")
+                self._skewed = False
+
+        if self._trace is not None and generation == self._trace_generation:
+            if pipeline.acked_written:
+                self._trace.mark(f"write_ack_{pipeline.side}")
+            self._trace_acks[pipeline.side] = pipeline.acked_written
+            if len(self._trace_acks) == len(SIDES):
+                if any(self._trace_acks.values()):
+                    self._trace.mark("write_ack")
+                    self._trace.finish(True)
+                else:
+                    self._trace.suppress()
+                self._trace = None
+
+    def stats(self) -> dict:
+        stats = {
+            "generation": self.generation,
+            "skew": percentiles(self.skews),
+            "max_skew_ms": self.max_skew * 1000,
+            "skew_warnings": self.skew_warnings,
+        }
+        if self.pipelines is not None:
+            for side, pipeline in self.pipelines.items():
+                stats[side] = dict(percentiles(pipeline.latencies),
+                                   writes=pipeline.writes,
+                                   failures=pipeline.failures,
+                                   coalesced=pipeline.coalesced,
+                                   suppressed=pipeline.suppressed,
+                                   generation_lag=self.generation - pipeline.acked_generation)
+        return stats
+
+    def cancel_pending(self) -> None:
+        """Drops the setpoints that are not written yet and cancels the writes in flight,
+        the writer tasks are started again by the next submit"""
+        if self.pipelines is None:
+            return
+        for pipeline in self.pipelines.values():
+            if pipeline.task is not None:
+                pipeline.task.cancel()
+                pipeline.task = None
+            pipeline.pending = None
+            pipeline.event.clear()
+        self._trace = None
+
+    def close(self) -> None:
+        self.cancel_pending()
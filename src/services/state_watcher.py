@@ -0,0 +1,132 @@
+import asyncio
+from typing import Any, Callable, Optional
+from services.retry_policy import TIMED_OUT
+
+class _Waiter:
+    __slots__ = ("predicate", "near", "settle", "deadline", "true_since", "future")
+
+    def __init__(self, predicate, near, settle, deadline, future):
+        self.predicate = predicate
+        self.near = near
+        self.settle = settle
+        self.deadline = deadline
+        self.true_since = None
+        self.future = future
+
+class StateWatcher:
+    """
+    Polls a register set of both drives and resolves waiters once their predicate
+    over the latest values is true. All waiters share one polling task that polls
+    every fast_interval while a waiter is close to done (its near predicate is true
+    or it is settling) and every slow_interval otherwise. The task stops when
+    nobody is waiting.
+    read(timeout) returns the values or something falsy if the read failed.
+    """
+    def __init__(self, name, read, logger, fast_interval=0.02, slow_interval=0.5, read_timeout=1.0):
+        self.name = name
+        self.read = read
+        self.logger = logger
+        self.fast_interval = fast_interval
+        self.slow_interval = slow_interval
+        self.read_timeout = read_timeout
+        self.waiters = []
+        self.last_values = None
+        self.polls = 0
+        self.failed_polls = 0
+        self.fast_polls = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, predicate: Callable[[Any], bool], near: Optional[Callable[[Any], bool]] = None, settle=0.0, timeout=None) -> asyncio.Future:
+        """
+        Returns a future that resolves to True once predicate(values) has been true
+        for settle seconds, or to TIMED_OUT after timeout seconds
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout if timeout is not None else None
+        waiter = _Waiter(predicate, near, settle, deadline, loop.create_future())
+        self.waiters.append(waiter)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return waiter.future
+
+    async def wait_until(self, predicate, near=None, settle=0.0, timeout=None):
+        future = self.watch(predicate, near=near, settle=settle, timeout=timeout)
+        try:
+            return await future
+        finally:
+            ### a cancelled caller doesn't keep the drives polled
+            future.cancel()
+
+    def _check(self, waiter, values, now) -> Optional[bool]:
+        """Resolves the waiter if it is done, otherwise returns True if it needs fast polling"""
+        if values:
+            if waiter.predicate(values):
+                if waiter.true_since is None:
+                    waiter.true_since = now
+                if now - waiter.true_since >= waiter.settle:
+                    waiter.future.set_result(True)
+                    return None
+                return True
+            waiter.true_since = None
+        if waiter.deadline is not None and now >= waiter.deadline:
+            waiter.future.set_result(TIMED_OUT)
+            return None
+        return bool(values) and waiter.near is not None and waiter.near(values)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self.waiters = [waiter for waiter in self.waiters if not waiter.future.done()]
+            if not self.waiters:
+                return
+            ### a slow read must not hold a waiter past its deadline
+            read_timeout = self.read_timeout
+            deadlines = [waiter.deadline for waiter in self.waiters if waiter.deadline is not None]
+            if deadlines:
+                read_timeout = max(self.fast_interval, min(read_timeout, min(deadlines) - loop.time()))
+            try:
+                values = await self.read(read_timeout)
+            except Exception as e:
+                self.logger.debug(f"{self.name} watcher read failed: {e}")
+                values = None
+            self.polls += 1
+            if values:
+                self.last_values = values
+            else:
+                self.failed_polls += 1
+
+            now = loop.time()
+            fast = False
+            for waiter in self.waiters:
+                if waiter.future.done():
+                    continue
+                if self._check(waiter, values, now):
+                    fast = True
+
+            waiting = [waiter for waiter in self.waiters if not waiter.future.done()]
+            if not waiting:
+                continue
+            if fast:
+                self.fast_polls += 1
+            interval = self.fast_interval if fast else self.slow_interval
+            deadlines = [waiter.deadline for waiter in waiting if waiter.deadline is not None]
+            if deadlines:
+                interval = min(interval, max(0.0, min(deadlines) - now))
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict:
+        return {
+            "waiting": sum(1 for waiter in self.waiters if not waiter.future.done()),
+            "polls": self.polls,
+            "fast_polls": self.fast_polls,
+            "failed_polls": self.failed_polls,
+        }
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for waiter in self.waiters:
+            if not waiter.future.done():
+                waiter.future.cancel()
+        self.waiters = []
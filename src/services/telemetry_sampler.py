@@ -0,0 +1,153 @@
+import asyncio
+from array import array
+from time import time
+from typing import List, Optional, Tuple
+
+### one ring buffer row: timestamp followed by these values
+TELEMETRY_FIELDS = (
+    "left_board_tmp", "right_board_tmp",
+    "left_actuator_tmp", "right_actuator_tmp",
+    "left_IC", "right_IC",
+    "left_VBUS", "right_VBUS",
+)
+
+class TelemetryRing:
+    """Fixed-size ring buffer of telemetry samples backed by a single float array"""
+    def __init__(self, capacity):
+        if capacity <= 0:
+            raise ValueError(f"Telemetry history size has to be positive, got: {capacity}")
+        self.capacity = capacity
+        self.stride = 1 + len(TELEMETRY_FIELDS)
+        self.buffer = array("d", [0.0]) * (capacity * self.stride)
+        self.head = 0 # next row to write
+        self.size = 0
+
+    def append(self, timestamp, values) -> None:
+        offset = self.head * self.stride
+        self.buffer[offset] = timestamp
+        self.buffer[offset + 1:offset + self.stride] = array("d", values)
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _row(self, index) -> Tuple[float, ...]:
+        offset = index * self.stride
+        return tuple(self.buffer[offset:offset + self.stride])
+
+    def latest(self) -> Optional[Tuple[float, ...]]:
+        if not self.size:
+            return None
+        return self._row((self.head - 1) % self.capacity)
+
+    def history(self, since=None, count=None) -> List[Tuple[float, ...]]:
+        """Samples oldest first, optionally only the ones newer than since and at most count of the newest"""
+        start = (self.head - self.size) % self.capacity
+        rows = [self._row((start + i) % self.capacity) for i in range(self.size)]
+        if since is not None:
+            rows = [row for row in rows if row[0] > since]
+        if count is not None:
+            rows = rows[-count:] if count > 0 else []
+        return rows
+
+def telemetry_to_row(data) -> Tuple[float, ...]:
+    """get_telemetry_data result -> flat values in TELEMETRY_FIELDS order"""
+    ((l_board, r_board), (l_act, r_act), (l_ic, r_ic), (l_vbus, r_vbus)) = data
+    return (l_board, r_board, l_act, r_act, l_ic, r_ic, l_vbus, r_vbus)
+
+def row_to_telemetry(row) -> tuple:
+    """Ring buffer row (without timestamp) -> get_telemetry_data shaped tuple"""
+    return ((row[0], row[1]), (row[2], row[3]), (row[4], row[5]), (row[6], row[7]))
+
+def format_telemetry_message(data) -> str:
+    return f"event=telemetrydata|message=boardtemp:{data[0]}*actuatortemp:{data[1]}*IC:{data[2]}*VBUS:{data[3]}*|"
+
+def format_history_message(rows) -> str:
+    """timestamp,values... per sample separated with ;"""
+    samples = ";".join(",".join(f"{v:.6g}" if i else f"{v:.3f}" for i, v in enumerate(row)) for row in rows)
+    return f"event=telemetryhistory|fields=timestamp,{','.join(TELEMETRY_FIELDS)}|message={samples}|"
+
+class TelemetrySampler:
+    """
+    Polls the drives telemetry at a fixed rate into a ring buffer and pushes every
+    sample to subscribed websocket clients, so any number of clients can read
+    telemetry without causing extra modbus traffic.
+    """
+    def __init__(self, motor_api, logger, frequency=1.0, history_size=3600):
+        frequency = float(frequency)
+        if frequency <= 0:
+            raise ValueError(f"Telemetry sample rate has to be positive, got: {frequency}")
+        self.motor_api = motor_api
+        self.logger = logger
+        self.period = 1.0 / frequency
+        self.ring = TelemetryRing(history_size)
+        self.subscribers = set()
+        self.task: Optional[asyncio.Task] = None
+        self.failed_reads = 0
+
+    def start(self) -> None:
+        if self.task is not None and not self.task.done():
+            return
+        self.task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+            self.logger.info("Telemetry sampler stopped")
+
+    def subscribe(self, wsclient) -> None:
+        self.subscribers.add(wsclient)
+
+    def unsubscribe(self, wsclient) -> None:
+        self.subscribers.discard(wsclient)
+
+    def snapshot(self, max_age=None) -> Optional[tuple]:
+        """
+        Latest sample shaped like get_telemetry_data. None if nothing has been sampled or the
+        sample is older than max_age seconds (two sample periods by default), e.g. because the
+        drives stopped answering or the sampler was stopped.
+        """
+        row = self.ring.latest()
+        if row is None:
+            return None
+        if max_age is None:
+            max_age = 2 * self.period
+        if time() - row[0] > max_age:
+            return None
+        return row_to_telemetry(row[1:])
+
+    def history(self, seconds=None, count=None) -> List[Tuple[float, ...]]:
+        since = time() - seconds if seconds is not None else None
+        return self.ring.history(since=since, count=count)
+
+    async def sample(self) -> bool:
+        data = await self.motor_api.get_telemetry_data()
+        if not data:
+            self.failed_reads += 1
+            return False
+        self.ring.append(time(), telemetry_to_row(data))
+        if self.subscribers:
+            await self._publish(format_telemetry_message(data))
+        return True
+
+    async def _publish(self, message) -> None:
+        for wsclient in list(self.subscribers):
+            try:
+                await wsclient.send(message)
+            except Exception as e:
+                self.logger.warning(f"Removing telemetry subscriber {getattr(wsclient, 'remote_address', None)}: {e}")
+                self.subscribers.discard(wsclient)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_deadline = loop.time()
+        while True:
+            try:
+                await self.sample()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed_reads += 1
+                self.logger.error(f"Unexpected error while sampling telemetry: {e}")
+            ### absolute deadlines, a slow read pushes the next sample back instead of bunching them up
+            next_deadline = max(next_deadline + self.period, loop.time())
+            await asyncio.sleep(next_deadline - loop.time())
@@ -0,0 +1,91 @@
+import asyncio
+from typing import Optional
+from services.control_loop import ControlLoop
+from helpers.trajectory import Trajectory, MotionLimiter, HERMITE
+from utils.utils import convert_to_revs
+
+class TrajectoryLoop(ControlLoop):
+    """
+    Control loop that moves the motors along a smooth trajectory through the received setpoints
+    instead of jumping to the latest one. Setpoints are turned into revs when they arrive,
+    every tick samples the interpolated trajectory delay seconds in the past (so there is a
+    setpoint on both sides of the sample even with slow or irregular input) and runs
+    it through the per motor velocity/acceleration/jerk limiters.
+    Binary frames carry the senders timestamp, it is mapped onto the event loop clock
+    with the smallest seen offset so network jitter doesn't bend the trajectory.
+    """
+    def __init__(self, motor_api, logger, frequency, interpolation=HERMITE, delay=0.1,
+                 max_velocity=0.0, max_acceleration=0.0, max_jerk=0.0, jitter_samples=1000, status_every=1):
+        super().__init__(motor_api, logger, frequency, jitter_samples=jitter_samples, status_every=status_every)
+        self.trajectory = Trajectory(interpolation)
+        self.delay = delay
+        self.limiters = [MotionLimiter(self.period, max_velocity, max_acceleration, max_jerk) for _ in range(2)]
+        self.clock_offset: Optional[float] = None
+        self.out_of_order = 0
+        self.clock_resyncs = 0
+
+    def start(self) -> None:
+        if self.task is not None and not self.task.done():
+            return
+        ### the motors may have moved while stopped, start from where they are
+        self.trajectory.clear()
+        for limiter in self.limiters:
+            limiter.reset()
+        super().start()
+
+    def _local_time(self, timestamp, now) -> float:
+        if timestamp is None:
+            return now
+        offset = now - timestamp
+        ### a clearly larger offset means the senders clock jumped, not a 1s network delay
+        if self.clock_offset is not None and offset - self.clock_offset > 1.0:
+            self.clock_resyncs += 1
+            self.clock_offset = None
+        if self.clock_offset is None or offset < self.clock_offset:
+            self.clock_offset = offset
+        return timestamp + self.clock_offset
+
+    def submit(self, pitch, roll, trace=None, timestamp=None) -> None:
+        super().submit(pitch, roll, trace)
+        revs = self.motor_api.target_revs(pitch, roll)
+        if revs is None:
+            return
+        t = self._local_time(timestamp, asyncio.get_running_loop().time())
+        if not self.trajectory.push(t, revs[0], revs[1]):
+            self.out_of_order += 1
+
+    async def _sync_limiters(self) -> bool:
+        """Starts the limiters from the motors current position"""
+        response = await self.motor_api.get_current_revs()
+        if not response:
+            return False
+        (left_pos, right_pos) = response
+        self.limiters[0].reset(convert_to_revs(left_pos))
+        self.limiters[1].reset(convert_to_revs(right_pos))
+        return True
+
+    async def tick(self) -> None:
+        """One control cycle, write the next point of the trajectory to the motors"""
+        sample = self.trajectory.sample(asyncio.get_running_loop().time() - self.delay)
+        if sample is None:
+            return
+        if self.limiters[0].position is None and not await self._sync_limiters():
+            return
+        self.slot.consume()
+        trace = self.slot.take_trace()
+        self._count_coalesced()
+        left = self.limiters[0].step(sample[0])
+        right = self.limiters[1].step(sample[1])
+        await self.motor_api.move_to_revs(left, right, trace=trace)
+        self.writes += 1
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({
+            "interpolation": self.trajectory.interpolation,
+            "delay_ms": self.delay * 1000,
+            "out_of_order": self.out_of_order,
+            "clock_resyncs": self.clock_resyncs,
+            "limited_ticks": max(limiter.limited for limiter in self.limiters),
+        })
+        return stats
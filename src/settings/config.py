@@ -8,6 +8,14 @@ class Config:
     SERVER_IP_LEFT: str = '192.168.0.211'  
     SERVER_IP_RIGHT: str = '192.168.0.212'
     SERVER_PORT: int = 502  
+    SERVER_PORT_LEFT = None # per drive port overrides, used when both drives are simulated on one host
+    SERVER_PORT_RIGHT = None
+    MODBUS_CONNECTIONS: int = 1 # tcp connections per drive, reads run in parallel over them
+    CONNECT_RETRY_DELAY: float = 0.05 # first delay between connection attempts, doubles every attempt
+    CONNECT_RETRY_MAX_DELAY: float = 2.0
+    CONNECTION_CHECK_INTERVAL: float = 0.5 # seconds between connection health checks, 0 disables them
+    CONNECTION_CHECK_TIMEOUT: float = 0.5 # a health check read slower than this counts as a failed check
+    CONNECTION_CHECK_FAILURES: int = 3 # failed checks in a row before a connection is reconnected
     WEB_SERVER_PORT: int = 5001
 
     ### USEFUL MAX VALUES
@@ -16,7 +24,18 @@ class Config:
     ### 
     MODULE_NAME = None
     POLLING_TIME_INTERVAL: int = 5
-    POS_UPDATE_HZ: int = 1
+    EVENT_JOURNAL: str = "drive_events.journal" # drive state transitions, relative paths are in the logs directory, "" disables
+    FAULT_MONITOR: str = "process" # "process": fault_poller.py, "inprocess": task sharing the servers modbus clients
+    FAULT_STATUS_EVERY_TICKS: int = 1 # inprocess monitor reads OEG_STATUS every n control loop ticks
+    POS_UPDATE_HZ: float = 1
+    CONTROL_LOOP: bool = False # write host positions at POS_UPDATE_HZ instead of on every received frame
+    TRAJECTORY: str = "" # "linear" or "hermite": move along a smooth trajectory through the received setpoints at POS_UPDATE_HZ
+    TRAJECTORY_DELAY: float = 0.1 # seconds the trajectory runs behind the newest setpoint, has to cover the input period
+    TRAJECTORY_MAX_JERK: float = 100 # revs/s^3, velocity and acceleration are limited to the drives VEL and ACC
+    TELEMETRY_SAMPLE_HZ: float = 1 # background telemetry polling rate, 0 disables the sampler
+    TELEMETRY_HISTORY_SIZE: int = 3600 # samples kept in memory
+    LATENCY_TRACE: bool = False # timestamp every rotate frame through the motion path, see benchmarks/motion_latency.py
+    MAX_MESSAGE_HZ: float = 60 # per websocket client, 0 disables the rate limit
     START_TID: int = 10001 # first TID will be startTID + 1
     LAST_TID: int = 20000
     CONNECTION_TRY_COUNT = 5
\ No newline at end of file
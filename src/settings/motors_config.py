@@ -38,6 +38,58 @@ class MotorConfig:
     BOARD_TMP = 11
     VBUS = 570 # 11.21
 
+    ### BLOCK READS
+    ### nearby registers are merged into one read_holding_registers request
+    BLOCK_READ_MAX_GAP: int = 8 # unused registers allowed between merged registers
+    BLOCK_READ_MAX_SIZE: int = 32 # max registers per request
+
+    ### REQUEST SCHEDULER
+    ### per drive priority queues, stop > motion > fault status > telemetry/config
+    SCHEDULER_QUEUE_DEPTH: int = 16 # max queued requests per priority class
+    MOTION_REQUEST_DEADLINE: float = 0.1 # default time budget of a position setpoint write, stale setpoints are abandoned after it
+
+    ### TIMEOUTS
+    ### defaults for MotorApi calls that wait for the motors, every public call also takes timeout=
+    HOMING_TIMEOUT: float = 30
+    STOP_WAIT_TIMEOUT: float = 30
+    RESTART_TIMEOUT: float = 20
+
+    ### STATE WATCHING
+    ### homing, stop and restart waits poll the drives fast only when they are close to done
+    WATCH_FAST_INTERVAL: float = 0.02
+    WATCH_SLOW_INTERVAL: float = 0.5
+    WATCH_READ_TIMEOUT: float = 1.0
+    HOMING_NEAR_REVS: float = 0.5 # homing is about to finish this close to home
+    STOP_VELOCITY_TOLERANCE: float = 0.01 # revs/s that still counts as stopped
+    STOP_NEAR_VELOCITY: float = 1.0 # revs/s under which the motors are about to stop
+    STOP_SETTLE_TIME: float = 0.2 # velocity has to stay zero this long before the motors count as stopped
+
+    ### RETRIES
+    ### exponential backoff with jitter, per drive circuit breaker
+    RETRY_BASE_DELAY: float = 0.05 # first retry delay in seconds, doubles every attempt
+    RETRY_MAX_DELAY: float = 1.0
+    RETRY_JITTER: float = 0.5 # fraction of the delay that is randomized
+    FAULT_READ_ATTEMPTS: int = 3
+    MOTION_WRITE_ATTEMPTS: int = 1 # a failed setpoint is replaced by the next one anyway
+    BREAKER_FAILURE_THRESHOLD: int = 5 # consecutive failures before the drive is failed fast
+    BREAKER_RESET_TIMEOUT: float = 2.0 # seconds before a request is let through to probe the drive
+
+    ### POSITION WRITE FILTER
+    ### per drive dead-band for motion setpoints, see PositionWriteFilter
+    POSITION_WRITE_FILTER: bool = True
+    POSITION_DEADBAND: int = 0 # 1/65536 revs, setpoints this close to the last written one are not sent
+    POSITION_KEEPALIVE: float = 1.0 # seconds, an unchanged setpoint is still re-sent this often, 0 never
+
+    ### INDEPENDENT SIDES
+    ### each drive gets motion setpoints from its own latest-value slot and writer task, see SideWriter
+    INDEPENDENT_SIDES: bool = False
+    SIDE_SKEW_WARNING: float = 0.05 # seconds between the two drives acknowledging the same setpoint that gets logged
+
+    ### REGISTER CACHE
+    ### configuration writes whose values the drives already have are skipped
+    REGISTER_CACHE: bool = True
+    CACHE_VERIFY_INTERVAL: float = 0 # seconds between read-backs of the cached registers to detect drift, 0 disables
+
     ### OPERATION MODES
     COMMAND_MODE = 4303
     DISABLED = 0
@@ -70,4 +122,12 @@ class MotorConfig:
     MAX_POS_WHOLE = 28
     MAX_POS_DECIMAL = 61406
     MAX_POS32_DECIMAL = 0.9999847412109375
-    
\ No newline at end of file
+    
+
+    ### KINEMATICS LOOKUP TABLE
+    ### precomputed pitch/roll -> host position grid used by rotate instead of the full kinematics
+    KINEMATICS_TABLE: bool = False
+    KINEMATICS_TABLE_RESOLUTION: float = 0.05 # degrees between grid nodes
+    KINEMATICS_TABLE_PATH = None # cache file, table is built at startup and saved here if it doesn't exist yet
+    KINEMATICS_TABLE_VERIFY: bool = False # compare the table against the analytic kinematics at startup
+    KINEMATICS_TABLE_TOLERANCE: int = 3277 # max allowed error in 1/65536 revs (~0.05 revs, 0.25 mm)
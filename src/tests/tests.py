@@ -1,8 +1,59 @@
-from helpers.motor_api_helper import clamp_target_revs
+import asyncio
+import logging
+import numpy as np
+from pymodbus.exceptions import ModbusIOException
+from helpers.motor_api_helper import clamp_target_revs, clamp_target_pos, calculate_target_revs, clamp_target_revs_batch, calculate_target_revs_batch
+from helpers.kinematics_table import KinematicsTable
+from services.motion_writer import MotionWriter
+from services.control_loop import ControlLoop
+from services.latency_tracer import LatencyTracer, MOTION_STAGES
+from helpers.register_blocks import plan_register_blocks, slice_register_blocks
+from utils.register_map import build_register_map
+from services.telemetry_sampler import TelemetryRing, TelemetrySampler
+from services.fault_monitor import FaultMonitor
+from services.MotorApi import MotorApi
+from services.drive_simulator import SimulatedDrive, start_drive_simulators
+from ModbusClients import ModbusClients
+from settings.config import Config
+from handlers.dispatcher import ActionDispatcher, ActionRequest
+from utils.message_parser import parse_message, MESSAGE_KEYS
+from utils.motion_frame import encode_motion_frame, decode_motion_frame, MotionSequence, MOTION_FRAME
+from utils.utils import extract_part, registers_convertion, convert_val_into_format, convert_vel_rpm_revs, convert_acc_rpm_revs, convert_to_revs
 from settings.motors_config import MotorConfig
 
 config = MotorConfig()
 
+### the test_urev_clamp cases as a table for the batch clamp test
+CLAMP_CASES = [
+    ### In range
+    ((20.0, 20.0), [[0, 20], [0, 20]]),
+    ((21.0, 19.0), [[0, 21], [0, 19]]),
+    ((21.5, 19.25), [[32768, 21], [16384, 19]]),
+    ((21.25, 19.5), [[16384, 21], [32768, 19]]),
+    ((21.75, 19.5), [[16384+32768, 21], [32768, 19]]),
+    ((21.99999999999, 19.5), [[65535, 21], [32768, 19]]),
+    ((21.99999999999, 19.99999999999), [[65535, 21], [65535, 19]]),
+    ((21.0, 19.99999999999), [[0, 21], [65535, 19]]),
+    ((21, 16), [[0, 21], [0, 16]]),
+    ### Overshoot
+    ((300.99999999999, 20.5), [[61406, 28], [32768, 20]]),
+    ((300.25, 20.5), [[16384, 28], [32768, 20]]),
+    ((300.99999999999, 20.25), [[61406, 28], [16384, 20]]),
+    ((300.99999999999, 28.99999999999), [[61406, 28], [61406, 28]]),
+    ((16.25, 300.50), [[16384, 16], [32768, 28]]),
+    ((16.25, 300.99999999999), [[16384, 16], [61406, 28]]),
+    ### Undershoot
+    ((-300.01, 0.01), [[25801, 0], [25801, 0]]),
+    ((-300.01, 10.0), [[25801, 0], [0, 10]]),
+    ((-300.01, 28.0), [[25801, 0], [0, 28]]),
+    ((-300.01, 28.99999999999), [[25801, 0], [61406, 28]]),
+    ((20.25, -300.01), [[16384, 20], [25801, 0]]),
+    ((28.25, -300.01), [[16384, 28], [25801, 0]]),
+    ((29.25, -300.01), [[16384, 28], [25801, 0]]),
+    ((29.99999999999, -300.01), [[61406, 28], [25801, 0]]),
+    ((29.99999999999, -300.5), [[61406, 28], [32768, 0]]),
+]
+
 def test_urev_clamp():
     ### In range
     assert clamp_target_revs(20.0, 20.0, config) == [[0, 20], [0, 20]]
@@ -33,7 +84,1179 @@ def test_urev_clamp():
     assert clamp_target_revs(29.25, -300.01, config) == [[16384, 28], [25801, 0]]
     assert clamp_target_revs(29.99999999999, -300.01, config) == [[61406, 28], [25801, 0]]
     assert clamp_target_revs(29.99999999999, -300.5, config) == [[61406, 28], [32768, 0]]
-    
+
+def test_urev_clamp_batch():
+    left_revs = np.array([case[0][0] for case in CLAMP_CASES])
+    right_revs = np.array([case[0][1] for case in CLAMP_CASES])
+    registers = clamp_target_revs_batch(left_revs, right_revs, config)
+    assert registers.shape == (len(CLAMP_CASES), 2, 2)
+    assert registers.dtype == np.uint16
+    assert registers.tolist() == [case[1] for case in CLAMP_CASES]
+    assert not registers.mask.any()
+
+    ### non-finite samples have no register values, like calculate_target_revs returning None
+    registers = clamp_target_revs_batch([20.0, np.nan, 21.5, -np.inf], [20.0, 19.0, np.nan, 19.5], config)
+    assert registers.mask.all(axis=(1, 2)).tolist() == [False, True, True, True]
+    assert registers.tolist() == [[[0, 20], [0, 20]]] + [[[None, None], [None, None]]] * 3
+
+def test_calculate_target_revs_batch():
+    class Api:
+        logger = None
+    Api.config = config
+    rng = np.random.default_rng(0)
+    pitch = np.concatenate([rng.uniform(-10, 10, 5000), [-2.0, 2.0, 0.0, 8.5, -8.5]])
+    roll = np.concatenate([rng.uniform(-20, 20, 5000), [0.0, 0.0, 0.0, 15.0, -15.0]])
+    registers = calculate_target_revs_batch(pitch, roll, config)
+    for i in range(pitch.size):
+        assert registers[i].tolist() == calculate_target_revs(Api, float(pitch[i]), float(roll[i]))
+
+    ### NaN gets through the angle limits and is masked, infinity is limited like in the scalar path
+    registers = calculate_target_revs_batch([1.0, np.nan, 1.0], [0.0, 0.0, np.inf], config)
+    assert registers.mask.all(axis=(1, 2)).tolist() == [False, True, False]
+    assert registers[2].tolist() == calculate_target_revs(Api, 1.0, float("inf"))
+
+def test_kinematics_table():
+    table = KinematicsTable.build(config, resolution=config.KINEMATICS_TABLE_RESOLUTION)
+    assert table.verify(samples=2000) <= config.KINEMATICS_TABLE_TOLERANCE
+
+    class Api:
+        logger = None
+    Api.config = config
+    ### exact on the grid nodes and on the formula switch points
+    for pitch, roll in [(0.0, 0.0), (-2.0, 5.0), (2.0, -5.0), (8.5, 15.0), (-8.5, -15.0), (2.0, 0.0)]:
+        expected = calculate_target_revs(Api, pitch, roll)
+        result = table.lookup(pitch, roll)
+        for side in range(2):
+            assert abs((result[side][1] << 16 | result[side][0]) - (expected[side][1] << 16 | expected[side][0])) <= 1
+
+def test_pos_clamp_matches_revs_clamp():
+    for left, right in [(20.0, 20.0), (21.5, 19.25), (300.25, 20.5), (16.25, 300.99999999999), (0.01, 10.0), (29.99999999999, 0.5)]:
+        assert clamp_target_pos(int(left * 65536), int(right * 65536), config) == clamp_target_revs(left, right, config)
+
+def test_motion_writer_coalesces():
+    class SlowMotorApi:
+        def __init__(self):
+            self.written = []
+        async def rotate(self, pitch, roll, trace=None):
+            self.written.append((pitch, roll))
+            await asyncio.sleep(0.01)
+
+    async def run():
+        motor_api = SlowMotorApi()
+        writer = MotionWriter(motor_api, logging.getLogger("test"))
+        writer.start()
+        for i in range(50):
+            writer.submit(float(i), 0.0)
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.05)
+        writer.stop()
+        return motor_api.written, writer.stats()
+
+    written, stats = asyncio.run(run())
+    assert written[-1] == (49.0, 0.0)
+    assert stats["received"] == 50
+    assert stats["written"] == len(written) < 50
+    assert stats["written"] + stats["dropped"] == 50
+    assert stats["coalesced"] > 0
+
+def test_latency_tracer_through_motion_writer():
+    class MotorApi:
+        async def rotate(self, pitch, roll, trace=None):
+            trace.mark("kinematics")
+            trace.mark("write_issued")
+            await asyncio.sleep(0.005)
+            trace.mark("write_ack")
+            trace.finish(pitch >= 0)
+
+    async def run():
+        tracer = LatencyTracer()
+        writer = MotionWriter(MotorApi(), logging.getLogger("test"))
+        writer.start()
+        for pitch in (1.0, -1.0, 2.0, 3.0):
+            trace = tracer.begin()
+            trace.mark("parse")
+            writer.submit(pitch, 0.0, trace)
+            await asyncio.sleep(0.01)
+        ### burst, only the last one gets written
+        for pitch in (4.0, 5.0, 6.0):
+            trace = tracer.begin()
+            trace.mark("parse")
+            writer.submit(pitch, 0.0, trace)
+        await asyncio.sleep(0.02)
+        writer.stop()
+        return tracer.summary()
+
+    summary = asyncio.run(run())
+    assert (summary["started"], summary["completed"], summary["failed"], summary["not_written"]) == (7, 4, 1, 2)
+    assert summary["end_to_end"]["count"] == 4
+    assert summary["end_to_end"]["p50_ms"] >= 5
+    assert list(summary["stages"]) == [f"{a}->{b}" for a, b in zip(MOTION_STAGES, MOTION_STAGES[1:])]
+
+def test_binary_motion_frames():
+    frame = encode_motion_frame(7, 12.5, -3.25, timestamp=1000.0)
+    assert len(frame) == MOTION_FRAME.size == 22
+    assert decode_motion_frame(frame) == (7, 1000.0, 12.5, -3.25)
+    for bad in (frame[:-1], b"\x02" + frame[1:]):
+        try:
+            decode_motion_frame(bad)
+            assert False, "invalid frame was accepted"
+        except ValueError:
+            pass
+
+    sequence = MotionSequence()
+    accepted = [sequence.accept(n) for n in (1, 2, 5, 4, 5, 6)]
+    assert accepted == [True, True, True, False, False, True]
+    assert sequence.stats() == {"received": 6, "dropped": 2, "reordered": 2}
+    ### counter wraps around
+    sequence = MotionSequence()
+    assert [sequence.accept(n) for n in (2**32 - 1, 0, 2**32 - 1, 1)] == [True, True, False, True]
+
+def test_parse_message_matches_extract_part():
+    messages = [
+        "action=rotate|pitch=-3.2|roll=7.8|",
+        "action=rotate|pitch=1|roll=2",
+        "event=fault|action=message|message=CRITICAL FAULT DETECTED: x=1|receiver=GUI|",
+        "action=identify|identity=gui|identity=other|protocol=binary|",
+        "action=|pitch=|",
+        "nonsense",
+        "",
+    ]
+    for text in messages:
+        parsed = parse_message(text)
+        for key in MESSAGE_KEYS:
+            assert getattr(parsed, key) == extract_part(f"{key}=", text), (text, key)
+
+    parsed = parse_message("action=stats|custom=1|")
+    assert parsed["action"] == "stats" and parsed.get("custom") == "1"
+    assert "pitch" not in parsed and parsed.get("pitch") is False
+    assert list(parsed) == ["action", "custom"]
+
+def test_action_dispatcher_preconditions_and_stats():
+    class WsClient:
+        def __init__(self):
+            self.sent = []
+        async def send(self, message):
+            self.sent.append(message)
+
+    class Hub:
+        motors_initialized = False
+        shutdown = False
+
+    async def ok(hub, request):
+        return True
+    async def fails(hub, request):
+        return False
+    async def raises(hub, request):
+        raise RuntimeError("boom")
+
+    async def run():
+        dispatcher = ActionDispatcher(logging.getLogger("test"))
+        dispatcher.register("identify", ok, requires_motors_initialized=False)
+        dispatcher.register("readtelemetry", fails)
+        dispatcher.register("stop", raises, allowed_during_shutdown=True)
+        hub, ws = Hub(), WsClient()
+        send = lambda action: dispatcher.dispatch(hub, action, ActionRequest(parse_message(f"action={action}|"), ws))
+
+        await send("identify")
+        await send("readtelemetry") ### motors not initialized
+        hub.motors_initialized = True
+        await send("readtelemetry")
+        await send("nope")
+        hub.shutdown = True
+        await send("identify")
+        await send("stop")
+        return dispatcher.stats_dict(), ws.sent
+
+    stats, sent = asyncio.run(run())
+    assert (stats["identify"]["calls"], stats["identify"]["rejected"]) == (1, 1)
+    assert (stats["readtelemetry"]["calls"], stats["readtelemetry"]["errors"], stats["readtelemetry"]["rejected"]) == (1, 1, 1)
+    assert (stats["stop"]["calls"], stats["stop"]["error_rate"]) == (1, 1.0)
+    assert len(sent) == 3 and "no action found" in sent[1]
+
+class VirtualClock:
+    """Time that only moves when something sleeps on it, for ControlLoop(clock=, sleep=)"""
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += max(0.0, delay)
+        await asyncio.sleep(0)
+
+def test_control_loop_fixed_rate():
+    class MotorApi:
+        def __init__(self, clock, delay):
+            self.clock = clock
+            self.delay = delay
+            self.written = []
+        async def rotate(self, pitch, roll, trace=None):
+            self.written.append((self.clock.now, pitch, roll))
+            await self.clock.sleep(self.delay)
+
+    async def run(delay):
+        clock = VirtualClock()
+        motor_api = MotorApi(clock, delay)
+        loop = ControlLoop(motor_api, logging.getLogger("test"), frequency=100, clock=clock.time, sleep=clock.sleep)
+        loop.start()
+        loop.submit(1.0, 2.0)
+        while clock.now < 0.295:
+            await asyncio.sleep(0)
+        loop.stop()
+        return motor_api.written, loop.stats()
+
+    ### setpoint is re-sent every tick, on the 10 ms schedule
+    written, stats = asyncio.run(run(0.0))
+    assert stats["ticks"] == len(written) == 30
+    assert {(pitch, roll) for (_, pitch, roll) in written} == {(1.0, 2.0)}
+    assert [round(at, 6) for (at, _, _) in written] == [round(n * 0.01, 6) for n in range(30)]
+    assert stats["overruns"] == 0 and stats["jitter_max_ms"] < 1e-6
+
+    ### 25 ms writes skip the two ticks they ran over instead of piling up
+    written, stats = asyncio.run(run(0.025))
+    assert [round(at, 6) for (at, _, _) in written] == [round(n * 0.03, 6) for n in range(len(written))]
+    assert stats["ticks"] == len(written) == 10
+    ### the last write was still running when the loop was stopped
+    assert stats["overruns"] == stats["ticks"] - 1 and stats["missed_ticks"] == 2 * stats["overruns"]
+
+def test_control_loop_status_read_does_not_stall_ticks():
+    class MotorApi:
+        def __init__(self):
+            self.rotations = 0
+            self.timeouts = []
+            self.release = asyncio.Event()
+        async def rotate(self, pitch, roll, trace=None):
+            self.rotations += 1
+        async def check_fault_stauts(self, log=True, timeout=None):
+            ### a drive that doesn't answer until released
+            self.timeouts.append(timeout)
+            await self.release.wait()
+            return (0, 8)
+
+    async def run():
+        motor_api = MotorApi()
+        statuses = []
+        loop = ControlLoop(motor_api, logging.getLogger("test"), frequency=200, status_every=2)
+        loop.status_listener = statuses.append
+        loop.start()
+        loop.submit(1.0, 2.0)
+        async def ticked():
+            while motor_api.rotations < 10:
+                await asyncio.sleep(0.005)
+        await asyncio.wait_for(ticked(), timeout=5.0)
+        reads = len(motor_api.timeouts)
+        motor_api.release.set()
+        await asyncio.wait_for(loop._status_task, timeout=1.0)
+        loop.stop()
+        return reads, motor_api.timeouts[0], statuses, loop.stats()
+
+    reads, timeout, statuses, stats = asyncio.run(run())
+    ### the motion kept ticking while the one status read was outstanding
+    assert reads == 1 and stats["status_skips"] >= 3
+    assert timeout == 2 * (1 / 200)
+    assert statuses == [(0, 8)]
+
+def test_plan_register_blocks():
+    registers = {
+        "BOARD_TMP": (config.BOARD_TMP, 1),
+        "ACTUATOR_TMP": (config.ACTUATOR_TMP, 1),
+        "ICONTINUOUS": (config.ICONTINUOUS, 2),
+        "VBUS": (config.VBUS, 2),
+    }
+    blocks = plan_register_blocks(registers, max_gap=8, max_size=32)
+    assert [(b.address, b.count) for b in blocks] == [(11, 5), (564, 8)]
+
+    ### no merging when the gap is too big or the block would get too large
+    assert len(plan_register_blocks(registers, max_gap=0)) == 4
+    assert len(plan_register_blocks(registers, max_gap=8, max_size=5)) == 3
+
+    left = [list(range(b.address, b.address + b.count)) for b in blocks]
+    right = [[v + 1000 for v in vals] for vals in left]
+    values = slice_register_blocks(blocks, list(zip(left, right)))
+    assert values["ACTUATOR_TMP"] == ([15], [1015])
+    assert values["VBUS"] == ([570, 571], [1570, 1571])
+
+def test_register_codecs_match_helpers():
+    registers = build_register_map(config)
+    assert registers.VBUS.address == config.VBUS and registers.VBUS.count == 2
+    assert registers["OEG_STATUS"].count == 1
+
+    rng = np.random.default_rng(0)
+    for low, high in rng.integers(0, 65536, size=(500, 2)).tolist():
+        assert registers.VBUS.decode([low, high]) == registers_convertion([low, high], "11.21", signed=True)
+        assert registers.ICONTINUOUS.decode([low, high]) == registers_convertion([low, high], "9.23")
+        assert registers.BOARD_TMP.decode([low]) == registers_convertion([low], "11.5", signed=True)
+
+    assert registers.HOST_CURRENT_MAXIMUM.encode(5) == [convert_val_into_format(5, "9.7")]
+    for rpm in (25, 60, 120, 155):
+        assert registers.HOST_VEL_MAXIMUM.encode(rpm / 60.0) == list(reversed(convert_vel_rpm_revs(rpm)))
+        assert registers.HOST_ACCELERATION_MAXIMUM.encode(rpm / 60.0) == list(reversed(convert_acc_rpm_revs(rpm)))
+    assert registers.HOST_POSITION.decode(registers.HOST_POSITION.encode(-1.5)) == -1.5
+    ### VEL32 high word, the baselines whole revs were that word >> 8
+    assert registers.VFEEDBACK_VELOCITY.count == 1
+    assert registers.VFEEDBACK_VELOCITY.decode([0x0280]) == 2.5
+    assert registers.VFEEDBACK_VELOCITY.decode([0xFE00]) == -2.0
+
+def test_telemetry_ring_and_sampler():
+    ring = TelemetryRing(capacity=3)
+    assert ring.latest() is None
+    for i in range(5):
+        ring.append(float(i), [i] * 8)
+    assert [row[0] for row in ring.history()] == [2.0, 3.0, 4.0]
+    assert [row[0] for row in ring.history(since=2.5)] == [3.0, 4.0]
+    assert [row[0] for row in ring.history(count=1)] == [4.0]
+    assert ring.latest() == (4.0,) + (4.0,) * 8
+
+    class MotorApi:
+        reads = 0
+        async def get_telemetry_data(self):
+            MotorApi.reads += 1
+            return ((30, 31), (40, 41), (1.5, 1.25), (48.0, 47.5))
+
+    class Client:
+        def __init__(self):
+            self.messages = []
+        async def send(self, message):
+            self.messages.append(message)
+
+    async def run():
+        sampler = TelemetrySampler(MotorApi(), logging.getLogger("test"), frequency=100, history_size=10)
+        clients = [Client(), Client()]
+        for client in clients:
+            sampler.subscribe(client)
+        sampler.start()
+        await asyncio.sleep(0.05)
+        sampler.stop()
+        return sampler, clients
+
+    sampler, clients = asyncio.run(run())
+    assert sampler.snapshot(max_age=60) == ((30, 31), (40, 41), (1.5, 1.25), (48.0, 47.5))
+    ### every subscriber gets every sample, drives are only read once per sample
+    assert len(clients[0].messages) == len(clients[1].messages) == MotorApi.reads
+    assert clients[0].messages[0].startswith("event=telemetrydata|")
+
+def test_read_telemetry_ignores_stale_samples():
+    from time import time
+    from handlers import actions
+
+    class MotorApi:
+        def __init__(self, data):
+            self.data = data
+            self.reads = 0
+        async def get_telemetry_data(self):
+            self.reads += 1
+            return self.data
+
+    class Client:
+        def __init__(self):
+            self.messages = []
+        async def send(self, message):
+            self.messages.append(message)
+
+    class Hub:
+        def __init__(self, data):
+            self.logger = logging.getLogger("test")
+            self.motor_api = MotorApi(data)
+            self.telemetry_sampler = TelemetrySampler(self.motor_api, self.logger, frequency=1, history_size=10)
+
+    ### the last sample is from before the drives stopped answering
+    hub = Hub(False)
+    hub.telemetry_sampler.ring.append(time() - 10, [30, 31, 40, 41, 1.5, 1.25, 48.0, 47.5])
+    assert hub.telemetry_sampler.snapshot() is None
+    client = Client()
+    asyncio.run(actions.read_telemetry(hub, client))
+    assert hub.motor_api.reads == 1 and client.messages[0].startswith("event=error|")
+
+    ### a fresh sample is served without reading the drives
+    hub = Hub(False)
+    hub.telemetry_sampler.ring.append(time(), [30, 31, 40, 41, 1.5, 1.25, 48.0, 47.5])
+    client = Client()
+    asyncio.run(actions.read_telemetry(hub, client))
+    assert hub.motor_api.reads == 0 and client.messages[0].startswith("event=telemetrydata|")
+
+def test_fault_monitor_on_control_loop_tick():
+    class MotorApi:
+        def __init__(self):
+            self.status = (0, 0)
+            self.ieg_writes = []
+        async def rotate(self, pitch, roll, trace=None):
+            pass
+        async def check_fault_stauts(self, log=True, timeout=None):
+            return self.status
+        async def get_recent_fault(self):
+            return (0, 128)
+        async def set_ieg_mode(self, value):
+            self.ieg_writes.append(value)
+            return True
+
+    async def run():
+        motor_api = MotorApi()
+        critical = []
+        async def on_critical(message):
+            critical.append(message)
+        async def on_absolute(message):
+            raise AssertionError("not an absolute fault")
+        loop = ControlLoop(motor_api, logging.getLogger("test"), frequency=200)
+        monitor = FaultMonitor(motor_api, logging.getLogger("test"), config, on_absolute, on_critical)
+        loop.status_listener = monitor.on_status
+        monitor.start(attached=True)
+        loop.start()
+        loop.submit(0.0, 0.0)
+        await asyncio.sleep(0.02)
+        assert not critical
+        motor_api.status = (0, 8) ### right drive faulted bit
+        await asyncio.sleep(0.03)
+        loop.stop()
+        monitor.stop()
+        return critical, monitor
+
+    critical, monitor = asyncio.run(run())
+    assert critical == ["CRITICAL FAULT DETECTED: Board temperature is too high"]
+    assert monitor.has_faulted
+
+def test_fault_monitor_absolute_fault_shutdown():
+    class MotorApi:
+        async def get_recent_fault(self):
+            return (4, 0)
+
+    async def run():
+        steps = []
+        monitor = None
+        async def on_absolute(message):
+            ### what the servers shutdown does: stops the monitor, then keeps cleaning up
+            steps.append(message)
+            monitor.stop()
+            await asyncio.sleep(0.01)
+            steps.append("cleaned up")
+        async def on_critical(message):
+            raise AssertionError("not a critical fault")
+        monitor = FaultMonitor(MotorApi(), logging.getLogger("test"), config, on_absolute, on_critical)
+        monitor.start(attached=True)
+        monitor.on_status((8, 0))
+        ### raises CancelledError if stop() cancelled the handler running the shutdown
+        await asyncio.wait_for(monitor._handler, timeout=2.0)
+        return steps
+
+    steps = asyncio.run(run())
+    assert steps == ["ABSOLUTE FAULT DETECTED: ABSOLUTE FAULT: Position tracking error. Motors need to be repaired", "cleaned up"]
+
+class FakeResponse:
+    def __init__(self, registers):
+        self.registers = registers
+    def isError(self):
+        return False
+
+class FakeDrive:
+    """
+    Modbus client double with the holding registers in memory. Requests are answered
+    after delay seconds and logged to log as (name, "write", address, values) or
+    (name, "read", address, count) once answered, reads raise when fail is set.
+    """
+    def __init__(self, name, log, delay=0.0):
+        self.name = name
+        self.log = log
+        self.delay = delay
+        self.memory = {}
+        self.fail = False
+        self.connected = True
+        ### event loop time every request started at
+        self.started = []
+
+    async def _request(self, entry):
+        self.started.append(asyncio.get_running_loop().time())
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.log.append((self.name,) + entry)
+
+    async def write_registers(self, address, values, slave):
+        await self._request(("write", address, list(values)))
+        for offset, value in enumerate(values):
+            self.memory[address + offset] = value
+        return FakeResponse(values)
+
+    async def read_holding_registers(self, address, count, slave):
+        await self._request(("read", address, count))
+        if self.fail:
+            raise ModbusIOException("no response")
+        return FakeResponse([self.memory.get(address + offset, 0) for offset in range(count)])
+
+    def requests(self, kind=None):
+        return [entry[1:] for entry in self.log if entry[0] == self.name and kind in (None, entry[1])]
+
+    def writes(self, address=None):
+        """values written, only the ones written to address if it's given"""
+        return [values for (_, written, values) in self.requests("write") if address in (None, written)]
+
+class FakeClients:
+    """ModbusClients with a FakeDrive per side sharing one request log"""
+    def __init__(self, delay=0.0):
+        self.log = []
+        self.client_left = FakeDrive("left", self.log, delay)
+        self.client_right = FakeDrive("right", self.log, delay)
+        self.pool_left = [self.client_left]
+        self.pool_right = [self.client_right]
+        self.reconnected = []
+
+    def pool(self, side):
+        return self.pool_left if side == "left" else self.pool_right
+
+    async def reconnect(self, side, client, max_attempts=None):
+        self.reconnected.append(client.name)
+        return True
+
+def test_modbus_scheduler_priorities():
+    async def run():
+        clients = FakeClients(delay=0.01)
+        motor_api = MotorApi(logging.getLogger("test"), clients, config=config)
+        ### queue telemetry reads, then a setpoint that gets replaced and a stop
+        reads = [asyncio.create_task(motor_api.get_vel()) for _ in range(3)]
+        await asyncio.sleep(0)
+        first = asyncio.create_task(motor_api.set_host_position(([0, 20], [0, 20])))
+        second = asyncio.create_task(motor_api.set_host_position(([0, 21], [0, 21])))
+        stop = asyncio.create_task(motor_api.stop())
+        results = await asyncio.gather(*reads, first, second, stop)
+        metrics = motor_api.scheduler_metrics()
+        motor_api.close_schedulers()
+        return clients.client_left.requests(), results, metrics
+
+    left, results, metrics = asyncio.run(run())
+    ### first read was already on the wire, stop jumps the queue, then motion, then the rest of the reads
+    assert left[0] == ("read", config.VFEEDBACK_VELOCITY, 1)
+    assert left[1] == ("write", config.IEG_MOTION, [config.STOP_VALUE])
+    assert left[2] == ("write", config.HOST_POSITION, [0, 21])
+    assert [entry[0] for entry in left[3:]] == ["read", "read"]
+    assert results[3] is False and results[4] is True and results[5] is True
+    assert metrics["left"]["motion"]["superseded"] == 1
+    assert metrics["left"]["stop"]["executed"] == 1
+    assert metrics["left"]["background"]["wait_max_ms"] > metrics["left"]["stop"]["wait_max_ms"]
+
+
+def test_modbus_scheduler_connection_pool():
+    from services.modbus_scheduler import ModbusScheduler, PRIORITY_BACKGROUND
+
+    async def run():
+        active = []
+        log = []
+        max_active = [0]
+        connections = ["a", "b", "c"]
+        scheduler = ModbusScheduler("left", logging.getLogger("test"), connections=connections)
+        def request(name, kind):
+            async def run_on(connection):
+                active.append(kind)
+                max_active[0] = max(max_active[0], len(active))
+                if kind == "write":
+                    ### writes never overlap with anything
+                    assert active == ["write"]
+                    assert [scheduler.busy(other) for other in connections] == [other is connection for other in connections]
+                await asyncio.sleep(0.02)
+                active.remove(kind)
+                log.append(name)
+                return connection
+            return run_on
+        reads = [scheduler.submit(PRIORITY_BACKGROUND, request(f"read{i}", "read"), concurrent=True) for i in range(3)]
+        write = scheduler.submit(PRIORITY_BACKGROUND, request("write", "write"))
+        more = [scheduler.submit(PRIORITY_BACKGROUND, request(f"late{i}", "read"), concurrent=True) for i in range(2)]
+        results = await asyncio.gather(*reads, write, *more)
+        metrics = scheduler.metrics()
+        scheduler.close()
+        return results, log, max_active[0], metrics
+
+    results, log, max_active, metrics = asyncio.run(run())
+    assert sorted(results[:3]) == ["a", "b", "c"]
+    assert max_active == 3 and metrics["max_in_flight"] == 3
+    ### reads queued after the write don't overtake it
+    assert log.index("write") == 3 and sorted(log[4:]) == ["late0", "late1"]
+
+
+def test_retry_backoff_and_circuit_breaker():
+    from services.retry_policy import RetryPolicy, CircuitBreaker
+
+    policy = RetryPolicy(base_delay=0.1, max_delay=0.5, jitter=0.0)
+    assert [policy.delay(attempt) for attempt in range(4)] == [0.1, 0.2, 0.4, 0.5]
+
+    now = [0.0]
+    breaker = CircuitBreaker("left", logging.getLogger("test"), failure_threshold=2, reset_timeout=1.0, clock=lambda: now[0])
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN and not breaker.allow_request()
+    now[0] = 1.5
+    assert breaker.allow_request() and breaker.state == breaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    now[0] = 3.0
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+
+    async def run():
+        clients = FakeClients(delay=0.01)
+        clients.client_left.fail = True
+        motor_config = MotorConfig(RETRY_BASE_DELAY=0.01, RETRY_JITTER=0.0, BREAKER_FAILURE_THRESHOLD=4)
+        motor_api = MotorApi(logging.getLogger("test"), clients, config=motor_config, max_retries=3)
+        first = await motor_api.get_vel()
+        left_attempts = len(clients.client_left.started)
+        ### breaker opened on the 4th consecutive failure, left fails fast without touching the drive
+        second = await motor_api.get_vel()
+        motor_api.close_schedulers()
+        return clients, first, second, left_attempts, motor_api.breaker_stats()
+
+    clients, first, second, left_attempts, stats = asyncio.run(run())
+    assert first is False and second is False
+    calls = clients.client_left.started
+    assert left_attempts == 3 and len(calls) == 4
+    gaps = [b - a for a, b in zip(calls, calls[1:])]
+    assert gaps[1] > gaps[0]
+    assert stats["left"]["state"] == "open" and stats["left"]["rejected"] >= 1
+    assert stats["right"]["state"] == "closed"
+
+
+def test_motor_api_timeouts():
+    from services.retry_policy import TIMED_OUT
+
+    async def run():
+        clients = FakeClients(delay=0.2)
+        motor_api = MotorApi(logging.getLogger("test"), clients, config=config)
+        vel = await motor_api.get_vel(timeout=0.05)
+        ### gave up before the drives answered
+        answered_before_vel = list(clients.log)
+        ### a setpoint queued behind the slow read is abandoned when its budget runs out
+        read = asyncio.create_task(motor_api.get_vel())
+        await asyncio.sleep(0)
+        motion = await motor_api.set_host_position(([0, 20], [0, 20]), timeout=0.01)
+        ### OEG_STATUS never reports homed, without the timeout home waits HOMING_TIMEOUT
+        homed = await asyncio.wait_for(motor_api.home(timeout=0.5), timeout=config.HOMING_TIMEOUT / 2)
+        slow = await read
+        motor_api.close_schedulers()
+        return vel, answered_before_vel, motion, homed, slow, clients.client_left.writes(config.HOST_POSITION)
+
+    vel, answered_before_vel, motion, homed, slow, setpoints = asyncio.run(run())
+    assert vel is TIMED_OUT and not vel and answered_before_vel == []
+    assert motion is TIMED_OUT and setpoints == []
+    assert homed is TIMED_OUT
+    assert slow == (0, 0)
+
+
+def test_home_reset_keeps_the_deadline():
+    from services.retry_policy import TIMED_OUT
+
+    class StalledDrive(FakeDrive):
+        """stops answering writes once the homing watcher has read it"""
+        async def write_registers(self, address, values, slave):
+            if self.requests("read"):
+                await asyncio.sleep(10)
+            return await super().write_registers(address, values, slave)
+
+    async def run():
+        clients = FakeClients()
+        clients.client_left = StalledDrive("left", clients.log)
+        clients.pool_left[:] = [clients.client_left]
+        for drive in (clients.client_left, clients.client_right):
+            drive.memory[config.OEG_STATUS] = 2 ### homed
+        motor_api = MotorApi(logging.getLogger("test"), clients, config=config)
+        homed = await asyncio.wait_for(motor_api.home(timeout=0.5), timeout=5)
+        motor_api.close_watchers()
+        motor_api.close_schedulers()
+        return homed, clients.client_right.writes(config.IEG_MOTION)
+
+    homed, right_motion = asyncio.run(run())
+    ### the IEG_MOTION reset after homing gave up at the homing deadline and its result is returned
+    assert homed is TIMED_OUT
+    assert right_motion == [[0], [config.HOME_VALUE], [0]]
+
+def simulator_config(left, right):
+    """Server config pointing to simulators started on port 0"""
+    server_config = Config()
+    server_config.SERVER_IP_LEFT = server_config.SERVER_IP_RIGHT = "127.0.0.1"
+    server_config.SERVER_PORT_LEFT, server_config.SERVER_PORT_RIGHT = left.port, right.port
+    server_config.MODULE_NAME = "tests"
+    return server_config
+
+async def poll_until(check, timeout=10.0, interval=0.05):
+    """Awaits check() until it returns something truthy, returns the last result"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        result = await check()
+        if result or asyncio.get_running_loop().time() > deadline:
+            return result
+        await asyncio.sleep(interval)
+
+def test_drive_simulator_motion_and_faults():
+    drive = SimulatedDrive(initial_position=4.0)
+    drive.last_update = 0.0
+    drive.homing = True
+    drive.advance(now=10.0)
+    assert drive.homed and drive.position == 0.0
+    assert drive.getValues(3, config.OEG_STATUS, 1)[0] == 2
+    ### VEL32 low word first at the even address, the host reads the high word as 8.8
+    drive.velocity = 1.0 + 2**-16
+    drive._publish()
+    assert drive.getValues(3, config.VFEEDBACK_VELOCITY - 1, 2) == [0x0100, 0x0100]
+    drive.velocity = -1.5
+    drive._publish()
+    assert drive.registers.VFEEDBACK_VELOCITY.decode(drive.getValues(3, config.VFEEDBACK_VELOCITY, 1)) == -1.5
+    drive.velocity = 0.0
+
+    async def run():
+        left, right = await start_drive_simulators(port_left=0, port_right=0, initial_position=1.0, homing_velocity=20.0)
+        clients = ModbusClients(simulator_config(left, right), logging.getLogger("test"))
+        try:
+            assert await clients.connect()
+            motor_api = MotorApi(logging.getLogger("test"), clients, config=config)
+            assert await motor_api.initialize_motor(None)
+            await motor_api.set_host_position(([0, 3], [32768, 2]))
+            ### 3 revs at 2 revs/s and 2 revs/s^2 takes 2.5s
+            async def arrived():
+                revs = await motor_api.get_current_revs()
+                return revs if revs and [convert_to_revs(vals) for vals in revs] == [3.0, 2.5] else None
+            revs = await poll_until(arrived)
+            left.drive.inject_fault(128)
+            faulted = (await motor_api.check_fault_stauts(), await motor_api.get_recent_fault())
+            await motor_api.fault_reset()
+            cleared = await motor_api.check_fault_stauts()
+            motor_api.close_schedulers()
+            return revs, faulted, cleared
+        finally:
+            clients.cleanup()
+            await left.stop()
+            await right.stop()
+
+    revs, faulted, cleared = asyncio.run(run())
+    assert [convert_to_revs(vals) for vals in revs] == [3.0, 2.5]
+    assert faulted == ((2 | 8, 2), (128, 0))
+    assert cleared == (2, 2)
+
+
+def test_state_watcher_home_stop_restart():
+    async def run():
+        loop = asyncio.get_running_loop()
+        left, right = await start_drive_simulators(port_left=0, port_right=0, initial_position=1.0, homing_velocity=5.0)
+        clients = ModbusClients(simulator_config(left, right), logging.getLogger("test"))
+        try:
+            assert await clients.connect()
+            motor_api = MotorApi(logging.getLogger("test"), clients, config=config)
+            start = loop.time()
+            initialized = await motor_api.initialize_motor(None)
+            init_elapsed = loop.time() - start
+            ### 1 rev at 2 revs/s and 2 revs/s^2 takes about 1.4s
+            await motor_api.set_host_position(([0, 2], [0, 2]))
+            stopped = await motor_api.wait_for_motors_to_stop(timeout=5)
+            revs = await motor_api.get_current_revs()
+            await motor_api.reset_motors()
+            restarted = await motor_api.wait_for_restart(timeout=5)
+            stats = motor_api.watcher_stats()
+            motor_api.close_watchers()
+            motor_api.close_schedulers()
+            return initialized, init_elapsed, stopped, revs, restarted, stats
+        finally:
+            clients.cleanup()
+            await left.stop()
+            await right.stop()
+
+    initialized, init_elapsed, stopped, revs, restarted, stats = asyncio.run(run())
+    ### homing switched to fast polls near home instead of only polling every WATCH_SLOW_INTERVAL
+    assert initialized is True and init_elapsed < 10
+    assert stats["homing"]["fast_polls"] > 0 and stats["homing"]["fast_polls"] > stats["homing"]["polls"] - stats["homing"]["fast_polls"]
+    ### the wait returned only once the motors had arrived
+    assert stopped is True
+    assert [convert_to_revs(vals) for vals in revs] == [2.0, 2.0]
+    assert restarted is True
+    assert stats["velocity"]["fast_polls"] > 0 and stats["velocity"]["waiting"] == 0
+
+
+def test_connection_monitor_reconnects():
+    from services.connection_monitor import ConnectionMonitor
+
+    async def run():
+        left, right = await start_drive_simulators(port_left=0, port_right=0)
+        server_config = simulator_config(left, right)
+        server_config.MODBUS_CONNECTIONS = 2
+        server_config.CONNECT_RETRY_DELAY = 0.01
+        clients = ModbusClients(server_config, logging.getLogger("test"))
+        events = []
+        async def on_state_change(side, state, message):
+            events.append((side, state))
+        try:
+            assert await clients.connect()
+            pool = list(clients.pool_left)
+            ### connecting again keeps the connected clients
+            assert await clients.connect() and clients.pool_left == pool
+            motor_api = MotorApi(logging.getLogger("test"), clients, config=config)
+            monitor = ConnectionMonitor(clients, logging.getLogger("test"),
+                                        probe=lambda client: client.read_holding_registers(address=config.OEG_STATUS, count=1, slave=config.SLAVE_ID),
+                                        on_state_change=on_state_change, interval=0.05, timeout=0.2, reconnect_attempts=2)
+            monitor.start()
+            await asyncio.sleep(0.1)
+            ### network blip on the left drive
+            await left.stop()
+            await asyncio.sleep(0.3)
+            await left.start()
+            for _ in range(50):
+                if monitor.states["left"] == "connected" and events:
+                    break
+                await asyncio.sleep(0.05)
+            vals = await motor_api.check_fault_stauts(log=False)
+            monitor.stop()
+            motor_api.close_schedulers()
+            return events, vals, monitor.stats(), clients.pool_left == pool
+        finally:
+            clients.cleanup()
+            await left.stop()
+            await right.stop()
+
+    events, vals, stats, same_clients = asyncio.run(run())
+    assert ("left", "connected") == events[-1]
+    assert ("left", "reconnecting") in events and all(side == "left" for side, _ in events)
+    assert vals == (0, 0)
+    assert same_clients and stats["reconnects"] >= 1
+
+def test_connection_monitor_probes_idle_connections():
+    from services.connection_monitor import ConnectionMonitor
+
+    async def run():
+        clients = FakeClients()
+        idle = clients.client_left
+        busy = FakeDrive("busy", clients.log)
+        clients.pool_left.append(busy)
+        monitor = ConnectionMonitor(clients, logging.getLogger("test"),
+                                    probe=lambda client: client.read_holding_registers(address=config.OEG_STATUS, count=1, slave=config.SLAVE_ID),
+                                    is_busy=lambda side, client: client is busy, failures_before_reconnect=3)
+        busy.fail = True
+        idle.fail = True
+        ### the idle connection is reconnected on its third failed probe in a row, the busy one is never probed
+        checks = [await monitor.check("left") for _ in range(3)]
+        first = list(clients.reconnected)
+        ### an answer resets the count
+        await monitor.check("left")
+        idle.fail = False
+        await monitor.check("left")
+        idle.fail = True
+        await monitor.check("left")
+        await monitor.check("left")
+        return checks, first, clients.reconnected, monitor.stats()
+
+    checks, first, reconnected, stats = asyncio.run(run())
+    assert checks == [True, True, True] and first == ["left"]
+    assert reconnected == ["left"]
+    assert stats["skipped_probes"] == 7 and stats["failed_probes"] == 6 and stats["states"]["left"] == "connected"
+
+def test_motor_api_connects_after_failed_first_connect():
+    from services.modbus_scheduler import ModbusScheduler, NotConnectedError
+
+    async def run():
+        ### take two free ports, the drives are still powering up on the first connect
+        left, right = await start_drive_simulators(port_left=0, port_right=0)
+        await left.stop()
+        await right.stop()
+        server_config = simulator_config(left, right)
+        server_config.CONNECT_RETRY_DELAY = 0.01
+        clients = ModbusClients(server_config, logging.getLogger("test"))
+        clients.max_retries = 1
+        try:
+            assert not await clients.connect()
+            motor_api = MotorApi(logging.getLogger("test"), clients, config=config)
+            before = await motor_api.check_fault_stauts(log=False)
+            await left.start()
+            await right.start()
+            assert await clients.connect()
+            after = await motor_api.check_fault_stauts(log=False)
+            connections = (motor_api.scheduler_left.connections, motor_api.scheduler_right.connections)
+            motor_api.close_schedulers()
+            try:
+                await ModbusScheduler("left", logging.getLogger("test"), []).submit(0, None)
+                not_connected = False
+            except NotConnectedError:
+                not_connected = True
+            return before, after, connections, clients, not_connected
+        finally:
+            clients.cleanup()
+            await left.stop()
+            await right.stop()
+
+    before, after, (connections_left, connections_right), clients, not_connected = asyncio.run(run())
+    assert before is False
+    assert after == (0, 0)
+    assert connections_left == [clients.client_left] and connections_right == [clients.client_right]
+    assert not_connected
+
+def test_register_cache_skips_unchanged_writes():
+    async def run():
+        clients = FakeClients()
+        motor_api = MotorApi(logging.getLogger("test"), clients, config=config)
+        def writes(address):
+            return len(clients.client_left.writes(address))
+        assert await motor_api.set_host_vel_max(0, 10)
+        assert await motor_api.set_host_acc_max(0, 20)
+        assert await motor_api.set_host_vel_max(0, 10)
+        assert writes(config.HOST_VEL_MAXIMUM) == 1
+        ### a changed value is written
+        assert await motor_api.set_host_vel_max(0, 11)
+        assert writes(config.HOST_VEL_MAXIMUM) == 2
+        ### after a fault nothing is trusted until it has been read back
+        motor_api.register_cache.invalidate("test fault")
+        assert await motor_api.set_host_acc_max(0, 20)
+        assert writes(config.HOST_ACCELERATION_MAXIMUM) == 2
+        motor_api.register_cache.invalidate("test fault")
+        clients.client_right.memory[config.HOST_VEL_MAXIMUM + 1] = 3
+        assert await motor_api.verify_register_cache() == 1
+        assert await motor_api.set_host_acc_max(0, 20)
+        assert await motor_api.set_host_vel_max(0, 11)
+        assert writes(config.HOST_ACCELERATION_MAXIMUM) == 2
+        assert writes(config.HOST_VEL_MAXIMUM) == 3
+        ### a restart forgets everything
+        await motor_api.reset_motors()
+        assert await motor_api.set_host_acc_max(0, 20)
+        assert writes(config.HOST_ACCELERATION_MAXIMUM) == 3
+        motor_api.close_schedulers()
+        return motor_api.register_cache.stats()
+
+    stats = asyncio.run(run())
+    assert stats["skipped_writes"] == 2 and stats["drift"] == 1 and stats["invalidations"] == 2
+
+def test_trajectory_interpolation_and_limits():
+    from helpers.trajectory import Trajectory, MotionLimiter
+    from services.trajectory_loop import TrajectoryLoop
+
+    linear = Trajectory("linear")
+    hermite = Trajectory("hermite")
+    for t in range(5):
+        linear.push(t * 0.1, t * t, -t)
+        hermite.push(t * 0.1, t * t, -t)
+    assert not linear.push(0.2, 0.0, 0.0)
+    assert np.allclose(linear.sample(0.15), (2.5, -1.5))
+    ### hermite goes through the setpoints and follows the parabola closer than straight lines
+    assert np.allclose(hermite.sample(0.2), (4.0, -2.0))
+    assert abs(hermite.sample(0.15)[0] - 2.25) < abs(linear.sample(0.15)[0] - 2.25)
+    assert linear.sample(-1.0) == (0.0, 0.0) and linear.sample(1.0) == (16.0, -4.0)
+
+    ### step from 0 to 10 revs within 2 revs/s, 4 revs/s^2 and 40 revs/s^3 without overshoot
+    limiter = MotionLimiter(0.01, max_velocity=2.0, max_acceleration=4.0, max_jerk=40.0)
+    limiter.reset(0.0)
+    positions = [limiter.step(10.0) for _ in range(800)]
+    velocities = [(b - a) / 0.01 for a, b in zip([0.0] + positions, positions)]
+    accelerations = [(b - a) / 0.01 for a, b in zip([0.0] + velocities, velocities)]
+    jerks = [(b - a) / 0.01 for a, b in zip(accelerations, accelerations[1:])]
+    assert abs(positions[-1] - 10.0) < 1e-9 and max(positions) <= 10.0 + 1e-9
+    assert max(velocities) <= 2.0 + 1e-9
+    assert max(abs(a) for a in accelerations) <= 4.0 + 1e-6
+    assert max(abs(j) for j in jerks) <= 40.0 + 1e-3
+
+    class MotorApi:
+        def __init__(self):
+            self.written = []
+        def target_revs(self, pitch, roll):
+            return (pitch, roll)
+        async def get_current_revs(self):
+            return ([0, 1], [0, 1])
+        async def move_to_revs(self, left, right, trace=None):
+            self.written.append((left, right))
+            return True
+
+    async def run():
+        motor_api = MotorApi()
+        loop = TrajectoryLoop(motor_api, logging.getLogger("test"), frequency=100, interpolation="hermite",
+                              delay=0.15, max_velocity=20.0, max_acceleration=100.0, max_jerk=5000.0)
+        loop.start()
+        ### 10 Hz input ramp from 1 to 2 revs with sender timestamps
+        sent = 1000.0
+        for n in range(6):
+            loop.submit(1.0 + n * 0.2, 1.0, timestamp=sent + n * 0.1)
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(0.3)
+        loop.stop()
+        return motor_api.written, loop.stats()
+
+    written, stats = asyncio.run(run())
+    left = [position for position, _ in written]
+    ### many small steps at the control rate instead of 0.2 rev jumps at the input rate
+    assert len(written) > 40 and abs(left[-1] - 2.0) < 1e-6
+    assert max(b - a for a, b in zip(left, left[1:])) < 0.05
+    ### the acceleration limit only lets it overshoot a little when the input stops
+    assert max(left) < 2.05
+    assert stats["received"] == 6 and stats["out_of_order"] == 0
+
+def test_position_write_filter():
+    from helpers.position_filter import PositionWriteFilter, SUPPRESSED
+
+    now = [0.0]
+    position_filter = PositionWriteFilter(deadband=10, keepalive=1.0, clock=lambda: now[0])
+    assert position_filter.needs_write("left", [100, 20])
+    position_filter.acknowledge("left", [100, 20])
+    assert not position_filter.needs_write("left", [110, 20])
+    assert position_filter.needs_write("left", [111, 20])
+    ### the dead-band works across the whole revs boundary
+    position_filter.acknowledge("left", [65530, 20])
+    assert not position_filter.needs_write("left", [2, 21])
+    now[0] = 1.0
+    assert position_filter.needs_write("left", [65530, 20])
+    position_filter.invalidate()
+    assert position_filter.needs_write("right", [0, 0])
+    assert position_filter.stats()["left"] == {"written": 2, "suppressed": 2, "keepalives": 1}
+
+    async def run():
+        motor_config = MotorConfig()
+        motor_config.POSITION_KEEPALIVE = 0.2
+        clients = FakeClients()
+        def writes(side):
+            return len(getattr(clients, f"client_{side}").writes())
+        motor_api = MotorApi(logging.getLogger("test"), clients, config=motor_config)
+        loop = ControlLoop(motor_api, logging.getLogger("test"), frequency=100)
+        loop.start()
+        ### static pose, the control loop re-sends it every tick
+        loop.submit(1.0, 2.0)
+        await asyncio.sleep(0.5)
+        loop.stop()
+        idle = (writes("left"), writes("right"), loop.stats()["ticks"])
+        ### only the drive whose setpoint changed is written
+        assert await motor_api.set_host_position(([0, 20], [0, 20]))
+        assert await motor_api.set_host_position(([5, 20], [0, 20]))
+        moved = (writes("left") - idle[0], writes("right") - idle[1])
+        ### a restart loses the drives setpoints
+        await motor_api.reset_motors()
+        assert await motor_api.set_host_position(([5, 20], [0, 20]))
+        restarted = writes("right") - idle[1]
+        ### an unchanged setpoint is reported as suppressed, not as an acknowledged write
+        tracer = LatencyTracer()
+        assert await motor_api.move_to_revs(6.0, 6.0, trace=tracer.begin()) is True
+        suppressed = await motor_api.move_to_revs(6.0, 6.0, trace=tracer.begin())
+        ### the drives stop where they are, the same setpoint is written again after a stop
+        assert await motor_api.stop()
+        before_stop = writes("left")
+        assert await motor_api.move_to_revs(6.0, 6.0) is True
+        after_stop = writes("left") - before_stop
+        motor_api.close_schedulers()
+        return idle, moved, restarted, suppressed, tracer.summary(), after_stop
+
+    (left_writes, right_writes, ticks), moved, restarted, suppressed, traces, after_stop = asyncio.run(run())
+    assert ticks >= 30 and 2 <= left_writes <= 4 and left_writes == right_writes
+    assert moved == (2, 1)
+    assert restarted == 3
+    assert suppressed is SUPPRESSED and suppressed
+    assert (traces["completed"], traces["suppressed"], traces["not_written"]) == (1, 1, 0)
+    assert after_stop == 1
+
+def test_fault_decoder():
+    from helpers.fault_decoder import fault_severity, fault_conditions, status_conditions, RECOVERABLE, CRITICAL, ABSOLUTE
+    from helpers.fault_helpers import is_critical_fault, is_absolute_fault, fault_event
+
+    ### combined bits are classified by their worst bit
+    assert fault_severity(0) == 0
+    assert fault_severity(2 | 16) == CRITICAL
+    assert fault_severity(4 | 1) == ABSOLUTE
+    assert fault_severity(8) == RECOVERABLE
+    assert [text for (_, text) in fault_conditions(2 | 16)] == ["Continuous current in the actuator was too large", "Low bus voltage"]
+    assert fault_conditions(1 << 15) == ((RECOVERABLE, "Fault bit 15"),)
+    assert status_conditions(1 | 2 | 8) == ("Enabled", "Homed", "Faulted")
+    assert is_critical_fault((0, 2 | 16)) and not is_absolute_fault((0, 2 | 16))
+    assert is_absolute_fault((2048 | 128, 0))
+
+    assert fault_event((128, 0), (True, False)) == ("critical", "CRITICAL FAULT DETECTED: Board temperature is too high")
+    ### a stale fault word of a drive that has not faulted is ignored
+    assert fault_event((128, 8), (False, True))[0] == "recoverable"
+    (kind, message) = fault_event((128, 16), (True, True))
+    assert kind == "critical"
+    assert message == "CRITICAL FAULT DETECTED: left drive: Board temperature is too high; right drive: Low bus voltage"
+    assert fault_event((4 | 16, 0))[1].startswith("ABSOLUTE FAULT DETECTED: ABSOLUTE FAULT: Position tracking error")
+
+def test_event_journal():
+    import os
+    import tempfile
+    from services.event_journal import EventJournal, JournalReader, describe_record, STATUS, FAULT, IEG_MODE, RECORD, LEFT, RIGHT, BOTH
+    from helpers.fault_decoder import CRITICAL
+
+    clients = FakeClients()
+    clients.client_left.memory.update({MotorConfig.OEG_STATUS: 1 | 2})
+    clients.client_right.memory.update({MotorConfig.OEG_STATUS: 1 | 2 | 8, MotorConfig.RECENT_FAULT_ADDRESS: 2 | 16})
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "drive_events.journal")
+        now = [1000.0]
+        journal = EventJournal(path, logging.getLogger("test"), clock=lambda: now[0])
+
+        async def run():
+            motor_api = MotorApi(logging.getLogger("test"), clients, config=MotorConfig())
+            motor_api.journal = journal
+            ### unchanged status and fault words are recorded once
+            await motor_api.check_fault_stauts(log=False)
+            await motor_api.check_fault_stauts(log=False)
+            await motor_api.get_recent_fault()
+            now[0] = 2000.0
+            await motor_api.set_ieg_mode(motor_api.config.RESET_FAULT_VALUE)
+            motor_api.close_schedulers()
+        asyncio.run(run())
+        journal.close()
+        ### a partially written record at the end is skipped
+        with open(path, "ab") as file:
+            file.write(b"\0" * (RECORD.size // 2))
+
+        with JournalReader(path) as reader:
+            assert len(reader) == 5
+            assert list(reader.records["kind"]) == [STATUS, STATUS, FAULT, FAULT, IEG_MODE]
+            faults = reader.query(severity=CRITICAL)
+            assert len(faults) == 1 and faults[0]["side"] == RIGHT and faults[0]["value"] == 2 | 16
+            assert len(reader.query(fault_bits=16, side=LEFT)) == 0
+            assert len(reader.query(since=1500, kinds=[IEG_MODE])) == 1
+            assert len(reader.query(until=1500, side=LEFT)) == 2
+            (ieg_mode,) = reader.query(since=1500)
+            assert ieg_mode["side"] == BOTH and ieg_mode["value"] == 32768 and ieg_mode["detail"] == 1
+            assert "critical: Continuous current in the actuator was too large, Low bus voltage" in describe_record(faults[0])
+
+def test_independent_side_writes():
+    from services.latency_tracer import LatencyTracer
+
+    async def run():
+        motor_config = MotorConfig()
+        motor_config.INDEPENDENT_SIDES = True
+        motor_config.SIDE_SKEW_WARNING = 0.02
+        motor_config.MOTION_REQUEST_DEADLINE = 1.0
+        clients = FakeClients()
+        clients.client_right.delay = 0.05
+        motor_api = MotorApi(logging.getLogger("test"), clients, config=motor_config)
+        tracer = LatencyTracer()
+        for i in range(30):
+            ### the slow right drive does not hold back the setpoints of the left one
+            assert await motor_api.move_to_revs(5 + i * 0.01, 5 + i * 0.01, trace=tracer.begin())
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        stats = motor_api.side_writer.stats()
+        motor_api.close_schedulers()
+        return len(clients.client_left.writes()), len(clients.client_right.writes()), stats, tracer.summary()
+
+    left_writes, right_writes, stats, traces = asyncio.run(run())
+    assert left_writes == 30
+    assert 3 <= right_writes < 15
+    assert stats["left"]["p95_ms"] < 20 and stats["right"]["p50_ms"] >= 50
+    assert stats["left"]["generation_lag"] == 0 and stats["right"]["generation_lag"] == 0
+    assert stats["right"]["coalesced"] > 0
+    assert stats["skew"]["count"] >= 1 and stats["max_skew_ms"] >= 40 and stats["skew_warnings"] >= 1
+    ### only the frames that reached both drives are finished
+    assert 1 <= traces["completed"] <= right_writes
+    assert traces["sides"]["left"]["max_ms"] < traces["sides"]["right"]["p50_ms"]
+
+def test_independent_side_writes_stop():
+    async def run():
+        motor_config = MotorConfig()
+        motor_config.INDEPENDENT_SIDES = True
+        motor_config.MOTION_REQUEST_DEADLINE = 1.0
+        clients = FakeClients(delay=0.02)
+        motor_api = MotorApi(logging.getLogger("test"), clients, config=motor_config)
+        ### the first setpoint is being written, the second one waits in the slots
+        await motor_api.move_to_revs(5.0, 5.0)
+        await asyncio.sleep(0.005)
+        await motor_api.move_to_revs(6.0, 6.0)
+        assert await motor_api.stop()
+        await asyncio.sleep(0.1)
+        motor_api.close_schedulers()
+        return clients
+
+    clients = asyncio.run(run())
+    for drive in (clients.client_left, clients.client_right):
+        log = [(address, values) for (_, address, values) in drive.requests("write")]
+        addresses = [address for (address, _) in log]
+        stop = log.index((MotorConfig.IEG_MOTION, [MotorConfig.STOP_VALUE]))
+        assert MotorConfig.HOST_POSITION not in addresses[stop:]
+        assert addresses.count(MotorConfig.HOST_POSITION) == 1
+
 
 
 # [[left_Decimal[[28], [r_decimal, r_whole]] = clamp_target_revs(29.99999999999, -300.5, config)
@@ -10,11 +10,25 @@ def handle_launch_params(b_motor_config=False):
     parser.add_argument("--port", type=int, help="port number")
     parser.add_argument("--server_left", type=str, help="left side motor ip")
     parser.add_argument("--server_right", type=str, help="right side motor ip")
+    parser.add_argument("--port_left", type=int, help="left side motor port, overrides --port")
+    parser.add_argument("--port_right", type=int, help="right side motor port, overrides --port")
+    parser.add_argument("--connections", type=int, help="modbus tcp connections per drive")
+    parser.add_argument("--deadband", type=int, help="host position dead-band in 1/65536 revs")
+    parser.add_argument("--no_position_filter", action="store_true", help="write every motion setpoint, even unchanged ones")
+    parser.add_argument("--independent_sides", action="store_true", help="write motion setpoints to each drive from its own task")
+    parser.add_argument("--cache_verify_interval", type=float, help="seconds between read-backs of the cached configuration registers")
     parser.add_argument("--vel", type=int, help="max rpm velocity")
     parser.add_argument("--acc", type=int, help="max rpm acceleration")
-    parser.add_argument("--freq", type=str, help="Expected motor command frequency")
+    parser.add_argument("--freq", type=float, help="Expected motor command frequency")
+    parser.add_argument("--control_loop", action="store_true", help="write motor commands at a fixed --freq rate")
+    parser.add_argument("--trajectory", choices=["linear", "hermite"], help="interpolate between the received setpoints at a fixed --freq rate")
+    parser.add_argument("--trajectory_delay", type=float, help="seconds the trajectory runs behind the newest setpoint")
+    parser.add_argument("--telemetry_hz", type=float, help="background telemetry sampling rate, 0 disables it")
+    parser.add_argument("--latency_trace", action="store_true", help="record motion path latencies")
+    parser.add_argument("--event_journal", type=str, help="drive event journal file, 'none' disables it")
     parser.add_argument("--slaveid", type=int, help="drivers slave id")
     parser.add_argument("--polling_time_interval", type=int, help="polling time interval")
+    parser.add_argument("--fault_monitor", type=str, choices=["process", "inprocess"], help="run fault polling as its own process or inside the server")
     parser.add_argument("--start_tid", type=int, help="start tid")
     parser.add_argument("--end_tid", type=int, help="end tid")
     parser.add_argument("--web_server_port", type=int, help="end tid")
@@ -34,6 +48,22 @@ def handle_launch_params(b_motor_config=False):
     args = args[0]
     if (args.port):
         config.SERVER_PORT = args.port
+    if (args.port_left):
+        config.SERVER_PORT_LEFT = args.port_left
+    if (args.port_right):
+        config.SERVER_PORT_RIGHT = args.port_right
+    if (args.connections):
+        config.MODBUS_CONNECTIONS = args.connections
+    if (args.deadband):
+        motor_config.POSITION_DEADBAND = args.deadband
+    if (args.no_position_filter):
+        motor_config.POSITION_WRITE_FILTER = False
+    if (args.independent_sides):
+        motor_config.INDEPENDENT_SIDES = True
+    if (args.cache_verify_interval):
+        motor_config.CACHE_VERIFY_INTERVAL = args.cache_verify_interval
+    if (args.event_journal):
+        config.EVENT_JOURNAL = "" if args.event_journal == "none" else args.event_journal
     if (args.acc):
         motor_config.ACC = args.acc
     if (args.vel):
@@ -44,10 +74,22 @@ def handle_launch_params(b_motor_config=False):
         config.SERVER_IP_RIGHT = args.server_right
     if (args.freq):
         config.POS_UPDATE_HZ = args.freq
+    if (args.control_loop):
+        config.CONTROL_LOOP = True
+    if (args.trajectory):
+        config.TRAJECTORY = args.trajectory
+    if (args.trajectory_delay):
+        config.TRAJECTORY_DELAY = args.trajectory_delay
+    if (args.telemetry_hz is not None):
+        config.TELEMETRY_SAMPLE_HZ = args.telemetry_hz
+    if (args.latency_trace):
+        config.LATENCY_TRACE = True
     if (args.slaveid):
         config.SLAVE_ID = args.slaveid
     if (args.polling_time_interval):
         config.POLLING_TIME_INTERVAL = args.time_interval
+    if (args.fault_monitor):
+        config.FAULT_MONITOR = args.fault_monitor
     if (args.start_tid):
         config.START_TID = args.start_tid
     if (args.end_tid):
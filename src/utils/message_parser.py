@@ -0,0 +1,76 @@
+### keys of the key=value| websocket protocol, stored in slots
+MESSAGE_KEYS = ("action", "pitch", "roll", "seconds", "protocol", "receiver",
+                "identity", "message", "event", "acc", "vel")
+_MESSAGE_KEYS = frozenset(MESSAGE_KEYS)
+
+class Message:
+    """
+    Parsed websocket message. Protocol keys are attributes (msg.action) and also
+    work like a dict (msg["action"], msg.get("action")). Keys that are missing are
+    False, same as extract_part, and unknown keys end up in extra.
+    """
+    __slots__ = MESSAGE_KEYS + ("extra",)
+
+    def __init__(self):
+        self.action = self.pitch = self.roll = self.seconds = self.protocol = False
+        self.receiver = self.identity = self.message = self.event = self.acc = self.vel = False
+        self.extra = None
+
+    def get(self, key, default=False):
+        if key in _MESSAGE_KEYS:
+            value = getattr(self, key)
+            return default if value is False else value
+        if self.extra is None:
+            return default
+        return self.extra.get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is False:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not False
+
+    def __iter__(self):
+        for key in MESSAGE_KEYS:
+            if getattr(self, key) is not False:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def items(self):
+        return [(key, self.get(key)) for key in self]
+
+    def __repr__(self):
+        return f"Message({dict(self.items())})"
+
+def parse_message(text) -> Message:
+    """
+    Splits a key=value|key=value| message in one pass. Like extract_part the first
+    occurrence of a key wins and text after the last | is ignored.
+    """
+    fields = {}
+    segments = text.split("|")
+    segments.pop() ### not terminated with |
+    for segment in segments:
+        key, separator, value = segment.partition("=")
+        if separator and key not in fields:
+            fields[key] = value
+
+    msg = Message.__new__(Message)
+    take = fields.pop
+    msg.action = take("action", False)
+    msg.pitch = take("pitch", False)
+    msg.roll = take("roll", False)
+    msg.seconds = take("seconds", False)
+    msg.protocol = take("protocol", False)
+    msg.receiver = take("receiver", False)
+    msg.identity = take("identity", False)
+    msg.message = take("message", False)
+    msg.event = take("event", False)
+    msg.acc = take("acc", False)
+    msg.vel = take("vel", False)
+    msg.extra = fields or None
+    return msg
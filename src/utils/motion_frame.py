@@ -0,0 +1,55 @@
+import struct
+from time import time
+from typing import Tuple
+
+### Binary rotate frame, little endian:
+### version u8 | type u8 | sequence u32 | sender timestamp f64 (unix s) | pitch f32 | roll f32
+MOTION_FRAME = struct.Struct("<BBIdff")
+MOTION_FRAME_VERSION = 1
+MOTION_FRAME_ROTATE = 1
+SEQUENCE_MODULO = 1 << 32
+BINARY_PROTOCOL = "binary"
+
+def encode_motion_frame(sequence, pitch, roll, timestamp=None) -> bytes:
+    if timestamp is None:
+        timestamp = time()
+    return MOTION_FRAME.pack(MOTION_FRAME_VERSION, MOTION_FRAME_ROTATE, sequence % SEQUENCE_MODULO, timestamp, pitch, roll)
+
+def decode_motion_frame(data) -> Tuple[int, float, float, float]:
+    """Returns (sequence, timestamp, pitch, roll), raises ValueError for anything that isn't a valid rotate frame"""
+    if len(data) != MOTION_FRAME.size:
+        raise ValueError(f"Motion frame has to be {MOTION_FRAME.size} bytes, got {len(data)}")
+    version, frame_type, sequence, timestamp, pitch, roll = MOTION_FRAME.unpack(data)
+    if version != MOTION_FRAME_VERSION or frame_type != MOTION_FRAME_ROTATE:
+        raise ValueError(f"Unsupported motion frame version {version} type {frame_type}")
+    return sequence, timestamp, pitch, roll
+
+class MotionSequence:
+    """
+    Tracks a clients motion frame sequence numbers. Frames that skip numbers count
+    as dropped and frames older than the newest one seen are reordered and must not
+    be applied, otherwise the platform would briefly move back to an old setpoint.
+    """
+    def __init__(self):
+        self.last = None
+        self.received = 0
+        self.dropped = 0
+        self.reordered = 0
+
+    def accept(self, sequence) -> bool:
+        """True if the frame is newer than everything before it"""
+        self.received += 1
+        if self.last is None:
+            self.last = sequence
+            return True
+        ### modular distance so the u32 counter can wrap around
+        distance = (sequence - self.last) % SEQUENCE_MODULO
+        if distance == 0 or distance >= SEQUENCE_MODULO // 2:
+            self.reordered += 1
+            return False
+        self.dropped += distance - 1
+        self.last = sequence
+        return True
+
+    def stats(self) -> dict:
+        return {"received": self.received, "dropped": self.dropped, "reordered": self.reordered}
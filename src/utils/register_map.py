@@ -0,0 +1,123 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+from settings.motors_config import MotorConfig
+
+@dataclass(frozen=True)
+class RegisterSpec:
+    """
+    One drive register. fmt is the Q-format as "integer bits.fraction bits",
+    16 bit formats are a single register and 32 bit formats two registers
+    with the low word first (same order the drives use for [decimal, whole]).
+    """
+    name: str
+    address: int
+    fmt: str
+    signed: bool = False
+    int_bits: int = field(init=False)
+    frac_bits: int = field(init=False)
+    count: int = field(init=False)
+
+    def __post_init__(self):
+        int_bits, frac_bits = (abs(int(part)) for part in self.fmt.split("."))
+        width = int_bits + frac_bits
+        if width not in (16, 32):
+            raise ValueError(f"Unsupported register format {self.fmt} for {self.name}")
+        object.__setattr__(self, "int_bits", int_bits)
+        object.__setattr__(self, "frac_bits", frac_bits)
+        object.__setattr__(self, "count", width // 16)
+
+class RegisterCodec:
+    """Register spec compiled into precomputed encode/decode closures"""
+    __slots__ = ("spec", "name", "address", "count", "decode", "encode")
+
+    def __init__(self, spec: RegisterSpec):
+        self.spec = spec
+        self.name = spec.name
+        self.address = spec.address
+        self.count = spec.count
+        self.decode: Callable[[List[int]], float] = _compile_decoder(spec)
+        self.encode: Callable[[float], List[int]] = _compile_encoder(spec)
+
+def _compile_decoder(spec: RegisterSpec) -> Callable[[List[int]], float]:
+    resolution = 1.0 / (1 << spec.frac_bits)
+    if spec.count == 1:
+        if not spec.signed:
+            if spec.frac_bits == 0:
+                return lambda registers: registers[0]
+            return lambda registers: registers[0] * resolution
+        sign_bit, wrap = 1 << 15, 1 << 16
+        return lambda registers: (registers[0] - wrap if registers[0] & sign_bit else registers[0]) * resolution
+
+    if not spec.signed:
+        return lambda registers: ((registers[1] << 16) | registers[0]) * resolution
+    sign_bit, wrap = 1 << 31, 1 << 32
+    def decode(registers):
+        raw = (registers[1] << 16) | registers[0]
+        return (raw - wrap if raw & sign_bit else raw) * resolution
+    return decode
+
+def _compile_encoder(spec: RegisterSpec) -> Callable[[float], List[int]]:
+    scale = 1 << spec.frac_bits
+    if spec.count == 1:
+        return lambda value: [int(value * scale) & 0xFFFF]
+    def encode(value):
+        raw = int(value * scale) & 0xFFFFFFFF
+        return [raw & 0xFFFF, raw >> 16]
+    return encode
+
+### name -> (format, signed), addresses come from MotorConfig
+REGISTER_FORMATS: Dict[str, tuple] = {
+    ### status / command words
+    "OEG_STATUS": ("16.0", False),
+    "IEG_MODE": ("16.0", False),
+    "IEG_MOTION": ("16.0", False),
+    "PRESENT_FAULT_ADDRESS": ("16.0", False),
+    "RECENT_FAULT_ADDRESS": ("16.0", False),
+    "SYSTEM_COMMAND": ("16.0", False),
+    "COMMAND_MODE": ("16.0", False),
+    "ANALOG_INPUT_CHANNEL": ("16.0", False),
+    "ANALOG_MODBUS_CNTRL": ("16.0", False),
+    ### POS32 16.16
+    "HOST_POSITION": ("16.16", True),
+    "PFEEDBACK_POSITION": ("16.16", True),
+    "ANALOG_POSITION_MINIMUM": ("16.16", True),
+    "ANALOG_POSITION_MAXIMUM": ("16.16", True),
+    ### UVEL32 8.24
+    "HOST_VEL_MAXIMUM": ("8.24", False),
+    "ANALOG_VEL_MAXIMUM": ("8.24", False),
+    ### high word of the VEL32 8.24 feedback velocity at 360 (32 bit registers start at even addresses)
+    "VFEEDBACK_VELOCITY": ("8.8", True),
+    ### UACC32 12.20
+    "HOST_ACCELERATION_MAXIMUM": ("12.20", False),
+    "ANALOG_ACCELERATION_MAXIMUM": ("12.20", False),
+    ### UCUR16 9.7
+    "HOST_CURRENT_MAXIMUM": ("9.7", False),
+    "IPEAK": ("9.7", False),
+    ### telemetry
+    "BOARD_TMP": ("11.5", True),
+    "ACTUATOR_TMP": ("13.3", True),
+    "ICONTINUOUS": ("9.23", False),
+    "VBUS": ("11.21", True),
+}
+
+class RegisterMap:
+    """Compiled codecs for every register in REGISTER_FORMATS, accessible as attributes or by name"""
+    def __init__(self, codecs: Dict[str, RegisterCodec]):
+        self._codecs = codecs
+        for name, codec in codecs.items():
+            setattr(self, name, codec)
+
+    def __getitem__(self, name) -> RegisterCodec:
+        return self._codecs[name]
+
+    def __contains__(self, name) -> bool:
+        return name in self._codecs
+
+    def __iter__(self):
+        return iter(self._codecs.values())
+
+def build_register_map(config=MotorConfig()) -> RegisterMap:
+    codecs = {}
+    for name, (fmt, signed) in REGISTER_FORMATS.items():
+        codecs[name] = RegisterCodec(RegisterSpec(name=name, address=getattr(config, name), fmt=fmt, signed=signed))
+    return RegisterMap(codecs)
@@ -43,14 +43,17 @@ class ColoredFormatter(logging.Formatter):
             logging.getLogger(__name__).warning(
                 f"Failed to resolve path for {record.filename}:{record.lineno}: {str(e)}"
             )
-def setup_logging(name, filename):
-    log_dir = "logs"
+def get_log_dir():
     if started_from_exe():
         parent_log_dir = os.path.join(os.path.dirname(sys.executable), "logs")
     else:
         parent_log_dir = os.path.join(Path(__file__).parent.parent.parent, "logs")
     if not os.path.exists(parent_log_dir):
         os.makedirs(parent_log_dir)
+    return parent_log_dir
+
+def setup_logging(name, filename):
+    parent_log_dir = get_log_dir()
     
     log_format = '%(asctime)s - %(levelname)s - MODULE: - %(hyperlink)s - %(message)s'
 